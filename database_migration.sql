@@ -34,3 +34,15 @@ CREATE TABLE received_emails (
     smtp_msg_id text,
     email_account character varying
 );
+
+
+-- One-shot migration: account passwords used to be base64 encoded a second time
+-- on top of their Fernet token, which is already base64 text. Stored Fernet
+-- tokens start with 'gAAAAA', so running it again leaves them unchanged.
+UPDATE email_accounts
+SET pwd = convert_from(decode(translate(pwd, '-_', '+/'), 'base64'), 'UTF8')
+WHERE pwd IS NOT NULL AND pwd NOT LIKE 'gAAAAA%';
+
+UPDATE email_accounts
+SET imap_pwd = convert_from(decode(translate(imap_pwd, '-_', '+/'), 'base64'), 'UTF8')
+WHERE imap_pwd IS NOT NULL AND imap_pwd NOT LIKE 'gAAAAA%';
@@ -1,113 +1,281 @@
-from openai import OpenAI
-from dotenv import load_dotenv
+from openai import (
+    OpenAI,
+    AsyncOpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+from email_assistant.utils.env import load_env
 import os
 import re
-import threading
-import html
+import asyncio
 from pydantic import BaseModel
-from typing import Literal
-from email_assistant.config import FOLDERS
-import json
-from email_assistant.config import LIMIT_EMAIL_LENGTH
-
-load_dotenv()
+from typing import List
+from email_assistant.config import FolderLabel
+import orjson
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+import tiktoken
+import hashlib
+import logging
+import sqlite3
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from email_assistant.config import (
+    LIMIT_EMAIL_LENGTH,
+    LIMIT_EMAIL_TOKENS,
+    CLASSIFY_CACHE_PATH,
+    CLASSIFY_BATCH_SIZE,
+    AI_MAX_CONCURRENCY,
+    AI_TIMEOUT_SECONDS,
+    AI_MAX_ATTEMPTS,
+    AI_ATTEMPT_TIMEOUT_SECONDS,
+    AI_RETRY_MAX_WAIT_SECONDS,
+)
+
+load_env()
+
+logger = logging.getLogger(__name__)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# In-memory copy of the classification cache (email hash -> label),
+# loaded from CLASSIFY_CACHE_PATH on first use
+_classify_cache = None
+
 
 class EmailLabel(BaseModel):
-    label: Literal[tuple(FOLDERS)]
+    label: FolderLabel
 
 
-class FunctionTimedOut(Exception):
-    pass
+class EmailLabels(BaseModel):
+    labels: List[EmailLabel]
 
 
-def timeout(seconds, function_name=""):
-    """
-    Decorator that adds a timeout to a function.
+class EmailResponse(BaseModel):
+    subject_text: str
+    email_body_text: str
 
-    This decorator will run the decorated function in a separate thread and
-    raise a FunctionTimedOut exception if the function takes longer than
-    the specified timeout to complete.
 
-    Args:
-        seconds (int): Maximum execution time in seconds before timing out
-        function_name (str, optional): Name of the function for error reporting
+def _make_strict(schema):
+    """Add the constraints OpenAI's strict mode requires to every object of a JSON schema"""
+    if isinstance(schema, dict):
+        if schema.get("type") == "object":
+            schema["additionalProperties"] = False
+            schema["required"] = list(schema.get("properties", {}))
+        for value in schema.values():
+            _make_strict(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            _make_strict(value)
+    return schema
 
-    Returns:
-        decorator: A decorator function that applies the timeout logic
 
-    Raises:
-        FunctionTimedOut: If the function execution exceeds the timeout period
+def json_schema_response_format(model):
+    """Build a strict json_schema response_format for chat.completions.create from a pydantic model"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": _make_strict(model.schema()),
+            "strict": True,
+        },
+    }
+
+
+# Built once at import rather than by the SDK on every request
+EMAIL_LABEL_FORMAT = json_schema_response_format(EmailLabel)
+EMAIL_LABELS_FORMAT = json_schema_response_format(EmailLabels)
+EMAIL_RESPONSE_FORMAT = json_schema_response_format(EmailResponse)
+
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+
+# System message of every classification request. It is kept identical across
+# calls so that requests share the same prefix for OpenAI's prompt caching.
+CLASSIFY_SYSTEM_PROMPT = """You classify emails in exactly one of these types:
+
+To respond
+Emails you need to respond to
+
+Fyi
+Emails that don't require your response, but are important
+
+Comment
+Team chats in tools like Google Docs or Microsoft Office
+
+Notification
+Automated updates from tools you use
+
+Meeting update
+Calendar updates from Zoom, Google Meet, etc
+
+Actioned
+Emails you've sent that you're not expecting a reply to
+
+Marketing
+Marketing or cold emails."""
+
+
+@lru_cache(maxsize=4)
+def _get_client(api_key):
+    """Return a cached OpenAI client so its HTTP connection pool is reused across calls
+
+    The request timeout is enforced by the client's HTTP layer, so no extra
+    thread is needed to bound the call duration. Retries are handled by
+    _create_completion, so the client's own retries are disabled.
     """
+    return OpenAI(api_key=api_key, timeout=AI_ATTEMPT_TIMEOUT_SECONDS, max_retries=0)
+
+
+class FunctionTimedOut(Exception):
+    pass
+
 
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            result = [None]
+_backoff = wait_random_exponential(min=1, max=AI_RETRY_MAX_WAIT_SECONDS)
 
-            def target():
-                result[0] = func(*args, **kwargs)
 
-            thread = threading.Thread(target=target)
-            thread.start()
-            thread.join(seconds)
-            if thread.is_alive():
-                raise FunctionTimedOut(f"Function timed out for {function_name}")
-            return result[0]
+def _wait_before_retry(retry_state):
+    """Wait as long as a rate limit response asks, else back off exponentially"""
+    error = retry_state.outcome.exception()
+    if isinstance(error, RateLimitError):
+        retry_after = error.response.headers.get("retry-after")
+        try:
+            return float(retry_after)
+        except (TypeError, ValueError):
+            pass
+    return _backoff(retry_state)
 
-        return wrapper
 
-    return decorator
+@retry(
+    retry=retry_if_exception_type(
+        (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+    ),
+    stop=stop_after_attempt(AI_MAX_ATTEMPTS),
+    wait=_wait_before_retry,
+    reraise=True,
+)
+def _create_completion(client, model, messages, response_format=None):
+    """Send one chat completion request, retrying transient API errors"""
+    if response_format is None:
+        return client.chat.completions.create(model=model, messages=messages)
+    return client.chat.completions.create(
+        model=model, messages=messages, response_format=response_format
+    )
 
 
-@timeout(10, "openai api")
 def generate_with_ai(
-    prompt, api_key=OPENAI_API_KEY, response_format=None, model="gpt-4o-mini"
+    prompt,
+    api_key=OPENAI_API_KEY,
+    response_format=None,
+    model="gpt-4o-mini",
+    system_prompt=DEFAULT_SYSTEM_PROMPT,
 ):
     """
     Generates text using OpenAI's API with a timeout protection.
 
     This function calls OpenAI's chat API with the provided prompt
     and handles both regular text responses and structured responses
-    using the response_format parameter.
+    using the response_format parameter. Timeouts, connection errors, rate
+    limits and server errors are retried up to AI_MAX_ATTEMPTS times.
 
     Args:
         prompt (str): The input prompt to send to the AI model
         api_key (str, optional): OpenAI API key. Defaults to environment variable.
-        response_format (dict, optional): Format specification for structured responses.
+        response_format (dict, optional): Format specification for structured responses,
+                                         see json_schema_response_format.
                                          None for unstructured text responses.
         model (str, optional): The OpenAI model to use. Defaults to "gpt-4o-mini".
+        system_prompt (str, optional): The system message sent before the prompt
 
     Returns:
         str: The generated text response from the AI model
 
-    Note:
-        This function has a 10 second timeout applied through the @timeout decorator
+    Raises:
+        FunctionTimedOut: If the last attempt does not answer within AI_ATTEMPT_TIMEOUT_SECONDS
     """
-    client = OpenAI(api_key=api_key)
-    if response_format is None:
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt},
-            ],
-        )
+    client = _get_client(api_key)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+    try:
+        completion = _create_completion(client, model, messages, response_format)
+    except APITimeoutError:
+        raise FunctionTimedOut("Function timed out for openai api")
+
+    return completion.choices[0].message.content
 
-    else:
-        completion = client.beta.chat.completions.parse(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt},
-            ],
-            response_format=response_format,
-        )
+
+async def generate_with_ai_async(
+    prompt,
+    client,
+    semaphore,
+    response_format=None,
+    model="gpt-4o-mini",
+    timeout_seconds=AI_TIMEOUT_SECONDS,
+    system_prompt=DEFAULT_SYSTEM_PROMPT,
+):
+    """
+    Asynchronous version of generate_with_ai, used to run many requests concurrently.
+
+    Args:
+        prompt (str): The input prompt to send to the AI model
+        client (AsyncOpenAI): The client shared by all concurrent requests
+        semaphore (asyncio.Semaphore): Limits the number of requests in flight
+        response_format (dict, optional): Format specification for structured responses,
+                                         see json_schema_response_format.
+                                         None for unstructured text responses.
+        model (str, optional): The OpenAI model to use. Defaults to "gpt-4o-mini".
+        timeout_seconds (int, optional): Maximum time to wait for the response
+        system_prompt (str, optional): The system message sent before the prompt
+
+    Returns:
+        str: The generated text response from the AI model
+
+    Raises:
+        FunctionTimedOut: If the request takes longer than timeout_seconds
+    """
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+    async with semaphore:
+        if response_format is None:
+            request = client.chat.completions.create(model=model, messages=messages)
+        else:
+            request = client.chat.completions.create(
+                model=model, messages=messages, response_format=response_format
+            )
+        try:
+            completion = await asyncio.wait_for(request, timeout=timeout_seconds)
+        except asyncio.TimeoutError:
+            raise FunctionTimedOut("Function timed out for openai api")
 
     return completion.choices[0].message.content
 
 
+# Same escaping as html.escape, plus newlines converted to line breaks
+_HTML_ESCAPES = {
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+    "\n": "<br>",
+}
+_HTML_ESCAPE_RE = re.compile("[&<>\"'\n]")
+
+
+def _escape_html_char(match):
+    return _HTML_ESCAPES[match.group(0)]
+
+
 def format_html_message(plain_text):
     """
     Formats a plain text string as an HTML message.
@@ -119,11 +287,10 @@ def format_html_message(plain_text):
         str: The HTML-formatted message.
     """
 
-    # Escape HTML special characters in the message
-    plain_text = html.escape(plain_text)
-
-    # Replace newlines with HTML line breaks
-    html_text = plain_text.replace("\n", "<br>")
+    # Escape HTML special characters and replace newlines with HTML line breaks
+    # in a single pass. A regex substitution is faster than str.translate here,
+    # which slows down when characters map to multi-character strings.
+    html_text = _HTML_ESCAPE_RE.sub(_escape_html_char, plain_text)
 
     # Wrap the message with HTML tags
     html_message = f"<p>{html_text}</p>"
@@ -131,26 +298,113 @@ def format_html_message(plain_text):
     return html_message
 
 
+@lru_cache(maxsize=64)
+def _compile_tag_pattern(start_tag, end_tag):
+    """Compile the pattern matching the text between two literal tags"""
+    return re.compile(f"{re.escape(start_tag)}(.*?){re.escape(end_tag)}", re.DOTALL)
+
+
 def extract_text_between_tags(text, start_tag, end_tag):
     """
     Extracts text between specified start and end tags in a string.
 
     Args:
         text (str): The source text to search within
-        start_tag (str): The opening tag or delimiter
-        end_tag (str): The closing tag or delimiter
+        start_tag (str): The opening tag or delimiter, matched literally
+        end_tag (str): The closing tag or delimiter, matched literally
 
     Returns:
         str or None: The extracted text between tags if found, None otherwise
     """
-    pattern = rf"{start_tag}(.*?){end_tag}"
-    match = re.search(pattern, text, re.DOTALL)
+    match = _compile_tag_pattern(start_tag, end_tag).search(text)
     if match:
         return match.group(1)
     else:
         return None
 
 
+# Patterns removed from an email before classification
+_QUOTED_LINE_RE = re.compile(r"^>.*$", re.MULTILINE)
+_SIGNATURE_RE = re.compile(r"^--\s*$.*", re.MULTILINE | re.DOTALL)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_BLANK_LINES_RE = re.compile(r"\s*\n\s*")
+
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    """Return the tokenizer of the classification model, or None if it can't be loaded"""
+    try:
+        return tiktoken.encoding_for_model("gpt-4o-mini")
+    except Exception as e:
+        # the encoding is downloaded on first use, which can fail without network
+        logger.warning(f"Could not load tokenizer, truncating by characters: {e}")
+        return None
+
+
+def _prepare_email(email):
+    """
+    Removes quoted replies, signature and HTML tags from an email and truncates it.
+
+    The email is truncated to LIMIT_EMAIL_TOKENS tokens, or to LIMIT_EMAIL_LENGTH
+    characters if the tokenizer is not available.
+    """
+    email = _QUOTED_LINE_RE.sub("", email)
+    email = _SIGNATURE_RE.sub("", email)
+    email = _HTML_TAG_RE.sub(" ", email)
+    email = _BLANK_LINES_RE.sub("\n", email).strip()
+
+    tokenizer = _get_tokenizer()
+    if tokenizer is None:
+        return email[:LIMIT_EMAIL_LENGTH]
+    # no need to tokenize text that is far beyond the limit
+    tokens = tokenizer.encode(email[: LIMIT_EMAIL_TOKENS * 10])
+    if len(tokens) <= LIMIT_EMAIL_TOKENS:
+        return email
+    return tokenizer.decode(tokens[:LIMIT_EMAIL_TOKENS])
+
+
+def _email_hash(email):
+    """Hash the normalized (lowercased, whitespace-collapsed) email text"""
+    normalized = " ".join(email.lower().split())
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _get_classify_cache():
+    """Return the classification cache, loading it from sqlite on first use"""
+    global _classify_cache
+    if _classify_cache is None:
+        _classify_cache = {}
+        try:
+            with sqlite3.connect(CLASSIFY_CACHE_PATH) as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS classify_cache (hash TEXT PRIMARY KEY, label TEXT)"
+                )
+                _classify_cache.update(
+                    conn.execute("SELECT hash, label FROM classify_cache")
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not load classification cache: {e}")
+    return _classify_cache
+
+
+def _store_classification(email_hash, label):
+    """Write a classification result through to the in-memory and sqlite caches"""
+    _get_classify_cache()[email_hash] = label
+    try:
+        with sqlite3.connect(CLASSIFY_CACHE_PATH) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO classify_cache (hash, label) VALUES (?, ?)",
+                (email_hash, label),
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"Could not persist classification: {e}")
+
+
+def _classification_prompt(email):
+    """Build the prompt asking the AI to classify a single email"""
+    return f"Email:\n{email}"
+
+
 def classify_email(email: str):
     """
     Classifies an email into predefined categories using AI.
@@ -165,49 +419,223 @@ def classify_email(email: str):
         dict: Classification result containing the email category label
 
     Note:
-        If the email is too long, it will be truncated to LIMIT_EMAIL_LENGTH characters.
+        Quoted replies, signatures and HTML tags are removed and the email is
+        truncated to LIMIT_EMAIL_TOKENS tokens before being sent.
+        Results are cached by a hash of the normalized email text, so identical
+        emails (newsletters, notification templates) skip the API call.
     """
-    # if email body is too long, truncate it
-    if len(email) > LIMIT_EMAIL_LENGTH:
-        email = email[:LIMIT_EMAIL_LENGTH]
+    email = _prepare_email(email)
+
+    email_hash = _email_hash(email)
+    cached_label = _get_classify_cache().get(email_hash)
+    if cached_label is not None:
+        return {"label": cached_label}
+
+    res = orjson.loads(
+        generate_with_ai(
+            _classification_prompt(email),
+            response_format=EMAIL_LABEL_FORMAT,
+            system_prompt=CLASSIFY_SYSTEM_PROMPT,
+        )
+    )
+    _store_classification(email_hash, res["label"])
+    return res
 
-    prompt = f"""
 
-    Classify the following email in one of these types:
-    To respond
-    Emails you need to respond to
+def classify_emails_batch(emails: List[str], batch_size=CLASSIFY_BATCH_SIZE):
+    """
+    Classifies several emails with one AI request per batch_size emails.
 
-    Fyi
-    Emails that don't require your response, but are important
+    Emails already in the classification cache are answered from it; the others
+    are numbered and sent together in a single prompt, so the network round-trip
+    and the instructions are paid once per batch instead of once per email.
 
-    Comment
-    Team chats in tools like Google Docs or Microsoft Office
+    Args:
+        emails (List[str]): The email texts to classify
+        batch_size (int, optional): Maximum number of emails sent in one request
 
-    Notification
-    Automated updates from tools you use
+    Returns:
+        List[dict]: Classification results, in the same order as emails
 
-    Meeting update
-    Calendar updates from Zoom, Google Meet, etc
+    Note:
+        If the model does not return exactly one label per email, the batch
+        falls back to classify_email for each of its emails.
+    """
+    emails = [_prepare_email(email) for email in emails]
+    email_hashes = [_email_hash(email) for email in emails]
+    cache = _get_classify_cache()
+
+    # Only send each distinct uncached email once
+    to_classify = {}
+    for i, email_hash in enumerate(email_hashes):
+        if email_hash not in cache:
+            to_classify.setdefault(email_hash, i)
+    to_classify = list(to_classify.values())
+
+    for start in range(0, len(to_classify), batch_size):
+        batch = to_classify[start : start + batch_size]
+        numbered_emails = "\n\n".join(
+            f"{n}. {emails[i]}" for n, i in enumerate(batch, start=1)
+        )
+        prompt = (
+            f"Classify each of the following {len(batch)} numbered emails. "
+            "Return exactly one label per email, in the same order as the emails."
+            f"\n\n{numbered_emails}"
+        )
+        res = orjson.loads(
+            generate_with_ai(
+                prompt,
+                response_format=EMAIL_LABELS_FORMAT,
+                system_prompt=CLASSIFY_SYSTEM_PROMPT,
+            )
+        )
+        batch_labels = [item["label"] for item in res["labels"]]
+        if len(batch_labels) != len(batch):
+            logger.warning(
+                f"Expected {len(batch)} labels but got {len(batch_labels)}, classifying one by one"
+            )
+            batch_labels = [classify_email(emails[i])["label"] for i in batch]
+        for i, label in zip(batch, batch_labels):
+            _store_classification(email_hashes[i], label)
 
-    Actioned
-    Emails you've sent that you're not expecting a reply to
+    return [{"label": cache[email_hash]} for email_hash in email_hashes]
 
-    Marketing
-    Marketing or cold emails.
-    
-    Here is the email to classify:
+
+async def classify_email_async(email: str, client, semaphore):
+    """
+    Asynchronous version of classify_email, sharing the same classification cache.
+
+    Args:
+        email (str): The email body text to classify
+        client (AsyncOpenAI): The client shared by all concurrent requests
+        semaphore (asyncio.Semaphore): Limits the number of requests in flight
+
+    Returns:
+        dict: Classification result containing the email category label
+    """
+    email = _prepare_email(email)
+
+    email_hash = _email_hash(email)
+    cached_label = _get_classify_cache().get(email_hash)
+    if cached_label is not None:
+        return {"label": cached_label}
+
+    res = orjson.loads(
+        await generate_with_ai_async(
+            _classification_prompt(email),
+            client,
+            semaphore,
+            response_format=EMAIL_LABEL_FORMAT,
+            system_prompt=CLASSIFY_SYSTEM_PROMPT,
+        )
+    )
+    _store_classification(email_hash, res["label"])
+    return res
+
+
+async def classify_emails_async(
+    emails: List[str], api_key=OPENAI_API_KEY, max_concurrency=AI_MAX_CONCURRENCY
+):
+    """
+    Classifies emails concurrently, with at most max_concurrency requests in flight.
+
+    Args:
+        emails (List[str]): The email texts to classify
+        api_key (str, optional): OpenAI API key. Defaults to environment variable.
+        max_concurrency (int, optional): Maximum number of simultaneous requests
+
+    Returns:
+        List[dict]: Classification results, in the same order as emails
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    # The async client is bound to the running event loop, so it is not cached
+    async with AsyncOpenAI(api_key=api_key) as client:
+        return await asyncio.gather(
+            *[classify_email_async(email, client, semaphore) for email in emails]
+        )
+
+
+def _draft_prompt(email_body, sender, receiver_name, email_subject):
+    """Build the prompt asking the AI to reply to an email"""
+    return f"""Generate a reply to the following email:
+
+    The response must be in the same language as the original email.
+
+    It should match the sender's tone (formal/informal, professional/casual, etc.).
+
+    The reply should be structured and ready to send without further modification.
+
+    Email details:
     
-    {email}
+    Sender: {sender}
+    Receiver (me): {receiver_name}
+    email_subject: {email_subject}
+    email_body: {email_body}
     
+    Craft a natural, well-structured response that aligns with the context and intent of the original message.
+    It must be ready to send as is."""
+
+
+def stream_ai_draft_response(
+    email_body: str,
+    sender: str,
+    receiver_name: str,
+    email_subject: str,
+    api_key=OPENAI_API_KEY,
+    model="gpt-4o-mini",
+):
     """
+    Streams an AI-drafted email response, see create_ai_draft_response.
 
-    res = json.loads(generate_with_ai(prompt, response_format=EmailLabel))
-    return res
+    The structured response is decoded incrementally while the tokens arrive,
+    so callers can start using the body of the draft before it is complete.
 
+    Yields:
+        str: Successive pieces of the email body text
 
-class EmailResponse(BaseModel):
-    subject_text: str
-    email_body_text: str
+    Raises:
+        ValueError: If the response can't be parsed and no text was streamed
+    """
+    client = _get_client(api_key)
+    emitted = ""
+    try:
+        with client.beta.chat.completions.stream(
+            model=model,
+            messages=[
+                {"role": "system", "content": DEFAULT_SYSTEM_PROMPT},
+                {
+                    "role": "user",
+                    "content": _draft_prompt(
+                        email_body, sender, receiver_name, email_subject
+                    ),
+                },
+            ],
+            response_format=EmailResponse,
+        ) as stream:
+            for event in stream:
+                if event.type != "content.delta" or not event.parsed:
+                    continue
+                body = event.parsed.get("email_body_text") or ""
+                if len(body) > len(emitted) and body.startswith(emitted):
+                    yield body[len(emitted) :]
+                    emitted = body
+            final = stream.get_final_completion().choices[0].message.parsed
+    except APITimeoutError:
+        raise FunctionTimedOut("Function timed out for openai api")
+
+    # No parsed response (refusal, truncated output): keep the streamed text
+    if final is None:
+        if not emitted:
+            raise ValueError("The AI draft response could not be parsed")
+        logger.warning("Draft response could not be parsed, keeping the streamed text")
+        return
+
+    # The partial decoding can lag behind the last tokens, flush what is left
+    if final.email_body_text.startswith(emitted):
+        if len(final.email_body_text) > len(emitted):
+            yield final.email_body_text[len(emitted) :]
+    else:
+        logger.warning("Streamed draft diverged from the final response")
 
 
 def create_ai_draft_response(
@@ -232,22 +660,31 @@ def create_ai_draft_response(
     Returns:
         str: A complete email body text ready to be sent as a response
     """
-    prompt = f"""Generate a reply to the following email:
+    prompt = _draft_prompt(email_body, sender, receiver_name, email_subject)
+    res = orjson.loads(generate_with_ai(prompt, response_format=EMAIL_RESPONSE_FORMAT))
+    return res["email_body_text"]
 
-    The response must be in the same language as the original email.
 
-    It should match the sender's tone (formal/informal, professional/casual, etc.).
+def create_ai_draft_responses_batch(emails, max_concurrency=AI_MAX_CONCURRENCY):
+    """
+    Generates the AI drafts of several emails concurrently.
 
-    The reply should be structured and ready to send without further modification.
+    Each draft is still its own request (see create_ai_draft_response), but they
+    are sent from up to max_concurrency threads so their latencies overlap.
 
-    Email details:
-    
-    Sender: {sender}
-    Receiver (me): {receiver_name}
-    email_subject: {email_subject}
-    email_body: {email_body}
-    
-    Craft a natural, well-structured response that aligns with the context and intent of the original message.
-    It must be ready to send as is."""
-    res = json.loads(generate_with_ai(prompt, response_format=EmailResponse))
-    return res["email_body_text"]
+    Args:
+        emails (List[tuple]): (email_body, sender, receiver_name, email_subject)
+            of each email to answer
+        max_concurrency (int, optional): Maximum number of simultaneous requests
+
+    Returns:
+        List[str]: The drafted email bodies, in the same order as emails
+    """
+    if not emails:
+        return []
+    with ThreadPoolExecutor(
+        max_workers=min(max_concurrency, len(emails)), thread_name_prefix="ai-draft"
+    ) as executor:
+        return list(
+            executor.map(lambda email: create_ai_draft_response(*email), emails)
+        )
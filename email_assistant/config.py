@@ -1,8 +1,9 @@
 from O365.category import CategoryColor
-from dotenv import load_dotenv
+from email_assistant.utils.env import load_env
+from enum import Enum
 import os
 
-load_dotenv()
+load_env()
 
 # Outlook redirect URI: must be the same as the one in the outlook app
 REDIRECT_URI_LIVE = "https://inbox-zen.com/confirmation"
@@ -12,16 +13,21 @@ REDIRECT_URI_TEST = "http://localhost:5173/confirmation"
 BUCKET_NAME = os.getenv("BUCKET_NAME")
 FOLDER_NAME = os.getenv("FOLDER_NAME")
 
-FOLDERS = [
-    "To respond",
-    "Fyi",
-    "Comment",
-    "Notification",
-    "Meeting Update",
-    # "Awaiting Reply",
-    "Actioned",
-    "Marketing",
-]
+
+class FolderLabel(str, Enum):
+    """Labels the AI can give to an email, also used as folder/category names"""
+
+    TO_RESPOND = "To respond"
+    FYI = "Fyi"
+    COMMENT = "Comment"
+    NOTIFICATION = "Notification"
+    MEETING_UPDATE = "Meeting Update"
+    # AWAITING_REPLY = "Awaiting Reply"
+    ACTIONED = "Actioned"
+    MARKETING = "Marketing"
+
+
+FOLDERS = [label.value for label in FolderLabel]
 
 
 CATEGORY_COLORS = {
@@ -35,5 +41,51 @@ CATEGORY_COLORS = {
 }
 
 
-# Maximum length of an email to be processed by the AI for categorization
+# Maximum number of tokens of an email to be processed by the AI for categorization
+LIMIT_EMAIL_TOKENS = 250
+# Maximum length in characters, used when the tokenizer is not available
 LIMIT_EMAIL_LENGTH = 1000
+
+# Maximum number of emails classified in a single AI request
+CLASSIFY_BATCH_SIZE = 20
+
+# Maximum time in seconds to wait for an answer from the AI
+AI_TIMEOUT_SECONDS = 10
+
+# Retries of generate_with_ai: each attempt is cut after AI_ATTEMPT_TIMEOUT_SECONDS
+# and retried with a random exponential backoff of at most AI_RETRY_MAX_WAIT_SECONDS
+AI_MAX_ATTEMPTS = 3
+AI_ATTEMPT_TIMEOUT_SECONDS = 5
+AI_RETRY_MAX_WAIT_SECONDS = 8
+
+# Maximum number of simultaneous requests sent to the AI by the async helpers
+AI_MAX_CONCURRENCY = 8
+
+# Local sqlite file used to persist classify_email results across invocations
+# (/tmp is the only writable location in AWS Lambda)
+CLASSIFY_CACHE_PATH = os.getenv(
+    "CLASSIFY_CACHE_PATH", "/tmp/inbox_zen_classify_cache.sqlite"
+)
+
+# Time in seconds an account's row and decrypted password are reused by
+# get_email_infos, so credential changes are picked up within that delay
+EMAIL_INFOS_TTL_SECONDS = 300
+
+# Languages tried by dateparser for email dates that are not in the RFC 2822
+# English format, e.g. DATE_LANGUAGES=en,fr to only try those two
+DATE_LANGUAGES = os.getenv(
+    "DATE_LANGUAGES",
+    "fr,en,es,de,it,pt,nl,ru,zh,ja,ko,ar,he,hi,sv,da,fi,el,tr,pl,cs,sk",
+).split(",")
+
+# Time in seconds an outlook Account, with its token loaded from S3, is reused
+# by get_account for the same email address
+OUTLOOK_ACCOUNT_TTL_SECONDS = 1800
+
+# Received emails deleted per transaction when reverting an inbox, so accounts
+# with many rows do not hold their locks in one long statement
+REVERT_DELETE_BATCH_SIZE = 10000
+
+# Time in seconds an IMAP connection released by an inbox update is kept open
+# and logged in, to be reused by the next update of the same account
+IMAP_POOL_IDLE_SECONDS = 300
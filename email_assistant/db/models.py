@@ -11,9 +11,12 @@ Tables in the database:
 """
 
 import logging
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 from psycopg2 import sql
 from contextlib import contextmanager
-from email_assistant.db.utils import get_conn
+from email_assistant.db.utils import db_transaction
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -25,7 +28,7 @@ def get_cursor():
 
     Creates a database connection and cursor, manages the transaction lifecycle,
     and ensures proper cleanup regardless of execution outcome. Automatically
-    commits successful transactions and rolls back failed ones.
+    commits successful transactions and rolls back failed ones (see db_transaction).
 
     Yields:
         psycopg2.cursor: A database cursor object for executing SQL commands
@@ -41,32 +44,40 @@ def get_cursor():
         ```
 
     Note:
-        Connections and cursors are always properly closed in the finally block,
+        Cursors are always closed and connections handed back to the pool in the finally block,
         making this safe to use in Lambda environments where connection leaks can be problematic.
     """
-    conn = None
-    cursor = None
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        yield cursor
-        conn.commit()
+        with db_transaction() as cursor:
+            yield cursor
     except Exception as e:
-        if conn:
-            conn.rollback()
         logger.error(f"Database error: {e}")
         raise
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
 
 
 class DatabaseSchema:
-    """Utility class to interact with database schema information"""
+    """Utility class to interact with database schema information
+
+    Introspection queries against information_schema are slow, so their results
+    are cached for the lifetime of the process. Call invalidate_cache() after
+    changing the schema.
+    """
+
+    @staticmethod
+    def invalidate_cache():
+        """Drop all cached schema query results"""
+        for method in (
+            DatabaseSchema.get_tables,
+            DatabaseSchema.get_table_columns,
+            DatabaseSchema.get_table_constraints,
+            DatabaseSchema.get_column_defaults_and_nullable,
+            DatabaseSchema.get_all_columns,
+            DatabaseSchema.get_all_constraints,
+        ):
+            method.cache_clear()
 
     @staticmethod
+    @lru_cache(maxsize=1)
     def get_tables():
         """Get all tables in the public schema"""
         with get_cursor() as cursor:
@@ -78,9 +89,10 @@ class DatabaseSchema:
                 ORDER BY table_name
             """
             )
-            return [table[0] for table in cursor.fetchall()]
+            return [table[0] for table in cursor]
 
     @staticmethod
+    @lru_cache(maxsize=128)
     def get_table_columns(table_name, include_details=True):
         """Get column information for a specific table
 
@@ -115,9 +127,10 @@ class DatabaseSchema:
                     """
                     ).format(sql.Literal(table_name))
                 )
-                return [col[0] for col in cursor.fetchall()]
+                return [col[0] for col in cursor]
 
     @staticmethod
+    @lru_cache(maxsize=128)
     def get_table_constraints(table_name):
         """Get constraint information for a specific table"""
         with get_cursor() as cursor:
@@ -140,6 +153,7 @@ class DatabaseSchema:
             return cursor.fetchall()
 
     @staticmethod
+    @lru_cache(maxsize=128)
     def get_column_defaults_and_nullable(table_name):
         """Get default values and nullable status for columns in a table"""
         with get_cursor() as cursor:
@@ -155,6 +169,58 @@ class DatabaseSchema:
             )
             return cursor.fetchall()
 
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def get_all_columns():
+        """Get column information for every table in the public schema in one query
+
+        Returns:
+            dict: Maps each table name to its columns, in column order, as
+                (column_name, data_type, character_maximum_length, numeric_precision,
+                numeric_scale, column_default, is_nullable) tuples
+        """
+        with get_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT table_name, column_name, data_type, character_maximum_length,
+                       numeric_precision, numeric_scale, column_default, is_nullable
+                FROM information_schema.columns
+                WHERE table_schema = 'public'
+                ORDER BY table_name, ordinal_position
+                """
+            )
+            return {
+                table_name: [row[1:] for row in rows]
+                for table_name, rows in groupby(cursor, key=itemgetter(0))
+            }
+
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def get_all_constraints():
+        """Get primary key and unique constraints for every table in one query
+
+        Returns:
+            dict: Maps each table name to a list of (column_name, constraint_type) tuples
+        """
+        with get_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT tc.table_name, kcu.column_name, tc.constraint_type
+                FROM information_schema.table_constraints tc
+                JOIN information_schema.key_column_usage kcu
+                  ON tc.constraint_catalog = kcu.constraint_catalog
+                  AND tc.constraint_schema = kcu.constraint_schema
+                  AND tc.constraint_name = kcu.constraint_name
+                WHERE tc.table_schema = 'public'
+                  AND tc.constraint_type IN ('PRIMARY KEY', 'UNIQUE')
+                ORDER BY tc.table_name, kcu.ordinal_position
+                """
+            )
+            return {
+                table_name: [row[1:] for row in rows]
+                for table_name, rows in groupby(cursor, key=itemgetter(0))
+            }
+
     @staticmethod
     def get_tables_and_columns(include_details=True):
         """Get all tables and their column information
@@ -164,12 +230,15 @@ class DatabaseSchema:
                             If False, only return column names (faster)
         """
         tables = DatabaseSchema.get_tables()
+        all_columns = DatabaseSchema.get_all_columns()
         result = {}
 
         for table_name in tables:
-            result[table_name] = DatabaseSchema.get_table_columns(
-                table_name, include_details
-            )
+            columns = all_columns.get(table_name, [])
+            if include_details:
+                result[table_name] = [column[:5] for column in columns]
+            else:
+                result[table_name] = [column[0] for column in columns]
 
         return result
 
@@ -209,11 +278,25 @@ class DatabaseSchema:
             print()
 
     @staticmethod
-    def generate_create_table_sql(table_name):
-        """Generate SQL CREATE TABLE statement for a specific table"""
-        columns = DatabaseSchema.get_table_columns(table_name)
-        constraints = DatabaseSchema.get_table_constraints(table_name)
-        defaults_nullable = DatabaseSchema.get_column_defaults_and_nullable(table_name)
+    def generate_create_table_sql(
+        table_name, columns=None, constraints=None, defaults_nullable=None
+    ):
+        """Generate SQL CREATE TABLE statement for a specific table
+
+        Args:
+            table_name: Name of the table
+            columns, constraints, defaults_nullable: Optional pre-fetched results of
+                get_table_columns, get_table_constraints and
+                get_column_defaults_and_nullable; fetched from the database if None
+        """
+        if columns is None:
+            columns = DatabaseSchema.get_table_columns(table_name)
+        if constraints is None:
+            constraints = DatabaseSchema.get_table_constraints(table_name)
+        if defaults_nullable is None:
+            defaults_nullable = DatabaseSchema.get_column_defaults_and_nullable(
+                table_name
+            )
 
         # Map column names to their constraint types
         constraint_map = {}
@@ -284,10 +367,21 @@ class DatabaseSchema:
     def generate_migration_script(output_file=None):
         """Generate SQL migration script for all tables"""
         tables = DatabaseSchema.get_tables()
+        # Fetch the schema of all tables at once instead of 3 queries per table
+        all_columns = DatabaseSchema.get_all_columns()
+        all_constraints = DatabaseSchema.get_all_constraints()
         sql_statements = []
 
         for table_name in tables:
-            sql = DatabaseSchema.generate_create_table_sql(table_name)
+            columns = all_columns.get(table_name, [])
+            sql = DatabaseSchema.generate_create_table_sql(
+                table_name,
+                columns=[column[:5] for column in columns],
+                constraints=all_constraints.get(table_name, []),
+                defaults_nullable=[
+                    (column[0], column[5], column[6], column[1]) for column in columns
+                ],
+            )
             sql_statements.append(f"-- Table: {table_name}")
             sql_statements.append(sql)
             sql_statements.append("\n")
@@ -1,12 +1,14 @@
 from email_assistant.db.utils import (
     get_engine,
     execute_query,
+    execute_values_batch,
 )
 from email_assistant.utils.email_passwords import encode_string
 from sqlalchemy import text
 from contextlib import contextmanager
 import pandas as pd
 import logging
+import io
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -41,7 +43,7 @@ def get_connection():
         connection.close()
 
 
-def get_df_from_query(query):
+def get_df_from_query(query, params=None):
     """Execute a query and return results as a pandas DataFrame
 
     Runs a SQL query against the database and converts the results into a
@@ -49,6 +51,7 @@ def get_df_from_query(query):
 
     Args:
         query (str): The SQL query to execute
+        params (dict, optional): Values for the query's :name bind parameters
 
     Returns:
         pandas.DataFrame: DataFrame containing the query results
@@ -64,7 +67,7 @@ def get_df_from_query(query):
     query = text(query)
     try:
         with get_connection() as conn:
-            df = pd.read_sql(query, con=conn)
+            df = pd.read_sql(query, con=conn, params=params)
             logger.info(f"Query returned {len(df)} rows")
             return df
     finally:
@@ -72,6 +75,92 @@ def get_df_from_query(query):
         pass
 
 
+# numpy dtype kinds that round-trip through CSV: bool, int, uint, float,
+# object/string and datetime
+COPY_DTYPE_KINDS = set("biufOUM")
+# Marker written for missing values, so that empty strings stay empty strings
+COPY_NULL = "\\N"
+
+
+def _can_copy(df):
+    """Check that every column of a DataFrame is written to CSV as COPY reads it
+
+    Object columns must only hold strings. Float columns holding whole numbers
+    and NaN (integer columns with missing values) are left to the INSERT
+    fallback, as COPY rejects their "1.0" text for an integer column.
+    """
+    for column, dtype in df.dtypes.items():
+        if dtype.kind not in COPY_DTYPE_KINDS:
+            return False
+        values = df[column].dropna()
+        if dtype.kind in "OU":
+            if not all(type(value) is str and value != COPY_NULL for value in values):
+                return False
+        elif dtype.kind == "f" and len(values) < len(df):
+            if (values == values.round()).all():
+                return False
+    return True
+
+
+def copy_from_df(conn, df, table_name):
+    """Load a DataFrame into a table with PostgreSQL COPY FROM STDIN
+
+    Args:
+        conn (SQLAlchemy Connection): An open connection, see get_connection
+        df (pandas.DataFrame): DataFrame containing the data to insert
+        table_name (str): Name of the database table to insert into
+
+    Note:
+        Missing values are written as the COPY_NULL marker, empty strings as empty fields.
+    """
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep=COPY_NULL)
+    buffer.seek(0)
+    columns = ", ".join('"' + column.replace('"', '""') + '"' for column in df.columns)
+    with conn.begin():
+        with conn.connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table_name} ({columns}) FROM STDIN "
+                f"WITH (FORMAT csv, NULL '{COPY_NULL}')",
+                buffer,
+            )
+
+
+# INSERT statements keyed by (table_name, columns), reused across invocations
+_INSERT_SQL = {}
+
+
+def _get_insert_sql(table_name, columns):
+    """Get the cached INSERT statement for a table and a tuple of columns"""
+    key = (table_name, columns)
+    if key not in _INSERT_SQL:
+        binds = ", ".join(f":p{i}" for i in range(len(columns)))
+        _INSERT_SQL[key] = text(
+            f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({binds})"
+        )
+    return _INSERT_SQL[key]
+
+
+def execute_insert_from_df(conn, df, table_name):
+    """Insert a DataFrame with a single executemany of a cached INSERT statement
+
+    Unlike to_sql, this does not reflect the target table on every call.
+
+    Args:
+        conn (SQLAlchemy Connection): An open connection, see get_connection
+        df (pandas.DataFrame): DataFrame containing the data to insert
+        table_name (str): Name of the database table to insert into
+    """
+    statement = _get_insert_sql(table_name, tuple(df.columns))
+    values = df.astype(object).where(df.notna(), None)
+    rows = [
+        {f"p{i}": value for i, value in enumerate(row)}
+        for row in values.itertuples(index=False, name=None)
+    ]
+    with conn.begin():
+        conn.execute(statement, rows)
+
+
 def insert_from_df(df, table_name, batch_size=100):
     """Append data from dataframe df to the table table_name with batching
 
@@ -90,14 +179,20 @@ def insert_from_df(df, table_name, batch_size=100):
 
     Note:
         - Uses the get_connection context manager to ensure proper connection handling
-        - For large DataFrames, data is inserted in smaller batches to avoid Lambda timeouts
-        - For smaller DataFrames (size <= batch_size), data is inserted in a single operation
-        - All operations use the SQLAlchemy to_sql method with 'append' mode
+        - DataFrames with plain column types (numbers, booleans, strings, dates) are
+          loaded in a single COPY FROM STDIN, which is much faster than INSERTs
+        - Other DataFrames fall back to INSERTs: large DataFrames are inserted with
+          the SQLAlchemy to_sql method in 'append' mode in smaller batches to avoid
+          Lambda timeouts, smaller DataFrames (size <= batch_size) in a single
+          executemany of a cached INSERT statement
     """
     try:
         with get_connection() as conn:
+            if _can_copy(df):
+                copy_from_df(conn, df, table_name)
+                logger.info(f"Copied {len(df)} rows into {table_name}")
             # Use smaller batch size for Lambda to avoid timeouts
-            if len(df) > batch_size:
+            elif len(df) > batch_size:
                 for i in range(0, len(df), batch_size):
                     chunk = df.iloc[i : i + batch_size]
                     chunk.to_sql(
@@ -106,26 +201,72 @@ def insert_from_df(df, table_name, batch_size=100):
                     logger.info(
                         f"Inserted batch {i//batch_size + 1} of {(len(df) // batch_size) + 1} into {table_name}"
                     )
-            else:
-                df.to_sql(name=table_name, con=conn, if_exists="append", index=False)
+            elif len(df) > 0:
+                execute_insert_from_df(conn, df, table_name)
                 logger.info(f"Inserted {len(df)} rows into {table_name}")
     finally:
         # Ensure we don't leave any idle connections
         pass
 
 
-def insert_new_user(user_name, user_email):
-    """Insert a new user into the users table"""
-    try:
-        query = """
+EMAIL_COLUMNS = "email, user_id, email_provider, pwd, imap_login, imap_pwd, imap_port, disconnected, last_error, imap_server"
+INSERT_USER_QUERY = """
         INSERT INTO users (username, email)
         VALUES (%s, %s)
         """
-        params = (user_name, user_email)
-        return execute_query(query, params)
-    finally:
-        # Handle any cleanup if needed
-        pass
+INSERT_EMAIL_QUERY = f"""
+        INSERT INTO email_accounts ({EMAIL_COLUMNS})
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+
+
+def insert_new_user(user_name, user_email):
+    """Insert a new user into the users table"""
+    return execute_query(INSERT_USER_QUERY, (user_name, user_email), prepared=True)
+
+
+def insert_new_users_bulk(users, page_size=500):
+    """Insert many users into the users table
+
+    Args:
+        users (list): (username, email) tuples
+        page_size (int): Maximum number of rows sent per INSERT statement
+
+    Returns:
+        int: Number of rows inserted
+    """
+    return execute_values_batch(
+        "INSERT INTO users (username, email) VALUES %s",
+        [tuple(user) for user in users],
+        page_size=page_size,
+    )
+
+
+def _row_for_email(
+    email,
+    user_id,
+    email_provider,
+    pwd=None,
+    imap_login=None,
+    imap_pwd=None,
+    imap_port=None,
+    imap_server=None,
+    disconnected=False,
+    last_error=None,
+):
+    """Build the email_accounts parameter tuple, encoding the passwords"""
+    return (
+        email,
+        user_id,
+        email_provider,
+        encode_string(pwd) if pwd else None,
+        imap_login,
+        encode_string(imap_pwd) if imap_pwd else None,
+        imap_port,
+        disconnected,
+        last_error,
+        imap_server,
+    )
 
 
 def insert_new_email(
@@ -165,25 +306,36 @@ def insert_new_email(
         Passwords are encrypted before storage using the encode_string function.
         For OAuth-authenticated providers, pwd may be an OAuth token.
     """
-    try:
-        query = """
-        INSERT INTO email_accounts (email, user_id, email_provider, pwd, imap_login, imap_pwd, imap_port, disconnected, last_error, imap_server)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        params = (
-            email,
-            user_id,
-            email_provider,
-            encode_string(pwd) if pwd else None,
-            imap_login,
-            encode_string(imap_pwd) if imap_pwd else None,
-            imap_port,
-            disconnected,
-            last_error,
-            imap_server,
-        )
+    params = _row_for_email(
+        email,
+        user_id,
+        email_provider,
+        pwd=pwd,
+        imap_login=imap_login,
+        imap_pwd=imap_pwd,
+        imap_port=imap_port,
+        imap_server=imap_server,
+        disconnected=disconnected,
+        last_error=last_error,
+    )
+    return execute_query(INSERT_EMAIL_QUERY, params, prepared=True)
 
-        return execute_query(query, params)
-    finally:
-        # Handle any cleanup if needed
-        pass
+
+def insert_new_emails_bulk(rows, page_size=500):
+    """Insert many email accounts into the email_accounts table
+
+    Args:
+        rows (list): Dicts with the keyword arguments accepted by insert_new_email
+        page_size (int): Maximum number of rows sent per INSERT statement
+
+    Returns:
+        int: Number of rows inserted
+
+    Note:
+        Passwords are encrypted exactly as in insert_new_email.
+    """
+    return execute_values_batch(
+        f"INSERT INTO email_accounts ({EMAIL_COLUMNS}) VALUES %s",
+        [_row_for_email(**row) for row in rows],
+        page_size=page_size,
+    )
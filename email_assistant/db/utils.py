@@ -1,86 +1,266 @@
+import atexit
+import hashlib
+import io
+import re
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
+from itertools import count
 import psycopg2
+from psycopg2.extras import execute_batch as execute_batch_pages, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from sqlalchemy import create_engine
-from dotenv import load_dotenv
+from email_assistant.utils.env import load_env
 import os
 import logging
-import time
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+load_env()
 
-HOST = os.getenv("HOST")
-USER = os.getenv("DB_USER")
-PWD = os.getenv("DB_PWD")
-DB = os.getenv("DB")
+_ENV = os.environ
+HOST = _ENV.get("HOST")
+USER = _ENV.get("DB_USER")
+PWD = _ENV.get("DB_PWD")
+DB = _ENV.get("DB")
 # Parse PORT to ensure it's a clean integer value by removing comments and quotes
-PORT = os.getenv("PORT", "5432")
+PORT = _ENV.get("PORT", "5432")
 
 # Global variables to store connections across Lambda invocations
 # This takes advantage of container reuse in AWS Lambda
 _engine = None
-_engine_created_time = 0
+_pool = None
 ENGINE_MAX_AGE = 300  # 5 minutes in seconds
+POOL_MIN_CONN = 1
+POOL_MAX_CONN = 10
+# Pooled connections idle for longer than this are pinged before being reused
+POOL_PING_AFTER = 30  # seconds
+# time.monotonic() after which each pooled connection, by id(), must be pinged
+_ping_deadlines = {}
 
 
 def get_engine():
     """
     Get a SQLAlchemy engine, optimized for Lambda environment.
 
-    In AWS Lambda, we can reuse connections during the lifetime of a container,
-    but we shouldn't maintain long-lived connection pools since the container
-    can be frozen/terminated at any time.
+    The engine and its connection pool are kept for the lifetime of the
+    container so warm invocations skip the TCP, TLS and auth handshake.
+    Connections are pinged before use and recycled after ENGINE_MAX_AGE, which
+    covers the container having been frozen in between.
     """
-    global _engine, _engine_created_time
-
-    # Check if engine exists and isn't too old
-    current_time = time.time()
-    if _engine is None or (current_time - _engine_created_time) > ENGINE_MAX_AGE:
-        if _engine is not None:
-            logger.info("Closing stale database engine")
-            _engine.dispose()
+    global _engine
 
+    if _engine is None:
         logger.info("Creating new database engine")
         _engine = create_engine(
             f"postgresql://{USER}:{PWD}@{HOST}:{PORT}/{DB}?sslmode=require",
-            # Don't use connection pooling for Lambda
             pool_pre_ping=True,  # Verify connection is still active
-            pool_size=1,  # Minimal pool for Lambda
+            pool_size=5,
             max_overflow=0,  # No additional connections
             pool_recycle=ENGINE_MAX_AGE,  # Recycle connections after 5 minutes
         )
-        _engine_created_time = current_time
 
     return _engine
 
 
+def get_pool():
+    """Get the psycopg2 connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        logger.info("Creating new database connection pool")
+        try:
+            _pool = ThreadedConnectionPool(
+                POOL_MIN_CONN,
+                POOL_MAX_CONN,
+                host=HOST,
+                database=DB,
+                user=USER,
+                password=PWD,
+                port=PORT,
+                sslmode="require",
+                # Set shorter timeouts for Lambda environment
+                connect_timeout=5,
+                # Set TCP keepalives
+                keepalives=1,
+                keepalives_idle=30,
+                keepalives_interval=10,
+                keepalives_count=3,
+            )
+        except Exception as e:
+            logger.error("Database connection error: %s", e)
+            raise
+    return _pool
+
+
+def _is_alive(conn):
+    """Check a pooled connection with a round trip to the server"""
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+
+
 def get_conn():
-    """Get a psycopg2 connection to the database, optimized for Lambda."""
+    """Get a psycopg2 connection from the pool, optimized for Lambda.
+
+    The pool outlives the invocation, so warm invocations reuse an open
+    connection instead of paying the TCP, TLS and auth handshake again.
+    Connections must be handed back with release_conn() instead of being closed.
+    """
+    pool = get_pool()
     try:
-        conn = psycopg2.connect(
-            host=HOST,
-            database=DB,
-            user=USER,
-            password=PWD,
-            port=PORT,
-            sslmode="require",
-            # Set shorter timeouts for Lambda environment
-            connect_timeout=5,
-            # Set TCP keepalives
-            keepalives=1,
-            keepalives_idle=30,
-            keepalives_interval=10,
-            keepalives_count=3,
-        )
-        return conn
+        while True:
+            conn = pool.getconn()
+            deadline = _ping_deadlines.pop(id(conn), None)
+            stale = deadline is not None and time.monotonic() > deadline
+            if not conn.closed and (not stale or _is_alive(conn)):
+                return conn
+            # The server dropped it, e.g. while the container was frozen
+            logger.info("Replacing dead pooled database connection")
+            pool.putconn(conn, close=True)
     except Exception as e:
-        logger.error(f"Database connection error: {e}")
+        logger.error("Database connection error: %s", e)
         raise
 
 
-def execute_query(query, params=None, max_retries=3):
+def release_conn(conn):
+    """Return a connection obtained from get_conn() to the pool."""
+    if _pool is None:
+        conn.close()
+        return
+    if not conn.closed:
+        # Never hand out a connection with a transaction still open
+        conn.rollback()
+        _ping_deadlines[id(conn)] = time.monotonic() + POOL_PING_AFTER
+    _pool.putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def db_transaction():
+    """Run several queries on one pooled connection, in a single transaction
+
+    Commits once if the block succeeds and rolls back if it raises.
+
+    Yields:
+        psycopg2.cursor: A database cursor object for executing SQL commands
+
+    Example:
+        ```
+        with db_transaction() as cursor:
+            cursor.execute("DELETE FROM received_emails WHERE email_account = %s", (email,))
+            cursor.execute("DELETE FROM email_accounts WHERE email = %s", (email,))
+        ```
+    """
+    conn = get_conn()
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        yield cursor
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        release_conn(conn)
+
+
+def stream_query(query, params=None, chunk_size=10000):
+    """Iterate over the rows of a SELECT without loading the whole result
+
+    The query runs in a server-side (named) cursor, so only chunk_size rows
+    are transferred and held in memory at a time.
+
+    Args:
+        query (str): SQL query to execute
+        params (tuple, optional): Parameters for the query to prevent SQL injection
+        chunk_size (int): Number of rows fetched per round trip
+
+    Yields:
+        tuple: One row of the result
+    """
+    conn = get_conn()
+    cursor = None
+    try:
+        cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = chunk_size
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        if cursor:
+            cursor.close()
+        release_conn(conn)
+
+
+# Server-side prepared statements are per connection: names of the statements
+# prepared on each pooled connection, least recently used first
+PREPARED_CACHE_SIZE = 128
+_prepared = weakref.WeakKeyDictionary()
+# Statements PostgreSQL can PREPARE, with %s or %% as the only placeholders
+_PREPARABLE_RE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH|VALUES)\b", re.I)
+_PLACEHOLDER_RE = re.compile(r"%s|%%")
+
+
+def _execute_prepared(cursor, query, params):
+    """Execute a query through a server-side prepared statement
+
+    The query is prepared once per connection and then only executed, which
+    skips parsing and planning it again on every call.
+
+    Returns:
+        bool: False if the query can't be prepared and was not executed
+    """
+    if (
+        not isinstance(params, (tuple, list))
+        or not _PREPARABLE_RE.match(query)
+        or ";" in query.strip().rstrip(";")
+        or "%(" in query
+    ):
+        return False
+
+    statements = _prepared.setdefault(cursor.connection, OrderedDict())
+    name = "p_" + hashlib.blake2b(query.encode(), digest_size=8).hexdigest()
+    if name in statements:
+        statements.move_to_end(name)
+    else:
+        position = count(1)
+        server_query = _PLACEHOLDER_RE.sub(
+            lambda match: "%" if match.group(0) == "%%" else f"${next(position)}",
+            query,
+        )
+        try:
+            cursor.execute(f"PREPARE {name} AS {server_query}")
+        except psycopg2.OperationalError:
+            raise
+        except psycopg2.Error as e:
+            # PREPARE aborts the transaction, the caller runs the query as is
+            logger.warning("Could not prepare query, executing it directly: %s", e)
+            cursor.connection.rollback()
+            return False
+        statements[name] = True
+        if len(statements) > PREPARED_CACHE_SIZE:
+            oldest, _ = statements.popitem(last=False)
+            cursor.execute(f"DEALLOCATE {oldest}")
+
+    if params:
+        cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {name}")
+    return True
+
+
+def execute_query(query, params=None, max_retries=3, prepared=False):
     """Execute a database query with proper error handling and retries.
 
     This function is optimized for AWS Lambda environments, ensuring proper
@@ -91,6 +271,8 @@ def execute_query(query, params=None, max_retries=3):
         query (str): SQL query to execute
         params (tuple, optional): Parameters for the query to prevent SQL injection
         max_retries (int): Maximum number of retry attempts for transient errors
+        prepared (bool): Run the query through a server-side prepared statement,
+            for hot queries executed many times per connection
 
     Returns:
         int: Number of affected rows from the query
@@ -112,9 +294,8 @@ def execute_query(query, params=None, max_retries=3):
             conn = get_conn()
             cursor = conn.cursor()
 
-            if params is None:
-                cursor.execute(query)
-            else:
+            # psycopg2 treats params=None like no params (no % interpolation)
+            if not (prepared and _execute_prepared(cursor, query, params)):
                 cursor.execute(query, params)
 
             conn.commit()
@@ -124,32 +305,134 @@ def execute_query(query, params=None, max_retries=3):
             # Operational errors are usually transient and can be retried
             retries += 1
             logger.warning(
-                f"Database operational error (attempt {retries}/{max_retries}): {e}"
+                "Database operational error (attempt %s/%s): %s",
+                retries,
+                max_retries,
+                e,
             )
             if retries > max_retries:
-                logger.error(f"Max retries exceeded for query: {query}")
+                logger.error("Max retries exceeded for query: %s", query)
                 raise
         except Exception as e:
-            logger.error(f"Database error executing query: {e}")
+            logger.error("Database error executing query: %s", e)
             raise
         finally:
             # Clean up resources properly - important in Lambda to not leave connections open
             if cursor:
                 cursor.close()
+                cursor = None
             if conn:
-                conn.close()
+                release_conn(conn)
+                conn = None
+
+
+# Plain "INSERT INTO table (columns) VALUES (%s, ...)" statements, which can be
+# replaced by a COPY. Anything else (ON CONFLICT, RETURNING, literals) can't.
+_SIMPLE_INSERT_RE = re.compile(
+    r"^\s*INSERT\s+INTO\s+([\w.]+)\s*\(([^)]+)\)\s*VALUES\s*\((\s*%s\s*(?:,\s*%s\s*)*)\)\s*;?\s*$",
+    re.IGNORECASE,
+)
+# Queries written for execute_values, with a single "VALUES %s" placeholder
+_VALUES_PLACEHOLDER_RE = re.compile(r"\bVALUES\s+%s(?!\w)", re.IGNORECASE)
+# Types _copy_text_value writes as COPY reads them, other values (dicts for
+# json columns, lists for arrays...) are left to psycopg2's adaptation
+_COPY_SCALAR_TYPES = {
+    str,
+    int,
+    float,
+    bool,
+    type(None),
+    date,
+    datetime,
+    bytes,
+    bytearray,
+    memoryview,
+}
+_COPY_TEXT_ESCAPES = str.maketrans(
+    {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+)
+
+
+def _copy_text_value(value):
+    """Serialize a value as a field of PostgreSQL's COPY text format"""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+    return str(value).translate(_COPY_TEXT_ESCAPES)
+
+
+def copy_insert(table, columns, rows):
+    """Insert rows into a table with a single COPY FROM STDIN.
+
+    COPY streams all the rows in one statement, which is much faster than
+    one INSERT per row for large batches.
+
+    Args:
+        table (str): Name of the table to insert into
+        columns (list): Names of the columns, in the order of the row values
+        rows (list): List of value tuples, one per row
+
+    Returns:
+        int: Number of rows inserted
 
+    Raises:
+        Exception: For any database errors that occur during execution
+
+    Note:
+        Rows are sent in COPY's text format and the server parses each value
+        according to its column type, as it does for query parameters.
+    """
+    if not rows:
+        return 0
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(_copy_text_value(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+        conn.commit()
+        return len(rows)
 
-def execute_batch(query, params_list):
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error("Error copying rows into %s: %s", table, e)
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            release_conn(conn)
+
+
+def execute_batch(query, params_list, page_size=1000):
     """Execute a batch of queries with the same SQL but different parameters.
 
     This function is optimized for AWS Lambda environments, ensuring proper
     connection management while executing multiple similar operations efficiently.
-    It uses executemany for better performance when inserting/updating multiple records.
+    Rows are never sent one round trip each:
+        - plain single-table INSERTs of scalar values are turned into a COPY
+          (see copy_insert)
+        - other plain INSERTs and INSERTs written with a single "VALUES %s"
+          placeholder are expanded into multi-row VALUES statements of page_size
+          rows (see execute_values_batch)
+        - other queries (UPDATE, DELETE...) are sent page_size at a time with
+          psycopg2's execute_batch
 
     Args:
         query (str): SQL query template to execute
         params_list (list): List of parameter tuples, one for each execution
+        page_size (int): Number of rows per statement or per page of statements
 
     Returns:
         int: Number of affected rows from the batch operation
@@ -165,40 +448,117 @@ def execute_batch(query, params_list):
     if not params_list:
         return 0
 
+    match = _SIMPLE_INSERT_RE.match(query)
+    if match:
+        table, columns, placeholders = match.groups()
+        columns = [column.strip() for column in columns.split(",")]
+        if len(columns) == placeholders.count("%s"):
+            if all(
+                type(value) in _COPY_SCALAR_TYPES
+                for row in params_list
+                for value in row
+            ):
+                return copy_insert(table, columns, params_list)
+            return execute_values_batch(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+                params_list,
+                page_size=page_size,
+            )
+    if _VALUES_PLACEHOLDER_RE.search(query):
+        return execute_values_batch(query, params_list, page_size=page_size)
+
     conn = None
     cursor = None
     try:
         conn = get_conn()
         cursor = conn.cursor()
 
-        # Use executemany for batch operations
-        cursor.executemany(query, params_list)
+        execute_batch_pages(cursor, query, params_list, page_size=page_size)
         conn.commit()
-        return cursor.rowcount
+        return len(params_list)
 
     except Exception as e:
         if conn:
             conn.rollback()
-        logger.error(f"Error executing batch query: {e}")
+        logger.error("Error executing batch query: %s", e)
         raise
     finally:
-        # Important to close connections in Lambda
+        # Important to hand connections back in Lambda
         if cursor:
             cursor.close()
         if conn:
-            conn.close()
+            release_conn(conn)
+
+
+def execute_values_batch(query, rows, page_size=500):
+    """Insert many rows with multi-row VALUES statements.
+
+    psycopg2's execute_values expands the single VALUES %s placeholder of the
+    query into up to page_size rows, so N rows cost about N / page_size round trips.
+
+    Args:
+        query (str): SQL query containing a single "VALUES %s" placeholder
+        rows (list): List of parameter tuples, one per row
+        page_size (int): Maximum number of rows sent per statement
+
+    Returns:
+        int: Number of rows inserted
+
+    Raises:
+        Exception: For any database errors that occur during execution
+
+    Note:
+        The entire batch is rolled back if any page fails.
+    """
+    if not rows:
+        return 0
+
+    conn = None
+    cursor = None
+    try:
+        conn = get_conn()
+        cursor = conn.cursor()
+        execute_values(cursor, query, rows, page_size=page_size)
+        conn.commit()
+        return len(rows)
+
+    except Exception as e:
+        if conn:
+            conn.rollback()
+        logger.error("Error executing values batch query: %s", e)
+        raise
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            release_conn(conn)
 
 
 # Function to explicitly close all database connections before Lambda terminates
-def cleanup_db_resources():
-    """Close database connections when Lambda execution is finishing"""
-    global _engine
+def cleanup_db_resources(close_pools=False):
+    """Release database resources when Lambda execution is finishing
+
+    The engine and connection pool are kept warm for the next invocation unless
+    close_pools is set, e.g. when the container is shutting down.
+    """
+    global _engine, _pool
+    if not close_pools:
+        return
     if _engine is not None:
         logger.info("Closing database engine")
         _engine.dispose()
         _engine = None
+    if _pool is not None:
+        logger.info("Closing database connection pool")
+        _pool.closeall()
+        _pool = None
+        _ping_deadlines.clear()
+
+
+# Close the connections cleanly when the process exits
+atexit.register(cleanup_db_resources, close_pools=True)
 
 
 if __name__ == "__main__":
     conn = get_conn()
-    pass
+    release_conn(conn)
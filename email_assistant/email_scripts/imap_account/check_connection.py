@@ -1,5 +1,11 @@
 import imaplib
 import socket
+import ssl
+
+# TLS context shared by every IMAP connection, instead of a new one per
+# IMAP4_SSL. Same settings as imaplib's own default: certificates are not
+# verified, as many user IMAP servers run with self-signed ones
+SSL_CONTEXT = ssl._create_stdlib_context()
 
 
 def check_imap_access(
@@ -23,7 +29,9 @@ def check_imap_access(
     try:
         imap_port = int(imap_port)
         # Attempt to connect to the server
-        mail = imaplib.IMAP4_SSL(imap_server, imap_port, timeout=3)
+        mail = imaplib.IMAP4_SSL(
+            imap_server, imap_port, ssl_context=SSL_CONTEXT, timeout=3
+        )
     except socket.gaierror:
         error_imap = f"Error: Unable to resolve IMAP server {imap_server}. Please check the server address."
         return False, error_imap
@@ -1,16 +1,60 @@
 # code to create a new draft message in same thread
 import imaplib
-from email.mime.text import MIMEText
+import base64
+from email.header import Header
 import time
 import logging
-from typing import Optional
+from typing import List, Optional, Tuple
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+# Largest literal a LITERAL- server (RFC 7888) accepts without a continuation
+LITERAL_MINUS_MAX_SIZE = 4096
+
+
+def _header_value(value: str) -> str:
+    """Make a header value safe to write as is: one line, RFC 2047 encoded if not ASCII"""
+    value = " ".join(value.splitlines())
+    if value.isascii():
+        return value
+    return Header(value, "utf-8").encode()
+
+
+def build_draft_message(
+    email_address: str,
+    subject: str,
+    body: str,
+    recipient: str,
+    thread_id: Optional[str] = None,
+) -> bytes:
+    """
+    Build the raw bytes of a plain text draft.
+
+    The headers are the same for every draft, so they are formatted directly
+    instead of going through the email package's MIMEText and generator.
+    ASCII bodies are sent as is, others as base64 encoded UTF-8 like MIMEText does.
+    """
+    if body.isascii():
+        charset, encoding, payload = "us-ascii", "7bit", body.encode("ascii")
+    else:
+        charset, encoding = "utf-8", "base64"
+        payload = base64.encodebytes(body.encode("utf-8"))
+
+    headers = [
+        f'Content-Type: text/plain; charset="{charset}"',
+        "MIME-Version: 1.0",
+        f"Content-Transfer-Encoding: {encoding}",
+        f"From: {_header_value(email_address)}",
+        f"To: {_header_value(recipient)}",
+        f"Subject: {_header_value(subject)}",
+    ]
+    if thread_id:
+        thread_id = _header_value(thread_id)
+        headers.append(f"In-Reply-To: {thread_id}")  # Link to the thread
+        # Helps email clients group it in a thread
+        headers.append(f"References: {thread_id}")
+    return "\n".join(headers).encode("ascii") + b"\n\n" + payload
+
 
 def create_draft_imap(
     mailbox: imaplib.IMAP4_SSL,
@@ -37,36 +81,137 @@ def create_draft_imap(
         bool: True if draft was successfully created, False otherwise
     """
     try:
-        # Create the email message
-        msg = MIMEText(body)
-        msg["From"] = email_address
-        msg["To"] = recipient
-        msg["Subject"] = subject
-
-        if thread_id:
-            msg["In-Reply-To"] = thread_id  # Link to the thread
-            msg["References"] = thread_id  # Helps email clients group it in a thread
+        # Create the email message in raw format
+        raw_msg = build_draft_message(
+            email_address, subject, body, recipient, thread_id
+        )
 
         # Select the drafts folder
         status, _ = mailbox.select(draft_folder)
         if status != "OK":
-            logger.error(f"Failed to select draft folder: {draft_folder}")
+            logger.error("Failed to select draft folder: %s", draft_folder)
             return False
 
-        # Convert email to raw format
-        raw_msg = msg.as_bytes()
-
         # Append email to the Drafts folder
         timestamp = imaplib.Time2Internaldate(time.time())  # Get the current time
         status, data = mailbox.append(draft_folder, None, timestamp, raw_msg)
 
         if status != "OK":
-            logger.error(f"Failed to create draft: {data}")
+            logger.error("Failed to create draft: %s", data)
             return False
 
-        logger.info(f"Successfully created draft email to {recipient}")
+        logger.info("Successfully created draft email to %s", recipient)
         return True
 
     except Exception as e:
-        logger.exception(f"Error creating draft email: {e}")
+        logger.exception("Error creating draft email: %s", e)
         return False
+
+
+def _non_sync_literal_limit(mailbox: imaplib.IMAP4_SSL) -> float:
+    """Size up to which the server takes literals without a "+" continuation"""
+    try:
+        status, data = mailbox.capability()
+        capabilities = data[0].decode().upper().split()
+    except Exception:
+        return 0
+    if status != "OK":
+        return 0
+    if "LITERAL+" in capabilities:
+        return float("inf")
+    if "LITERAL-" in capabilities:
+        return LITERAL_MINUS_MAX_SIZE
+    return 0
+
+
+def _pipeline_appends(
+    mailbox: imaplib.IMAP4_SSL, draft_folder: str, literals: List[bytes]
+) -> List[bool]:
+    """
+    Send every APPEND before reading any response, with non-synchronizing
+    literals, then read the tagged responses in order.
+    """
+    folder = draft_folder.encode()
+    timestamp = imaplib.Time2Internaldate(time.time()).encode()
+    tags = []
+    for literal in literals:
+        tag = mailbox._new_tag()
+        mailbox.send(
+            b"%s APPEND %s %s {%d+}\r\n%s\r\n"
+            % (tag, folder, timestamp, len(literal), literal)
+        )
+        tags.append(tag)
+
+    results = []
+    for tag in tags:
+        try:
+            status, data = mailbox._command_complete("APPEND", tag)
+        except mailbox.abort:
+            raise
+        except mailbox.error as e:
+            status, data = "BAD", e
+        if status != "OK":
+            logger.error("Failed to create draft: %s", data)
+        results.append(status == "OK")
+    return results
+
+
+def create_drafts_imap(
+    mailbox: imaplib.IMAP4_SSL,
+    email_address: str,
+    drafts: List[Tuple[str, str, str, Optional[str]]],
+    draft_folder: str = "[Gmail]/Drafts",
+) -> List[bool]:
+    """
+    Create several draft email messages with a single SELECT of the drafts folder.
+
+    When the server supports non-synchronizing literals (LITERAL+ or LITERAL-
+    for small drafts), the APPENDs are pipelined: all of them are written
+    before any response is read, which costs one round trip instead of one
+    per draft. Otherwise they are sent one after the other.
+
+    Args:
+        mailbox: An authenticated IMAP4_SSL connection
+        email_address: The sender's email address
+        drafts: The (subject, body, recipient, thread_id) of each draft
+        draft_folder: The folder where drafts are stored (default: "[Gmail]/Drafts")
+
+    Returns:
+        List[bool]: Whether each draft was successfully created
+    """
+    if not drafts:
+        return []
+    try:
+        raw_msgs = [
+            build_draft_message(email_address, subject, body, recipient, thread_id)
+            for subject, body, recipient, thread_id in drafts
+        ]
+
+        status, _ = mailbox.select(draft_folder)
+        if status != "OK":
+            logger.error("Failed to select draft folder: %s", draft_folder)
+            return [False] * len(drafts)
+
+        # Literals as APPEND sends them, with CRLF line endings
+        literals = [imaplib.MapCRLF.sub(imaplib.CRLF, raw_msg) for raw_msg in raw_msgs]
+        if (
+            len(literals) > 1
+            and not getattr(mailbox, "utf8_enabled", False)
+            and max(map(len, literals)) <= _non_sync_literal_limit(mailbox)
+        ):
+            results = _pipeline_appends(mailbox, draft_folder, literals)
+        else:
+            results = []
+            for raw_msg in raw_msgs:
+                timestamp = imaplib.Time2Internaldate(time.time())
+                status, data = mailbox.append(draft_folder, None, timestamp, raw_msg)
+                if status != "OK":
+                    logger.error("Failed to create draft: %s", data)
+                results.append(status == "OK")
+
+        logger.info("Created %s of %s drafts", sum(results), len(drafts))
+        return results
+
+    except Exception as e:
+        logger.exception("Error creating draft emails: %s", e)
+        return [False] * len(drafts)
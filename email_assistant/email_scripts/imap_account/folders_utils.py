@@ -1,59 +1,170 @@
 import imaplib
 import re
-from email_assistant.config import FOLDERS
+import threading
+import time
+import weakref
+from email_assistant.config import FOLDERS, IMAP_POOL_IDLE_SECONDS
 from email_assistant.db.utils import execute_query
+from email_assistant.email_scripts.imap_account.check_connection import SSL_CONTEXT
+
+# Separator between the attributes and the name in a LIST response line,
+# e.g. '(\HasNoChildren) "/" "INBOX"'
+_FOLDER_SEP_RE = re.compile(rb' "[|./]" ')
+
+# Login errors meaning the stored credentials are no longer valid
+_AUTH_FAILED_MESSAGES = (b"Authentication failed.", b"Invalid credentials")
+_DISCONNECT_QUERY = """UPDATE email_accounts
+    SET disconnected = TRUE, last_error = %s
+    WHERE imap_login = %s;"""
+
+# LIST response and resolved folder names of each open connection
+_folder_cache = weakref.WeakKeyDictionary()
+
+# Logged in connections released by release_mailbox, by
+# (server, port, login, password) -> (connection, monotonic release time)
+_mailbox_pool = {}
+_mailbox_pool_lock = threading.Lock()
+# Pool key of each connection opened by get_mailbox
+_mailbox_keys = weakref.WeakKeyDictionary()
+# Seconds a pooled connection has to answer the NOOP checking it is still alive
+_NOOP_TIMEOUT_SECONDS = 10
+
+
+def _logout_quietly(mailbox):
+    try:
+        mailbox.logout()
+    except Exception:
+        pass
+
+
+def _take_pooled_mailbox(key):
+    """Pop the pooled connection of key if it is still alive, closing expired ones"""
+    now = time.monotonic()
+    with _mailbox_pool_lock:
+        entry = _mailbox_pool.pop(key, None)
+        expired = [
+            pool_key
+            for pool_key, (_, released_at) in _mailbox_pool.items()
+            if now - released_at > IMAP_POOL_IDLE_SECONDS
+        ]
+        expired = [_mailbox_pool.pop(pool_key)[0] for pool_key in expired]
+    if entry is not None and now - entry[1] > IMAP_POOL_IDLE_SECONDS:
+        expired.append(entry[0])
+        entry = None
+    for mailbox in expired:
+        _logout_quietly(mailbox)
+    if entry is None:
+        return None
+
+    mailbox = entry[0]
+    try:
+        mailbox.sock.settimeout(_NOOP_TIMEOUT_SECONDS)
+        status, _ = mailbox.noop()
+        mailbox.sock.settimeout(None)
+    except (imaplib.IMAP4.error, OSError):
+        status = None
+    if status != "OK":
+        _logout_quietly(mailbox)
+        return None
+    # Folders may have changed since the connection was released
+    _folder_cache.pop(mailbox, None)
+    return mailbox
+
+
+def release_mailbox(mailbox):
+    """
+    Give back a connection of get_mailbox to be reused instead of logging out.
+
+    The connection stays logged in for IMAP_POOL_IDLE_SECONDS; connections not
+    opened by get_mailbox are logged out.
+    """
+    key = _mailbox_keys.get(mailbox)
+    if key is None:
+        _logout_quietly(mailbox)
+        return
+    with _mailbox_pool_lock:
+        previous = _mailbox_pool.get(key)
+        _mailbox_pool[key] = (mailbox, time.monotonic())
+    if previous is not None and previous[0] is not mailbox:
+        _logout_quietly(previous[0])
 
 
 def get_mailbox(imap_server, imap_port, imap_login, imap_password):
+    key = (imap_server, int(imap_port), imap_login, imap_password)
+    mailbox = _take_pooled_mailbox(key)
+    if mailbox is not None:
+        return mailbox
     try:
-        mailbox = imaplib.IMAP4_SSL(imap_server, int(imap_port))
+        mailbox = imaplib.IMAP4_SSL(
+            imap_server, int(imap_port), ssl_context=SSL_CONTEXT
+        )
         mailbox.login(imap_login, imap_password.replace(" ", ""))
+        _mailbox_keys[mailbox] = key
         return mailbox
     except (imaplib.IMAP4.error, ConnectionRefusedError) as e:
         print(e)
-        if any(
-            msg in e.args[0].decode() if isinstance(e.args[0], bytes) else e.args[0]
-            for msg in ("[AUTH] Authentication failed.", "Invalid credentials")
-        ):
-            error_text = str(e)
+        error = e.args[0] if e.args else ""
+        error_bytes = error if isinstance(error, bytes) else str(error).encode()
+        if any(msg in error_bytes for msg in _AUTH_FAILED_MESSAGES):
             # disconnect in database:
-            query = f"""UPDATE email_accounts 
-                SET disconnected = TRUE, last_error = '{error_text}'
-                WHERE imap_login = '{imap_login}';"""
-            execute_query(query)
+            execute_query(_DISCONNECT_QUERY, (str(e), imap_login), prepared=True)
         return None
 
 
-def list_folders(folder_list_data):
-    """list available folders"""
+def _parse_folders(folder_list_data):
+    """Parse the LIST response into (raw line, folder name) pairs
+
+    Lines are split as bytes, only the folder names are decoded.
+    """
     folders = []
     for folder in folder_list_data:
-        decoded_folder = folder.decode()
-        pattern = r' "\|" | "\." | "\/" '
-        decoded_folder_split = re.split(pattern, decoded_folder)
-        if len(decoded_folder_split) < 2:
-            continue
-        folders.append(decoded_folder_split[1])
+        folder_split = _FOLDER_SEP_RE.split(folder)
+        if len(folder_split) >= 2:
+            folders.append((folder, folder_split[1].decode("utf-8", "replace")))
+    return folders
+
+
+def _folder_index(folder_list_data):
+    """Map the lowercased, unquoted name of every folder to its name in the LIST response"""
+    return {
+        name.strip('"').lower(): name for _, name in _parse_folders(folder_list_data)
+    }
+
+
+def list_folders(folder_list_data):
+    """list available folders"""
+    folders = [name for _, name in _parse_folders(folder_list_data)]
     return folders, False, ""
 
 
 def get_imap_folder_from_name(folder_list_data, folder_type):
     """get folder name based on folder type; folder type can be sent, inbox or all"""
     imap_folder = None
-    for folder in folder_list_data:
-        decoded_folder = folder.decode()
-        pattern = r' "\|" | "\." | "\/" '
-
-        # Split the string using the corrected pattern
-        decoded_folder_split = re.split(pattern, decoded_folder)
-        if len(decoded_folder_split) < 2:
-            continue
-        if folder_type in decoded_folder.lower():
-            imap_folder = decoded_folder_split[1]
-        # folders.append(decoded_folder_split[1])
+    folder_type = folder_type.encode()
+    for folder, name in _parse_folders(folder_list_data):
+        if folder_type in folder.lower():
+            imap_folder = name
     return imap_folder
 
 
+def resolve_folder(mailbox, folder_type):
+    """Cached get_imap_folder_from_name for an open connection
+
+    LIST is sent on the first lookup only; later lookups, for any folder
+    type, are served from the cached response.
+    """
+    cached = _folder_cache.get(mailbox)
+    if cached is None:
+        result, data = mailbox.list()
+        if result != "OK":
+            return None
+        cached = _folder_cache[mailbox] = (data, {})
+    folder_list_data, folders = cached
+    if folder_type not in folders:
+        folders[folder_type] = get_imap_folder_from_name(folder_list_data, folder_type)
+    return folders[folder_type]
+
+
 def get_imap_separator(mailbox):
     """
     Retrieves the folder hierarchy separator used by the IMAP server.
@@ -75,6 +186,7 @@ def create_folder(mailbox, folder_name):
     try:
         folder_name = f'"{folder_name}"'
         result, data = mailbox.create(folder_name)
+        _folder_cache.pop(mailbox, None)
         if result == "OK":
             created_folder = folder_name
         else:
@@ -87,19 +199,69 @@ def create_folder(mailbox, folder_name):
         return None
 
 
+def create_folders(mailbox, folder_names):
+    """Create several folders, pipelining the CREATE commands
+
+    All the commands are sent before any response is read, so creating N
+    folders costs one round trip instead of N.
+
+    Returns:
+        list: The quoted names of the folders that were created
+    """
+    created_folders = []
+    _folder_cache.pop(mailbox, None)
+    try:
+        tags = [
+            (f'"{folder_name}"', mailbox._command("CREATE", f'"{folder_name}"'))
+            for folder_name in folder_names
+        ]
+    except Exception as e:
+        print(f"Error creating folders {folder_names}: {e}")
+        return created_folders
+    for folder_name, tag in tags:
+        try:
+            result, data = mailbox._command_complete("CREATE", tag)
+            if result == "OK":
+                created_folders.append(folder_name)
+            else:
+                print(f"Failed to create folder {folder_name}")
+        except imaplib.IMAP4.error as e:
+            print(f"Error creating folder {folder_name}: {e}")
+    return created_folders
+
+
+def to_imap_id_set(email_ids):
+    """Compress message ids into an IMAP sequence set: [1, 2, 3, 5] gives 1:3,5
+
+    The ids can be ints, str or the bytes returned by SEARCH.
+    """
+    ids = sorted({int(email_id) for email_id in email_ids})
+    ranges = []
+    for email_id in ids:
+        if ranges and email_id == ranges[-1][1] + 1:
+            ranges[-1][1] = email_id
+        else:
+            ranges.append([email_id, email_id])
+    return ",".join(
+        str(start) if start == end else f"{start}:{end}" for start, end in ranges
+    )
+
+
 def move_email_to_folder(mailbox, old_folder_name, new_folder_name, email_ids):
+    if not email_ids:
+        return
     mailbox.select(old_folder_name)
-    # Ensure email_ids are sorted from newest to oldest (optional)
-    for email_id in email_ids:
-        try:
-            # Copy the email to the new folder
-            email_id = str(email_id).encode("utf-8")
-            mailbox.copy(email_id, new_folder_name)
+    # A single COPY and STORE for all the emails: sequence numbers only change
+    # on expunge, which is done once at the end
+    id_set = to_imap_id_set(email_ids)
+    try:
+        # Copy the emails to the new folder
+        mailbox.copy(id_set, new_folder_name)
 
-            # Mark the email as deleted in the old folder
-            mailbox.store(email_id, "+FLAGS", "\\Deleted")
-        except imaplib.IMAP4.error as e:
-            print(f"Error processing email ID {email_id}: {e}")
+        # Mark the emails as deleted in the old folder
+        mailbox.store(id_set, "+FLAGS", "\\Deleted")
+    except imaplib.IMAP4.error as e:
+        print(f"Error processing email IDs {id_set}: {e}")
 
     # Expunge once after all emails are processed
     mailbox.expunge()
@@ -119,32 +281,30 @@ def label_email(mailbox, source_folder_name, label_folder_name, email_ids):
         mailbox: An authenticated IMAP mailbox object
         source_folder_name: The folder where the emails currently exist
         label_folder_name: The folder/label to add to these emails
-        email_ids: List of email IDs to label
+        email_ids: List of email IDs to label, copied with a single COPY command
 
     Returns:
         bool: True if the operation was successful, False otherwise
     """
+    if not email_ids:
+        return True
     try:
         mailbox.select(source_folder_name)
-        success = True
+        id_set = to_imap_id_set(email_ids)
 
-        for email_id in email_ids:
-            try:
-                # Convert email_id to bytes if it's not already
-                email_id = str(email_id).encode("utf-8")
-
-                # Copy the email to the label folder without deleting from source
-                result = mailbox.copy(email_id, label_folder_name)
+        try:
+            # Copy the emails to the label folder without deleting from source
+            result = mailbox.copy(id_set, label_folder_name)
 
-                if result[0] != "OK":
-                    print(f"Failed to apply label to email ID {email_id}: {result}")
-                    success = False
+            if result[0] != "OK":
+                print(f"Failed to apply label to email IDs {id_set}: {result}")
+                return False
 
-            except imaplib.IMAP4.error as e:
-                print(f"Error labeling email ID {email_id}: {e}")
-                success = False
+        except imaplib.IMAP4.error as e:
+            print(f"Error labeling email IDs {id_set}: {e}")
+            return False
 
-        return success
+        return True
     except Exception as e:
         print(f"Error in label_email function: {e}")
         return False
@@ -154,17 +314,16 @@ def check_and_create_new_folders(mailbox, folder_list=FOLDERS):
     """check if the folders exist; if not create them"""
     result, data = mailbox.list()
     if result == "OK":
-        existing_folders = []
-        for folder in data:
-            decoded_folder = folder.decode()
-            pattern = r' "\|" | "\." | "\/" '
-            decoded_folder_split = re.split(pattern, decoded_folder)
-            if len(decoded_folder_split) < 2:
-                continue
-            existing_folders.append(decoded_folder_split[1])
-        for folder in folder_list:
-            if f'"{folder}"' not in existing_folders and folder not in existing_folders:
-                create_folder(mailbox, folder)
+        existing_folders = {name for _, name in _parse_folders(data)}
+        missing_folders = [
+            folder
+            for folder in folder_list
+            if f'"{folder}"' not in existing_folders and folder not in existing_folders
+        ]
+        if missing_folders:
+            create_folders(mailbox, missing_folders)
+        else:
+            _folder_cache[mailbox] = (data, {})
         return data
     else:
         return None
@@ -218,9 +377,9 @@ def revert_folders_gmail(email_infos):
         print("Failed to retrieve folder list")
         return
 
-    result, folders_list_data = mailbox.list()
+    folders_by_name = _folder_index(folder_list_data)
     for folder in FOLDERS:
-        folder = get_imap_folder_from_name(folders_list_data, folder.lower())
+        folder = folders_by_name.get(folder.lower())
         if folder is not None:
             mailbox.select(folder)
             result, data = mailbox.search(None, "ALL")
@@ -229,7 +388,6 @@ def revert_folders_gmail(email_infos):
                 continue
             email_ids = data[0].split()
             if email_ids:
-                email_ids = [bs.decode("utf-8") for bs in email_ids]
                 move_email_to_folder(mailbox, folder, "inbox", email_ids)
             mailbox.delete(folder)
     mailbox.logout()
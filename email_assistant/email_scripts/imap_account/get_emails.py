@@ -2,6 +2,7 @@ import imaplib
 from email.header import decode_header
 import email
 import re
+from functools import lru_cache
 from typing import Optional, Tuple, List
 from datetime import datetime
 
@@ -10,14 +11,54 @@ from email_assistant.email_scripts.imap_account.utils import (
     extract_emails_from_text,
     get_body,
 )
-from email_assistant.db.utils import get_conn
-from bs4 import BeautifulSoup
-
-
-MATCH_EMAIL_RE = r"ENVELOPE.*?\"(.*?)\".*?\"(.*?)\"\)"
-
-
+from email_assistant.email_scripts.imap_account.folders_utils import to_imap_id_set
+from selectolax.lexbor import LexborHTMLParser
+
+
+# Positions of the fields in an IMAP ENVELOPE (RFC 3501, section 7.4.2)
+ENVELOPE_DATE = 0
+ENVELOPE_SUBJECT = 1
+ENVELOPE_FROM = 2
+ENVELOPE_TO = 5
+ENVELOPE_MESSAGE_ID = 9
+
+# Bytes the envelope tokenizer looks at; indexing bytes gives ints
+_DQUOTE = ord('"')
+_BACKSLASH = ord("\\")
+_LPAREN = ord("(")
+_RPAREN = ord(")")
+_LBRACE = ord("{")
+_N = ord("N")
+# \" and \\ inside a quoted string
+_QUOTED_ESCAPE_RE = re.compile(rb"\\(.)", re.DOTALL)
+
+# Bodies are treated as HTML when "<html" appears in their first characters
+HTML_SNIFF_SIZE = 2048
+
+# Bodies are fetched with one FETCH per batch, kept small enough for the
+# command length limits of servers like Gmail
+FETCH_BATCH_SIZE = 200
+_FETCH_SEQ_RE = re.compile(rb"^(\d+) \(")
+
+# Bounce notices give the failed address near the top of the message, so
+# only the start of each one is downloaded
+BOUNCE_FETCH_BYTES = 16384
+# Senders of bounce notices, and addresses of the notices themselves that
+# are not the bounced recipient
+_BOUNCE_SENDER_RE = re.compile(r"mail[- ]delivery|postmaster", re.IGNORECASE)
+_BOUNCE_IGNORED_SUFFIXES = ("@mx.google.com", "@mail.gmail.com")
+
+
+# Names and subjects repeat a lot across a mailbox (threads, newsletters), so
+# their decoded form is cached
+DECODE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
 def decode_word(encoded_name):
+    if "=?" not in encoded_name:
+        # Not an RFC 2047 encoded word, decode_header would return it as is
+        return encoded_name
     decoded_tuples = decode_header(encoded_name.strip('"'))
 
     if isinstance(decoded_tuples[0][0], str):
@@ -25,46 +66,22 @@ def decode_word(encoded_name):
     return decoded_tuples[0][0].decode(decoded_tuples[0][1] or "utf-8")
 
 
-def disconnect_imap_email(imap_login, imap_pwd, imap_server, error):
-
-    error = error.replace("'", "")
-    if len(error) < 5:
-        error = "Your email is currently disconnected. Please try logging into your account and then reconnect it in Mailead to resolve the issue."
-
-    conn = get_conn()
-    cursor = conn.cursor()
-    update_query = f"""
-        UPDATE connected_emails
-        SET disconnected = TRUE, last_error = '{error}'
-        WHERE imap_login = '{imap_login}' and imap_pwd = '{imap_pwd}' and imap_server = '{imap_server}'
-    """
-
-    cursor.execute(update_query)
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print(f"email {imap_login} disconnected")
-
-
 def get_n_last_mails_received(
-    imap_server: str,
-    imap_port: str,
-    imap_login: str,
-    imap_password: str,
+    mail: imaplib.IMAP4_SSL,
     n_last: int,
     cutoff_date: Optional[str] = None,
     mailbox_folder: str = "inbox",
 ) -> Tuple[List[str], List[str]]:
     """
-    Search Gmail inbox for the last n emails received and return the raw
+    Search a folder for the last n emails received and return the raw
     bytes of the envelope data for each email.
 
     Args:
-        receiver_email (str): The email address of the receiver.
-        password (str): The password of the receiver.
+        mail (IMAP4_SSL): An authenticated connection, see get_mailbox.
         n_last (int): Number of last emails to fetch.
         cutoff_date (Optional[str]): Only fetch emails since this date.
             Format: 'DD-MM-YYYY'.
+        mailbox_folder (str): The folder to read.
 
     Returns:
         Tuple[List[str], List[str]]: A tuple of two lists. The first list
@@ -72,39 +89,37 @@ def get_n_last_mails_received(
         second list contains the message IDs of the fetched emails.
     """
     try:
-        mail = imaplib.IMAP4_SSL(imap_server, int(imap_port))
-        mail.login(imap_login, imap_password)
-        success, _ = mail.select(mailbox_folder)
-        if success != "OK":
-            print("folder does not exist")
-            return [], []
+        success, select_data = mail.select(mailbox_folder)
     except Exception as e:
-        if "Authentication failed." in str(e):
-            disconnect_imap_email(
-                imap_login, imap_password, imap_server, "wrong imap credentials"
-            )
         print(str(e))
         return [], []
+    if success != "OK":
+        print("folder does not exist")
+        return [], []
 
     if cutoff_date is None:
-        status, messages = mail.search(None, "ALL")
+        # SELECT returns the number of messages, so the last N emails are a
+        # sequence range and no SEARCH ALL is needed
+        total = int(select_data[0] or 0)
+        emails_to_fetch_str = [
+            str(msg_id) for msg_id in range(max(1, total - n_last + 1), total + 1)
+        ]
     else:
         date_search = f'(SINCE "{cutoff_date}")'
         status, messages = mail.search(None, date_search)
-    messages = messages[0].split()
-    # Only consider the last N emails if there are more than N
-    start_index = max(0, len(messages) - n_last)
-    emails_to_fetch = messages[start_index:]
+        messages = messages[0].split()
+        # Only consider the last N emails if there are more than N
+        start_index = max(0, len(messages) - n_last)
+        emails_to_fetch = messages[start_index:]
 
-    # Convert message IDs to strings
-
-    emails_to_fetch_str = [str(msg_id, "utf-8") for msg_id in emails_to_fetch]
+        # Convert message IDs to strings
+        emails_to_fetch_str = [str(msg_id, "utf-8") for msg_id in emails_to_fetch]
     if len(emails_to_fetch_str) == 0:
         print("empty folder")
         return [], []
 
     # Fetch envelope data for the required emails
-    _, envelope_data = mail.fetch(",".join(emails_to_fetch_str), "(ENVELOPE)")
+    _, envelope_data = mail.fetch(to_imap_id_set(emails_to_fetch_str), "(ENVELOPE)")
     email_bytes = []
     previous_object = None
     for byte_object in envelope_data:
@@ -118,41 +133,137 @@ def get_n_last_mails_received(
         if previous_object is not None:
             byte_object = previous_object + byte_object
         previous_object = None
-        byte_string = byte_object.decode(errors="ignore")
 
-        email_bytes.append(byte_string)
-    mail.logout()
+        # Kept as bytes: the envelope tokenizer only decodes the fields it reads
+        email_bytes.append(byte_object)
     return email_bytes, emails_to_fetch_str
 
 
-def extract_sender_email(message):
-    # Use regular expression to extract the sender email address
-    match = re.search(MATCH_EMAIL_RE, message)
-    if match:
-        email = "@".join(match.group(2).split("NIL")[-1].split()).replace(
-            '"', ""
-        )  # Group 2 corresponds to the sender email
-        name = match.group(2).split("NIL")[0].split("((")[-1].strip()
-        # get subject
-        subject = match.group(2).split('" ((')[0]
-        subject_match = re.search(r'ENVELOPE \(".+?" "(.+?)"', message)
-        subject = subject_match.group(1) if subject_match else None
-
-        name = decode_word(name).strip('"')
-        if subject is not None:
-            subject = decode_word(subject)
+def _escaped(message, i):
+    """Tell whether ``message[i]`` is preceded by an odd number of backslashes."""
+    backslashes = 0
+    while i > backslashes and message[i - backslashes - 1] == _BACKSLASH:
+        backslashes += 1
+    return backslashes % 2 == 1
+
+
+def _decode_token(raw):
+    return raw.decode("utf-8", "replace")
+
+
+def _read_literal(message, i):
+    """Read an IMAP literal (``{n}``, CRLF, n bytes) starting at ``message[i]``.
+
+    Returns the decoded literal and the index just after it.
+    """
+    close = message.find(b"}", i)
+    if close == -1:
+        return None, len(message)
+    try:
+        size = int(message[i + 1 : close])
+    except ValueError:
+        return None, close + 1
+    start = close + 1
+    if message.startswith(b"\r\n", start):
+        start += 2
+    return _decode_token(message[start : start + size]), start + size
+
+
+def _tokenize_envelope(message):
+    """Parse the ENVELOPE of a FETCH response with a single linear scan.
+
+    The response is scanned as bytes and only the tokens are decoded. Fields
+    are returned in ENVELOPE order (date, subject, from, sender, reply-to,
+    to, cc, bcc, in-reply-to, message-id). Strings are unquoted, NIL becomes
+    None and address lists are lists of ``[name, adl, mailbox, host]``. A
+    truncated envelope yields the fields read so far; None is returned when
+    there is no ENVELOPE at all.
+    """
+    if isinstance(message, str):
+        message = message.encode()
+    start = message.find(b"ENVELOPE (")
+    if start == -1:
+        return None
+    stack = [[]]
+    i = start + len(b"ENVELOPE (")
+    n = len(message)
+    while i < n:
+        char = message[i]
+        if char == _DQUOTE:
+            end = message.find(b'"', i + 1)
+            # Skip quotes escaped by an odd number of backslashes
+            while end != -1 and _escaped(message, end):
+                end = message.find(b'"', end + 1)
+            if end == -1:
+                break
+            token = message[i + 1 : end]
+            if _BACKSLASH in token:
+                token = _QUOTED_ESCAPE_RE.sub(rb"\1", token)
+            stack[-1].append(_decode_token(token))
+            i = end + 1
+        elif char == _LPAREN:
+            stack.append([])
+            i += 1
+        elif char == _RPAREN:
+            closed = stack.pop()
+            if not stack:
+                return closed
+            stack[-1].append(closed)
+            i += 1
+        elif char == _N and message.startswith(b"NIL", i):
+            stack[-1].append(None)
+            i += 3
+        elif char == _LBRACE:
+            literal, i = _read_literal(message, i)
+            stack[-1].append(literal)
         else:
-            subject = ""
+            i += 1
+    return stack[0]
 
-        date_str = match.group(1)
-        # msg_id = message.split("NIL NIL NIL ")[-1].strip("))").replace('"', "")
-        msg_id_match = re.search(r"<([^<>]+)>", message)
-        msg_id = "<" + msg_id_match.group(1) + ">" if msg_id_match else None
-        return email, name, subject, date_str, msg_id
-    else:
-        return None, None, None, None, None
 
+def _envelope_field(fields, index):
+    if fields is None or len(fields) <= index:
+        return None
+    return fields[index]
 
+
+def _first_address(fields, index):
+    """Return the first ``[name, adl, mailbox, host]`` of an address field."""
+    addresses = _envelope_field(fields, index)
+    if not isinstance(addresses, list) or not addresses:
+        return None
+    address = addresses[0]
+    if not isinstance(address, list) or len(address) < 4:
+        return None
+    if not address[2] or not address[3]:
+        return None
+    return address
+
+
+def extract_sender_email(message):
+    return _sender_from_fields(_tokenize_envelope(message))
+
+
+def _sender_from_fields(fields):
+    sender = _first_address(fields, ENVELOPE_FROM)
+    if sender is None:
+        return None, None, None, None, None
+
+    name, _, mailbox, host = sender[:4]
+    email = f"{mailbox}@{host}"
+    name = decode_word(name).strip('"') if name else ""
+    subject = _envelope_field(fields, ENVELOPE_SUBJECT)
+    subject = decode_word(subject) if subject else ""
+    date_str = _envelope_field(fields, ENVELOPE_DATE) or ""
+    # The message-id field holds a single "<id>", sliced out without a regex
+    message_id = _envelope_field(fields, ENVELOPE_MESSAGE_ID) or ""
+    gt = message_id.rfind(">")
+    lt = message_id.rfind("<", 0, gt)
+    msg_id = message_id[lt : gt + 1] if lt != -1 and gt > lt + 1 else None
+    return email, name, subject, date_str, msg_id
+
+
+@lru_cache(maxsize=DECODE_CACHE_SIZE)
 def decode_utf8_subject(subject):
     if "=?" in subject and "?=" in subject:
         try:
@@ -172,52 +283,36 @@ def decode_utf8_subject(subject):
 
 
 def extract_subjects(email_list):
-    subjects = []
-    for email_ in email_list:
-        # Extract the entire ENVELOPE content
-        envelope_match = re.search(r"ENVELOPE\s*\((.+?)\)(?=\s*\))", email_, re.DOTALL)
-
-        if envelope_match:
-            envelope_content = envelope_match.group(1)
+    return [_subject_from_fields(_tokenize_envelope(email_)) for email_ in email_list]
 
-            # Find all quoted strings and NIL values
-            parts = re.findall(r'"([^"]*)"|\bNIL\b', envelope_content)
-
-            # The subject is typically the second non-NIL part
-            non_nil_parts = [part for part in parts if part != "NIL"]
-            subject = non_nil_parts[1] if len(non_nil_parts) > 1 else "No subject found"
-        else:
-            subject = "No subject found"
 
-        # Decode UTF-8 encoded subjects
-        subject = decode_utf8_subject(subject)
+def _subject_from_fields(fields):
+    subject = _envelope_field(fields, ENVELOPE_SUBJECT) or "No subject found"
 
-        subjects.append(subject)
-
-    return subjects
+    # Decode UTF-8 encoded subjects
+    return decode_utf8_subject(subject)
 
 
 # Two functions to extract recipients
 
 
 def extract_receiver_email(message):
-    receiver_match = re.search(r'\(\(NIL NIL "([^"]+)" "([^"]+)"\)', message)
-    if receiver_match:
-        receiver_email = f"{receiver_match.group(1)}@{receiver_match.group(2)}"
+    receiver = _first_address(_tokenize_envelope(message), ENVELOPE_TO)
+    if receiver:
+        receiver_email = f"{receiver[2]}@{receiver[3]}"
     else:
         receiver_email = None
     return receiver_email
 
 
 def extract_recipient_email(message):
-    email_pattern = re.compile(
-        r'\((?:"[^"]+"|NIL) (?:NIL )?"?([^"@() ]+)"? "([^"@() ]+)"\)'
-    )
-    emails = email_pattern.findall(message)
+    return _recipient_from_fields(_tokenize_envelope(message))
+
 
-    if len(emails) >= 4:
-        username, domain = emails[3]
-        recipient_email = f"{username}@{domain}"
+def _recipient_from_fields(fields):
+    recipient = _first_address(fields, ENVELOPE_TO)
+    if recipient:
+        recipient_email = f"{recipient[2]}@{recipient[3]}"
         return recipient_email
     else:
         return None
@@ -225,20 +320,16 @@ def extract_recipient_email(message):
 
 # main function to get emails from imap server and a given folder
 def read_last_n_last_emails(
-    imap_server: str,
-    imap_port: str,
-    imap_login: str,
-    imap_password: str,
+    mail: imaplib.IMAP4_SSL,
     n_last: int = 100,
     cutoff_date: Optional[datetime] = None,
     mailbox_folder: str = "inbox",
     extract_receiver: bool = False,
 ) -> Tuple[List[str], List[str], List[str], List[str]]:
-    """Read last n and last emails from Gmail.
+    """Read last n and last emails from a folder.
 
     Args:
-        receiver_email: The email address to read emails from.
-        password: The password of the email address.
+        mail: An authenticated connection, see get_mailbox.
         n_last: The number of last emails to read (default: 100).
         cutoff_date: The cutoff date to read emails from (default: None).
 
@@ -248,40 +339,39 @@ def read_last_n_last_emails(
     """
 
     email_bytes, all_email_ids = get_n_last_mails_received(
-        imap_server,
-        imap_port,
-        imap_login,
-        imap_password,
+        mail,
         n_last,
         cutoff_date=cutoff_date,
         mailbox_folder=mailbox_folder,
     )
+    return _parse_envelopes(email_bytes, all_email_ids, extract_receiver)
+
+
+def _parse_envelopes(email_bytes, all_email_ids, extract_receiver=False):
     all_received_email_list = []
+    email_ids = []
     all_names_list = []
     subject_list = []
     all_dates = []
     smtp_ids = []
     receiver_email_list = []
-    subject_list = extract_subjects(email_bytes)
-    for byte_string in email_bytes:
-        email, name, subject, date, msg_id = extract_sender_email(byte_string)
-        # receiver_email = (
-        #    extract_receiver_email(byte_string) if extract_receiver else None
-        # )
-        receiver_email = (
-            extract_recipient_email(byte_string) if extract_receiver else None
-        )
+    for byte_string, email_id in zip(email_bytes, all_email_ids):
+        # Each envelope is tokenized once for all the fields read from it
+        fields = _tokenize_envelope(byte_string)
+        email, name, subject, date, msg_id = _sender_from_fields(fields)
         if not isinstance(email, str):
             continue
+        receiver_email = _recipient_from_fields(fields) if extract_receiver else None
         all_received_email_list.append(email)
+        email_ids.append(email_id)
         all_names_list.append(name)
-        # subject_list.append(subject)
+        subject_list.append(_subject_from_fields(fields))
         all_dates.append(get_date_from_string(date))
         smtp_ids.append(msg_id)
         receiver_email_list.append(receiver_email)
     return (
         all_received_email_list,
-        all_email_ids,
+        email_ids,
         all_names_list,
         subject_list,
         all_dates,
@@ -290,59 +380,86 @@ def read_last_n_last_emails(
     )
 
 
+def is_html(body, sniff_size=HTML_SNIFF_SIZE):
+    """Tell whether a body is HTML by looking for ``<html`` near its start."""
+    return "<html" in body[:sniff_size].lower()
+
+
+def html_to_text(body):
+    """Return the visible text of an HTML body, one text block per line."""
+    tree = LexborHTMLParser(body)
+    tree.strip_tags(["script", "style"])
+    root = tree.body or tree.root
+    if root is None:
+        return ""
+    text = root.text(separator="\n", strip=True)
+    return "\n".join(line for line in text.split("\n") if line)
+
+
 def get_emails_body(
     mail,
     email_ids=["4693", "4694", "4695"],
     only_html=False,
     folder="inbox",
+    max_bytes=None,
 ):
     """Used to get detailed infos on email like send date and body.
-    It can take some time to fetch the email bodies."""
+    It can take some time to fetch the email bodies.
+
+    When max_bytes is set, only the first max_bytes of each message are
+    downloaded (IMAP partial fetch), so the end of long bodies is cut.
+    """
 
     mail.select(folder)
+    fetch_item = "BODY.PEEK[]" if max_bytes is None else f"BODY.PEEK[]<0.{max_bytes}>"
+
+    # One round trip per batch; the parts are matched back to their id with
+    # the sequence number that starts each "<seq> (BODY[] {size}" header
+    raw_messages = {}
+    for start in range(0, len(email_ids), FETCH_BATCH_SIZE):
+        id_set = to_imap_id_set(email_ids[start : start + FETCH_BATCH_SIZE])
+        _, msg_data = mail.fetch(id_set, f"({fetch_item})")
+        for response_part in msg_data:
+            if isinstance(response_part, tuple):
+                match = _FETCH_SEQ_RE.match(response_part[0])
+                if match:
+                    raw_messages.setdefault(int(match.group(1)), []).append(
+                        response_part[1]
+                    )
 
     all_bodies = []
     all_dates = []
     for email_id in email_ids:
-        _, msg_data = mail.fetch(email_id, "(BODY.PEEK[])")
-        for response_part in msg_data:
-            if isinstance(response_part, tuple):
-                email_message = email.message_from_bytes(response_part[1])
+        for raw_message in raw_messages.get(int(email_id), []):
+            email_message = email.message_from_bytes(raw_message)
 
-                all_dates.append(email_message["Date"])
+            all_dates.append(email_message["Date"])
 
-                body = get_body(email_message, only_html)
-                # if html, get text to decrease size
-                if "html>" in body:
-                    soup = BeautifulSoup(body, "html.parser")
-                    body = soup.get_text(separator="\n", strip=True)
-                all_bodies.append(body)
+            body = get_body(email_message, only_html)
+            # if html, get text to decrease size
+            if is_html(body):
+                body = html_to_text(body)
+            all_bodies.append(body)
     return all_bodies, all_dates
 
 
-def get_all_bounced_emails_gmail(
-    imap_server, imap_port, imap_login, imap_pwd, email_list, email_ids, emails_names
-):
+def get_all_bounced_emails_gmail(mail, email_list, email_ids, emails_names):
     """Just check in the last n email received if there is postmaster or delivery
     in email addr and then parse the email to get the email that bounced"""
 
     ids_bounced = []
     for adress, id, name in zip(email_list, email_ids, emails_names):
-        sender_lower = adress.lower() + " " + name.lower()
-        # check name first
-        if "mail delivery" in sender_lower or "postmaster" in sender_lower:
+        if _BOUNCE_SENDER_RE.search(adress) or _BOUNCE_SENDER_RE.search(name):
             ids_bounced.append(id)
 
     bodies, _ = get_emails_body(
-        imap_server, imap_port, imap_login, imap_pwd, email_ids=ids_bounced
+        mail, email_ids=ids_bounced, max_bytes=BOUNCE_FETCH_BYTES
     )
     all_bounced_emails = []
     for body in bodies:
         all_bounced_emails += extract_emails_from_text(body)
 
     all_bounced_emails = [
-        ele
-        for ele in all_bounced_emails
-        if not ele.endswith("@mx.google.com") and not ele.endswith("@mail.gmail.com")
+        ele for ele in all_bounced_emails if not ele.endswith(_BOUNCE_IGNORED_SUFFIXES)
     ]
     return all_bounced_emails
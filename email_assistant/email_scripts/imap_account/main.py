@@ -1,22 +1,30 @@
 from email_assistant.db.operations import insert_from_df, get_df_from_query
 import pandas as pd
 from email_assistant.utils.email_passwords import decode_string
+from email_assistant.config import EMAIL_INFOS_TTL_SECONDS
 from email_assistant.email_scripts.imap_account.folders_utils import (
+    to_imap_id_set,
     get_mailbox,
+    release_mailbox,
     check_and_create_new_folders,
-    get_imap_folder_from_name,
+    resolve_folder,
     # move_email_to_folder,
     label_email,
 )
-from email_assistant.email_scripts.imap_account.create_draft import create_draft_imap
+from email_assistant.email_scripts.imap_account.create_draft import create_drafts_imap
 from email_assistant.email_scripts.imap_account.get_emails import (
     read_last_n_last_emails,
     get_emails_body,
 )
 from typing import Dict, List, Set
+from types import MappingProxyType
+import time
 import logging
 
-from email_assistant.ai.utils import classify_email, create_ai_draft_response
+from email_assistant.ai.utils import (
+    classify_emails_batch,
+    create_ai_draft_responses_batch,
+)
 
 from datetime import datetime, timedelta
 import imaplib
@@ -29,33 +37,112 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+_REPLY_PREFIX_RE = re.compile(r"^(?:RE|FWD|FW):\s*", re.IGNORECASE)
+
+# Message ids looked up per SEARCH, keeps the command under ~8 KB
+REPLY_SEARCH_BATCH_SIZE = 25
+
+# email account -> (monotonic expiry time, read-only infos of get_email_infos)
+_email_infos_cache = {}
+
 
 def check_ids_not_in_table(smtp_msg_ids):
-    query = f"""
-    WITH candidate_ids (smtp_msg_id) AS (
-        VALUES {', '.join(f"('{i}')" for i in smtp_msg_ids)}
+    smtp_msg_ids = [i for i in smtp_msg_ids if i]
+    if not smtp_msg_ids:
+        return []
+    df = get_df_from_query(
+        """SELECT smtp_msg_id FROM received_emails
+        WHERE smtp_msg_id = ANY(:smtp_msg_ids)""",
+        {"smtp_msg_ids": smtp_msg_ids},
     )
-    SELECT candidate_ids.smtp_msg_id
-    FROM candidate_ids
-    LEFT JOIN received_emails ON received_emails.smtp_msg_id = candidate_ids.smtp_msg_id
-    WHERE received_emails.smtp_msg_id IS NULL;
-    """
-    df = get_df_from_query(query)
-    return df.smtp_msg_id.to_list()
+    known_ids = set(df.smtp_msg_id)
+    return [i for i in smtp_msg_ids if i not in known_ids]
 
 
 def get_email_infos(email_account):
-    query = f"""select * from email_accounts where email = '{email_account}'"""
-    email_infos = get_df_from_query(query)
+    """Return the email_accounts row of an account, with its password decrypted.
+
+    Results are cached for EMAIL_INFOS_TTL_SECONDS and returned read-only,
+    as they are shared between the callers.
+    """
+    cached = _email_infos_cache.get(email_account)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    query = "select * from email_accounts where email = :email"
+    email_infos = get_df_from_query(query, {"email": email_account})
     if len(email_infos) == 0:
         raise ValueError(f"Email account {email_account} not found in database")
     else:
         email_infos = email_infos.iloc[0]
         email_infos = email_infos.to_dict()
         email_infos["imap_pwd"] = decode_string(email_infos["imap_pwd"])
+        email_infos = MappingProxyType(email_infos)
+        _email_infos_cache[email_account] = (
+            time.monotonic() + EMAIL_INFOS_TTL_SECONDS,
+            email_infos,
+        )
         return email_infos
 
 
+def invalidate_email_infos(email_account=None):
+    """Drop the cached infos of an account, or of every account if None."""
+    if email_account is None:
+        _email_infos_cache.clear()
+    else:
+        _email_infos_cache.pop(email_account, None)
+
+
+def search_replies(mailbox, msg_ids: List[str]) -> Set[str]:
+    """
+    Find which message IDs are replied to in the selected folder.
+
+    Each batch of IDs costs two round trips: one SEARCH that ORs the
+    References and In-Reply-To criteria of every ID, then one FETCH of
+    those headers for the matches, which tells which ID each one answers.
+
+    Args:
+        mailbox: An authenticated IMAP4_SSL connection with a folder selected
+        msg_ids: List of SMTP message IDs to look for
+
+    Returns:
+        Set of the message IDs referenced by a message of the folder
+    """
+    msg_ids = [msg_id for msg_id in msg_ids if msg_id]
+    found = set()
+    for start in range(0, len(msg_ids), REPLY_SEARCH_BATCH_SIZE):
+        batch = msg_ids[start : start + REPLY_SEARCH_BATCH_SIZE]
+        criteria = " ".join(
+            f'HEADER References "{msg_id}" HEADER In-Reply-To "{msg_id}"'
+            for msg_id in batch
+        )
+        try:
+            status, data = mailbox.search(None, "OR " * (2 * len(batch) - 1) + criteria)
+            if status != "OK" or not data[0]:
+                continue
+            status, msg_data = mailbox.fetch(
+                to_imap_id_set(data[0].split()),
+                "(BODY.PEEK[HEADER.FIELDS (REFERENCES IN-REPLY-TO)])",
+            )
+            if status != "OK":
+                continue
+        except Exception as e:
+            logger.warning(f"Error searching References/In-Reply-To headers: {e}")
+            continue
+
+        headers = [
+            response_part[1].decode("utf-8", errors="replace")
+            for response_part in msg_data
+            if isinstance(response_part, tuple)
+        ]
+        found.update(
+            msg_id
+            for msg_id in batch
+            if any(msg_id in header_data for header_data in headers)
+        )
+    return found
+
+
 def get_emails_with_drafts_or_answers(mailbox, smtp_msg_ids: List[str]) -> Set[str]:
     """
     Efficiently check which emails in a list already have drafts or have been answered.
@@ -74,8 +161,7 @@ def get_emails_with_drafts_or_answers(mailbox, smtp_msg_ids: List[str]) -> Set[s
 
     try:
         # First check drafts folder
-        folder_list_data = mailbox.list()[1]
-        draft_folder = get_imap_folder_from_name(folder_list_data, "draft")
+        draft_folder = resolve_folder(mailbox, "draft")
 
         if draft_folder:
             status, _ = mailbox.select(draft_folder)
@@ -83,40 +169,17 @@ def get_emails_with_drafts_or_answers(mailbox, smtp_msg_ids: List[str]) -> Set[s
                 logger.error(f"Failed to select draft folder: {draft_folder}")
                 return emails_with_drafts_or_answers
 
-            # For each message ID, check separately for References and In-Reply-To
-            for msg_id in smtp_msg_ids:
-                # Try searching for References header
-                try:
-                    status, data = mailbox.search(None, f'HEADER References "{msg_id}"')
-                    if status == "OK" and data[0]:
-                        emails_with_drafts_or_answers.add(msg_id)
-                        logger.info(
-                            f"Found existing draft with References for message ID: {msg_id}"
-                        )
-                        continue  # Skip to next message ID if we found a match
-                except Exception as e:
-                    logger.warning(f"Error searching References header: {e}")
-
-                # Try searching for In-Reply-To header
-                try:
-                    status, data = mailbox.search(
-                        None, f'HEADER In-Reply-To "{msg_id}"'
-                    )
-                    if status == "OK" and data[0]:
-                        emails_with_drafts_or_answers.add(msg_id)
-                        logger.info(
-                            f"Found existing draft with In-Reply-To for message ID: {msg_id}"
-                        )
-                except Exception as e:
-                    logger.warning(f"Error searching In-Reply-To header: {e}")
+            for msg_id in search_replies(mailbox, smtp_msg_ids):
+                emails_with_drafts_or_answers.add(msg_id)
+                logger.info(f"Found existing draft for message ID: {msg_id}")
 
         # Check sent folder for replies
         emails_with_drafts_or_answers = check_sent_folder_for_replies(
-            mailbox, folder_list_data, smtp_msg_ids, emails_with_drafts_or_answers
+            mailbox, smtp_msg_ids, emails_with_drafts_or_answers
         )
         # Check inbox for more recent messages in the same thread
         emails_with_drafts_or_answers = check_inbox_for_thread_replies(
-            mailbox, folder_list_data, smtp_msg_ids, emails_with_drafts_or_answers
+            mailbox, smtp_msg_ids, emails_with_drafts_or_answers
         )
 
         return emails_with_drafts_or_answers
@@ -128,7 +191,6 @@ def get_emails_with_drafts_or_answers(mailbox, smtp_msg_ids: List[str]) -> Set[s
 
 def check_sent_folder_for_replies(
     mailbox: imaplib.IMAP4_SSL,
-    folder_list_data,
     smtp_msg_ids,
     emails_with_drafts_or_answers,
 ):
@@ -137,53 +199,36 @@ def check_sent_folder_for_replies(
 
     Args:
         mailbox: An authenticated IMAP4_SSL connection
-        folder_list_data: List of folders in the mailbox
         smtp_msg_ids: List of SMTP message IDs to check
         emails_with_drafts_or_answers: Set of message IDs that already have drafts
 
     Returns:
         Updated set of message IDs that have drafts or have been answered
     """
-    sent_folder = get_imap_folder_from_name(folder_list_data, "sent")
+    # Only the message IDs not already found in drafts are checked, and the
+    # folder is not even selected when there are none left
+    remaining_ids = [
+        id for id in smtp_msg_ids if id not in emails_with_drafts_or_answers
+    ]
+    if not remaining_ids:
+        return emails_with_drafts_or_answers
+
+    sent_folder = resolve_folder(mailbox, "sent")
     if sent_folder:
         status, _ = mailbox.select(sent_folder)
         if status != "OK":
             logger.error(f"Failed to select sent folder: {sent_folder}")
             return emails_with_drafts_or_answers
 
-        # For each message ID not already found in drafts, check sent folder
-        for msg_id in [
-            id for id in smtp_msg_ids if id not in emails_with_drafts_or_answers
-        ]:
-            # Try searching for References header
-            try:
-                status, data = mailbox.search(None, f'HEADER References "{msg_id}"')
-                if status == "OK" and data[0]:
-                    emails_with_drafts_or_answers.add(msg_id)
-                    logger.info(
-                        f"Found sent reply with References for message ID: {msg_id}"
-                    )
-                    continue  # Skip to next message ID if we found a match
-            except Exception as e:
-                logger.warning(f"Error searching References header: {e}")
-
-            # Try searching for In-Reply-To header
-            try:
-                status, data = mailbox.search(None, f'HEADER In-Reply-To "{msg_id}"')
-                if status == "OK" and data[0]:
-                    emails_with_drafts_or_answers.add(msg_id)
-                    logger.info(
-                        f"Found sent reply with In-Reply-To for message ID: {msg_id}"
-                    )
-            except Exception as e:
-                logger.warning(f"Error searching In-Reply-To header: {e}")
+        for msg_id in search_replies(mailbox, remaining_ids):
+            emails_with_drafts_or_answers.add(msg_id)
+            logger.info(f"Found sent reply for message ID: {msg_id}")
 
     return emails_with_drafts_or_answers
 
 
 def check_inbox_for_thread_replies(
     mailbox: imaplib.IMAP4_SSL,
-    folder_list_data,
     smtp_msg_ids: List[str],
     emails_with_drafts_or_answers: Set[str],
 ) -> Set[str]:
@@ -192,14 +237,16 @@ def check_inbox_for_thread_replies(
 
     Args:
         mailbox: An authenticated IMAP4_SSL connection
-        folder_list_data: List of folders in the mailbox
         smtp_msg_ids: List of SMTP message IDs to check
         emails_with_drafts_or_answers: Set of message IDs that already have drafts/answers
 
     Returns:
         Updated set of message IDs that have drafts or have been answered
     """
-    inbox_folder = get_imap_folder_from_name(folder_list_data, "inbox")
+    if all(id in emails_with_drafts_or_answers for id in smtp_msg_ids):
+        return emails_with_drafts_or_answers
+
+    inbox_folder = resolve_folder(mailbox, "inbox")
     if not inbox_folder:
         return emails_with_drafts_or_answers
 
@@ -209,9 +256,9 @@ def check_inbox_for_thread_replies(
         return emails_with_drafts_or_answers
 
     # For each message ID not already found in drafts or sent, check inbox
-    for msg_id in [
-        id for id in smtp_msg_ids if id not in emails_with_drafts_or_answers
-    ]:
+    for msg_id in smtp_msg_ids:
+        if msg_id in emails_with_drafts_or_answers:
+            continue
         try:
             # First, get the date of the original message
             status, data = mailbox.search(None, f'HEADER Message-ID "{msg_id}"')
@@ -248,52 +295,48 @@ def check_inbox_for_thread_replies(
                 continue
 
             # Now search for messages with the same or similar subject (RE: or FWD: prefixes)
-            clean_subject = re.sub(
-                r"^(?:RE|FWD|FW):\s*", "", original_subject, flags=re.IGNORECASE
-            )
+            clean_subject = _REPLY_PREFIX_RE.sub("", original_subject)
             search_subject = f'SUBJECT "{clean_subject}"'
 
             status, data = mailbox.search(None, search_subject)
             if status != "OK" or not data[0]:
                 continue
 
-            thread_msg_uids = data[0].split()
+            # Skip the original message
+            thread_msg_uids = [
+                uid for uid in data[0].split() if uid != original_msg_uid
+            ]
+            if not thread_msg_uids:
+                continue
 
-            # Check each message in the thread
-            for uid in thread_msg_uids:
-                if uid == original_msg_uid:
-                    continue  # Skip the original message
+            # Get the headers of every message in the thread in one FETCH
+            status, msg_data = mailbox.fetch(
+                to_imap_id_set(thread_msg_uids),
+                "(BODY.PEEK[HEADER.FIELDS (DATE REFERENCES IN-REPLY-TO)])",
+            )
+            if status != "OK":
+                continue
 
-                # Get the date of this message
-                status, msg_data = mailbox.fetch(
-                    uid, "(BODY.PEEK[HEADER.FIELDS (DATE REFERENCES IN-REPLY-TO)])"
-                )
-                if status != "OK":
+            # Check if a message is in the same thread and is newer
+            for response_part in msg_data:
+                if not isinstance(response_part, tuple):
+                    continue
+                header_data = response_part[1].decode("utf-8")
+                if msg_id not in header_data:
                     continue
 
-                # Check if this message is in the same thread and is newer
-                is_in_thread = False
+                # Get the date
                 thread_date = None
-
-                for response_part in msg_data:
-                    if isinstance(response_part, tuple):
-                        header_data = response_part[1].decode("utf-8")
-
-                        # Check if it's in the same thread
-                        if msg_id in header_data:
-                            is_in_thread = True
-
-                        # Get the date
-                        for line in header_data.splitlines():
-                            if line.startswith("Date:"):
-                                date_str = line.split(":", 1)[1].strip()
-                                try:
-                                    thread_date = parsedate_to_datetime(date_str)
-                                except ValueError:
-                                    continue
+                for line in header_data.splitlines():
+                    if line.startswith("Date:"):
+                        date_str = line.split(":", 1)[1].strip()
+                        try:
+                            thread_date = parsedate_to_datetime(date_str)
+                        except ValueError:
+                            continue
 
                 # If this message is in the same thread and is newer, mark as answered
-                if is_in_thread and thread_date and thread_date > original_date:
+                if thread_date and thread_date > original_date:
                     emails_with_drafts_or_answers.add(msg_id)
                     logger.info(
                         f"Found more recent message in the same thread for: {msg_id}"
@@ -323,95 +366,118 @@ def main(email_infos: Dict):
     if mailbox is None:
         return
 
-    folder_list_data = check_and_create_new_folders(mailbox)
-
-    inbox_folder = get_imap_folder_from_name(folder_list_data, "inbox")
-    (
-        all_received_email_list,
-        all_email_ids,
-        all_names_list,
-        subject_list,
-        all_dates,
-        smtp_ids,
-        receiver_emails,
-    ) = read_last_n_last_emails(
-        imap_server,
-        imap_port,
-        imap_login,
-        imap_pwd,
-        n_last=10,
-        mailbox_folder=inbox_folder,
-        cutoff_date=(datetime.today() - timedelta(days=1)).strftime("%d-%b-%Y"),
-    )
-    emails_data = pd.DataFrame(
-        {
-            "Email ID": all_email_ids,
-            "sender": all_names_list,
-            "Subject": subject_list,
-            "Date": all_dates,
-            "smtp_msg_id": smtp_ids,
-            "email_account": imap_login,
-            "Received Email": all_received_email_list,
-        }
-    )
-    emails_data = emails_data[
-        emails_data["Received Email"] != emails_data["email_account"]
-    ]
-    if len(emails_data) == 0:
-        return
-    ids_not_in_table = check_ids_not_in_table(smtp_ids)
-    emails_data = emails_data[emails_data["smtp_msg_id"].isin(ids_not_in_table)]
-    # fetch bodies for these emails:
-    all_bodies, all_dates = get_emails_body(mailbox, emails_data["Email ID"].to_list())
-
-    emails_data["body"] = all_bodies
-    emails_data = emails_data.iloc[::-1].reset_index(drop=True)
-    if len(emails_data) == 0:
-        return
+    try:
+        check_and_create_new_folders(mailbox)
+
+        inbox_folder = resolve_folder(mailbox, "inbox")
+        (
+            all_received_email_list,
+            all_email_ids,
+            all_names_list,
+            subject_list,
+            all_dates,
+            smtp_ids,
+            receiver_emails,
+        ) = read_last_n_last_emails(
+            mailbox,
+            n_last=10,
+            mailbox_folder=inbox_folder,
+            cutoff_date=(datetime.today() - timedelta(days=1)).strftime("%d-%b-%Y"),
+        )
+        # Skip the emails sent by the account itself and the ones already in the
+        # table on the plain lists, so the DataFrame is built once
+        keep = [
+            i
+            for i, received_email in enumerate(all_received_email_list)
+            if received_email != imap_login
+        ]
+        if len(keep) == 0:
+            return
+        ids_not_in_table = set(check_ids_not_in_table([smtp_ids[i] for i in keep]))
+        # Newest emails first
+        keep = [i for i in reversed(keep) if smtp_ids[i] in ids_not_in_table]
+        emails_data = pd.DataFrame(
+            {
+                "Email ID": [all_email_ids[i] for i in keep],
+                "sender": [all_names_list[i] for i in keep],
+                "Subject": [subject_list[i] for i in keep],
+                "Date": [all_dates[i] for i in keep],
+                "smtp_msg_id": [smtp_ids[i] for i in keep],
+                "email_account": imap_login,
+                "Received Email": [all_received_email_list[i] for i in keep],
+            }
+        )
+        # fetch bodies for these emails:
+        all_bodies, all_dates = get_emails_body(
+            mailbox, emails_data["Email ID"].to_list()
+        )
+
+        emails_data["body"] = all_bodies
+        if len(emails_data) == 0:
+            return
 
-    # Get all emails that need to be processed
-    to_respond_emails = []
-    for _, row in emails_data.iterrows():
-        new_folder = classify_email(row["Subject"] + "\n" + row.body)["label"]
-        new_folder = new_folder if " " not in new_folder else '"' + new_folder + '"'
-        # move_email_to_folder(mailbox, "inbox", new_folder, [row["Email ID"]])
-        label_email(mailbox, "inbox", new_folder, [row["Email ID"]])
-
-        # Add to list of emails that need responses
-        if "To respond" in new_folder:
-            to_respond_emails.append(row)
-
-    # If we have emails that need responses, check which ones already have drafts/answers
-    if to_respond_emails:
-        draft_folder = get_imap_folder_from_name(folder_list_data, "draft")
-        smtp_ids_to_check = [row["smtp_msg_id"] for row in to_respond_emails]
-
-        # Efficiently get all emails that already have drafts or answers
-        emails_with_drafts_or_answers = get_emails_with_drafts_or_answers(
-            mailbox, smtp_ids_to_check
+        # Get all emails that need to be processed
+        classifications = classify_emails_batch(
+            (emails_data["Subject"] + "\n" + emails_data["body"]).to_list()
         )
+        # One COPY per label instead of one per email
+        ids_by_folder = {}
+        to_respond = []
+        for email_id, classification in zip(emails_data["Email ID"], classifications):
+            new_folder = classification["label"]
+            new_folder = new_folder if " " not in new_folder else '"' + new_folder + '"'
+            ids_by_folder.setdefault(new_folder, []).append(email_id)
+            # Flag emails that need responses
+            to_respond.append("To respond" in new_folder)
+        for new_folder, email_ids in ids_by_folder.items():
+            # move_email_to_folder(mailbox, "inbox", new_folder, email_ids)
+            label_email(mailbox, "inbox", new_folder, email_ids)
+        to_respond_emails = emails_data[to_respond]
+
+        # If we have emails that need responses, check which ones already have drafts/answers
+        if len(to_respond_emails) > 0:
+            draft_folder = resolve_folder(mailbox, "draft")
+
+            # Efficiently get all emails that already have drafts or answers
+            emails_with_drafts_or_answers = get_emails_with_drafts_or_answers(
+                mailbox, to_respond_emails["smtp_msg_id"].to_list()
+            )
+            for smtp_msg_id in to_respond_emails["smtp_msg_id"]:
+                if smtp_msg_id in emails_with_drafts_or_answers:
+                    logger.info(
+                        f"Skipping draft creation for already answered/drafted email: {smtp_msg_id}"
+                    )
 
-        # Create drafts only for emails that don't already have drafts or answers
-        for row in to_respond_emails:
-            if row["smtp_msg_id"] not in emails_with_drafts_or_answers:
-                draft_body = create_ai_draft_response(
-                    row.body, row.sender, row.email_account, row.Subject
-                )
-                create_draft_imap(
-                    mailbox,
-                    imap_login,
-                    row["Subject"],
-                    draft_body,
-                    row["sender"],
-                    row["smtp_msg_id"],
-                    draft_folder=draft_folder,
-                )
-            else:
-                logger.info(
-                    f"Skipping draft creation for already answered/drafted email: {row['smtp_msg_id']}"
+            # Create drafts only for emails that don't already have drafts or answers
+            to_draft = to_respond_emails[
+                ~to_respond_emails["smtp_msg_id"].isin(emails_with_drafts_or_answers)
+            ]
+            draft_bodies = create_ai_draft_responses_batch(
+                list(
+                    zip(
+                        to_draft["body"],
+                        to_draft["sender"],
+                        to_draft["email_account"],
+                        to_draft["Subject"],
+                    )
                 )
-
-    mailbox.logout()
+            )
+            create_drafts_imap(
+                mailbox,
+                imap_login,
+                list(
+                    zip(
+                        to_draft["Subject"],
+                        draft_bodies,
+                        to_draft["sender"],
+                        to_draft["smtp_msg_id"],
+                    )
+                ),
+                draft_folder=draft_folder,
+            )
+    finally:
+        # Kept logged in for the next update of this account
+        release_mailbox(mailbox)
 
     df_to_insert = emails_data[["sender", "email_account", "smtp_msg_id"]]
     df_to_insert.loc[:, ["email_classified"]] = True
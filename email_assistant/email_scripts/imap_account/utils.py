@@ -1,37 +1,53 @@
 import re
-import dateparser
+from dateparser.date import DateDataParser
 from email.message import Message
-import quopri
+from datetime import datetime
+from email_assistant.config import DATE_LANGUAGES
+
+# An img tag up to its closing ">", attributes may span several lines
+_IMG_RE = re.compile(r"<img\s[^>]*>", re.IGNORECASE)
+_EMAIL_ADDRESS_RE = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+# Day, month name, year, hour and minute of a date string
+_DATE_RE = re.compile(r"(\d+)\s+(\w+)\s+(\d+)\s+(\d+):(\d+)")
+_DATE_FORMATS = ("%d %b %Y %H:%M", "%d %B %Y %H:%M")
+# dateparser.parse builds a new parser (and its locales) on every call when
+# given languages, so a single one is shared by all calls
+_DATE_PARSER = DateDataParser(
+    languages=DATE_LANGUAGES, settings={"PARSERS": ["absolute-time"]}
+)
 
 
 def remove_img(text):
-    return re.sub(r"<img\s+.*?>", "", text, flags=re.IGNORECASE)
+    return _IMG_RE.sub("", text)
+
+
+def _decode_payload(part: Message) -> str:
+    """Decode a part's payload with its declared charset, utf-8 by default"""
+    # get_payload(decode=True) already undoes quoted-printable/base64
+    payload = part.get_payload(decode=True)
+    try:
+        return payload.decode(part.get_content_charset() or "utf-8", errors="ignore")
+    except LookupError:
+        # Unknown charset names, e.g. "unknown-8bit"
+        return payload.decode("utf-8", errors="ignore")
 
 
 def get_body(email_message: Message, only_html: bool = False) -> str:
     if email_message.is_multipart():
-        body = ""
-        previous_body = ""
-        # If the message is multipart, iterate over its parts to find the text/plain or text/html part
+        html_parts = []
+        # If the message is multipart, iterate over its parts to keep the text/html ones
         for part in email_message.walk():
-            content_type = part.get_content_type()
-            if content_type == "text/plain":
+            if part.get_content_type() != "text/html":
                 continue
-                # new_part_to_add = part.get_payload(decode=True).decode(errors="ignore")
-                # if previous_body != new_part_to_add and not only_html:
-                #    body += new_part_to_add
-                #    previous_body = new_part_to_add
-            elif content_type == "text/html":
-                html_part = quopri.decodestring(part.get_payload(decode=True))
-                new_part_to_add = html_part.decode("utf-8", errors="ignore")
-                if previous_body != new_part_to_add:
-                    body += new_part_to_add
-                    previous_body = new_part_to_add
+            new_part_to_add = _decode_payload(part)
+            if not html_parts or html_parts[-1] != new_part_to_add:
+                html_parts.append(new_part_to_add)
+        body = "".join(html_parts)
     else:
         # If the message is not multipart, return the payload directly
         content_type = email_message.get_content_type()
         if content_type in ["text/plain", "text/html"]:
-            body = email_message.get_payload(decode=True).decode(errors="ignore")
+            body = _decode_payload(email_message)
         else:
             body = ""
     body = remove_img(body)
@@ -84,44 +100,19 @@ def get_body_v3(email_message: Message) -> str:
 
 
 def extract_emails_from_text(text):
-    pattern = r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b"
-    emails = re.findall(pattern, text)
+    emails = _EMAIL_ADDRESS_RE.findall(text)
     return list(set(emails))
 
 
 def get_date_from_string(date_string):
-    # Regular expression pattern to match the date string
-    date_pattern = r"(\d+)\s+(\w+)\s+(\d+)\s+(\d+):(\d+)"
-
-    match = re.search(date_pattern, date_string)
+    match = _DATE_RE.search(date_string)
     if match:
-        day, month_name, year, hour, minute = match.groups()
         date_string = match.group()
-        date_obj = dateparser.parse(
-            date_string,
-            languages=[
-                "fr",
-                "en",
-                "es",
-                "de",
-                "it",
-                "pt",
-                "nl",
-                "ru",
-                "zh",
-                "ja",
-                "ko",
-                "ar",
-                "he",
-                "hi",
-                "sv",
-                "da",
-                "fi",
-                "el",
-                "tr",
-                "pl",
-                "cs",
-                "sk",
-            ],
-        )
-        return date_obj
+        # RFC 2822 dates use English month names: strptime handles them
+        # without going through dateparser's per-language parsers
+        for date_format in _DATE_FORMATS:
+            try:
+                return datetime.strptime(date_string, date_format)
+            except ValueError:
+                pass
+        return _DATE_PARSER.get_date_data(date_string).date_obj
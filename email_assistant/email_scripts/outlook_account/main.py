@@ -1,26 +1,25 @@
 from O365.mailbox import MailBox
 from O365.message import Message
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import logging
 from typing import List, Dict
 
 from email_assistant.config import FOLDERS
-from email_assistant.email_scripts.outlook_account.utils_outlook import get_account
-from email_assistant.ai.utils import classify_email, create_ai_draft_response
+from email_assistant.email_scripts.outlook_account.utils_outlook import (
+    get_account,
+    get_folder_conversation_ids,
+    get_todays_messages,
+    move_messages,
+)
+from email_assistant.ai.utils import classify_emails_batch, create_ai_draft_response
 from email_assistant.db.operations import insert_from_df
 
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
 def create_folder(mailbox: MailBox, folder_name: str = "test"):
-    folders_list = mailbox.get_folders()
-    if f"{folder_name} from resource: me" not in str(folders_list):
+    if folder_name not in {folder.name for folder in mailbox.get_folders()}:
         mailbox.create_child_folder(folder_name)
         print(f"folder {folder_name} created")
 
@@ -56,18 +55,20 @@ def open_and_move_to_new_folder(
     msg_internet_ids = []
     thread_ids = []
     warmup_in_old_folder = []
-    all_subjects_to_check = messages_to_check.msg_subject.to_list()
-    all_subjects_to_check_with_re = ["RE: " + sub for sub in all_subjects_to_check]
-
-    subject_to_index = {sub: i for i, sub in enumerate(all_subjects_to_check)}
-    subject_to_index.update(
-        {sub: i for i, sub in enumerate(all_subjects_to_check_with_re)}
-    )
-    for index_msg, subj in enumerate(all_subjects_to_check):
-        for msg in messages:
-            if subj.strip().split("| mailead")[0] in msg.subject.strip():
+    # Normalize both sides once instead of for every (subject, message) pair
+    prefixes = [
+        sub.strip().split("| mailead")[0]
+        for sub in messages_to_check.msg_subject.to_list()
+    ]
+    msg_subjects = [msg.subject.strip() for msg in messages]
+    moved = set()
+    for index_msg, prefix in enumerate(prefixes):
+        for index, msg_subject in enumerate(msg_subjects):
+            if index not in moved and prefix in msg_subject:
+                msg = messages[index]
                 msg.move(new_folder)
                 msg.mark_as_read()
+                moved.add(index)
                 outlook_msg_ids.append(msg.object_id)
                 msg_internet_ids.append(msg.internet_message_id)
                 thread_ids.append(msg.conversation_id)
@@ -109,39 +110,37 @@ def get_messages_with_drafts_or_answers(
         return {}
 
     try:
-        # Check drafts folder
-        drafts_folder = mailbox.drafts_folder()
-        drafts = list(drafts_folder.get_messages())
+        # Both folders are searched at the same time, each is a separate request
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            drafts_future = executor.submit(
+                lambda: get_folder_conversation_ids(
+                    mailbox.drafts_folder(), conversation_to_msg
+                )
+            )
+            sent_future = executor.submit(
+                lambda: get_folder_conversation_ids(
+                    mailbox.sent_folder(), conversation_to_msg
+                )
+            )
+            draft_conversations = drafts_future.result()
 
         # Check which conversations have drafts
-        for draft in drafts:
-            if (
-                hasattr(draft, "conversation_id")
-                and draft.conversation_id in conversation_to_msg
-            ):
-                msg_id = conversation_to_msg[draft.conversation_id]
-                messages_with_drafts_or_answers[msg_id] = True
-                logger.info(f"Found existing draft for message ID: {msg_id}")
-
-        # Check sent folder for replies
-        sent_folder = mailbox.sent_folder()
-        sent_messages = list(sent_folder.get_messages())
+        for conversation_id in draft_conversations:
+            msg_id = conversation_to_msg[conversation_id]
+            messages_with_drafts_or_answers[msg_id] = True
+            logger.info("Found existing draft for message ID: %s", msg_id)
 
         # Check which conversations have sent replies
-        for sent_msg in sent_messages:
-            if (
-                hasattr(sent_msg, "conversation_id")
-                and sent_msg.conversation_id in conversation_to_msg
-            ):
-                msg_id = conversation_to_msg[sent_msg.conversation_id]
-                if msg_id not in messages_with_drafts_or_answers:
-                    messages_with_drafts_or_answers[msg_id] = True
-                    logger.info(f"Found sent reply for message ID: {msg_id}")
+        for conversation_id in sent_future.result():
+            msg_id = conversation_to_msg[conversation_id]
+            if msg_id not in messages_with_drafts_or_answers:
+                messages_with_drafts_or_answers[msg_id] = True
+                logger.info("Found sent reply for message ID: %s", msg_id)
 
         return messages_with_drafts_or_answers
 
     except Exception as e:
-        logger.exception(f"Error checking for existing drafts: {e}")
+        logger.exception("Error checking for existing drafts: %s", e)
         return messages_with_drafts_or_answers
 
 
@@ -158,33 +157,23 @@ def check_if_email_has_draft_or_answered(mailbox, message):
     """
     try:
         msg_id = message.internet_message_id
-        # Check drafts folder for drafts referencing this email
-        drafts_folder = mailbox.drafts_folder()
-        drafts = drafts_folder.get_messages()
-
-        for draft in drafts:
-            # Check if this draft is a reply to our message
-            if hasattr(draft, "conversation_id") and draft.conversation_id:
-                # If the draft is part of the same conversation as our message
-                if message.conversation_id == draft.conversation_id:
-                    logger.info(f"Found existing draft for message ID: {msg_id}")
-                    return True
+        if not message.conversation_id:
+            return False
+        conversation_ids = [message.conversation_id]
+        # Check drafts folder for drafts in the same conversation as our message
+        if get_folder_conversation_ids(mailbox.drafts_folder(), conversation_ids):
+            logger.info("Found existing draft for message ID: %s", msg_id)
+            return True
 
         # Check sent folder to see if this email has been answered
-        sent_folder = mailbox.sent_folder()
-        sent_messages = sent_folder.get_messages()
-
-        for sent_msg in sent_messages:
-            # Check if this sent message is a reply to our message
-            if hasattr(sent_msg, "conversation_id") and sent_msg.conversation_id:
-                if message.conversation_id == sent_msg.conversation_id:
-                    logger.info(f"Found sent reply for message ID: {msg_id}")
-                    return True
+        if get_folder_conversation_ids(mailbox.sent_folder(), conversation_ids):
+            logger.info("Found sent reply for message ID: %s", msg_id)
+            return True
 
         return False
 
     except Exception as e:
-        logger.exception(f"Error checking for existing drafts: {e}")
+        logger.exception("Error checking for existing drafts: %s", e)
         return False
 
 
@@ -213,56 +202,52 @@ def create_draft(msg: Message, draft_body_html: str):
 
 
 def create_folders_if_not_there(mailbox: MailBox, folder_list=FOLDERS):
-    folders_list = mailbox.get_folders()
+    """Create the missing folders and return all the mailbox folders by name"""
+    folders = {folder.name: folder for folder in mailbox.get_folders()}
     for folder in folder_list:
-        if folder not in str(folders_list):
-            mailbox.create_child_folder(folder)
+        if folder not in folders:
+            folders[folder] = mailbox.create_child_folder(folder)
             print(f"folder {folder} created")
+    return folders
 
 
 def main(email: str):
     account = get_account(email)
     mailbox = account.mailbox()
-    create_folders_if_not_there(mailbox)
+    folders = create_folders_if_not_there(mailbox)
 
     # get all emails from the inbox received today
     inbox = mailbox.inbox_folder()
 
-    # Get today's date at midnight (start of the day)
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    # Get tomorrow's date at midnight (end of the day)
-    tomorrow = today + timedelta(days=1)
-
-    # Create a query for emails received today
-    query = f"receivedDateTime ge {today.isoformat()}Z and receivedDateTime lt {tomorrow.isoformat()}Z"
-
-    # Use the query with get_messages
-    messages = list(inbox.get_messages(limit=100, query=query))
-
-    # get the email bodies and subjects
-    bodies = []
-    subjects = []
-    smtp_msg_ids = []
-    senders = []
+    messages = get_todays_messages(inbox)
 
     # Collect messages that need responses
     to_respond_messages = []
     to_respond_indices = []
 
-    for i, msg in enumerate(messages):
-        bodies.append(msg.body)
-        subjects.append(msg.subject)
-        smtp_msg_ids.append(msg.internet_message_id)
-        senders.append(msg.sender._address)
-        new_folder = classify_email(msg.subject + "\n" + msg.body)["label"]
-        folder = mailbox.get_folder(folder_name=new_folder)
-        msg.move(folder)
+    # Read the fields used below once per message
+    subjects = [msg.subject for msg in messages]
+    bodies = [msg.body for msg in messages]
+    senders = [msg.sender._address for msg in messages]
+    smtp_msg_ids = [msg.internet_message_id for msg in messages]
+
+    classifications = classify_emails_batch(
+        [subject + "\n" + body for subject, body in zip(subjects, bodies)]
+    )
+    # Group the messages by destination folder
+    messages_by_folder = {}
+    for i, (msg, classification) in enumerate(zip(messages, classifications)):
+        new_folder = classification["label"]
+        messages_by_folder.setdefault(new_folder, []).append(msg)
 
         # Add to list of messages that need responses
         if "To respond" in new_folder:
             to_respond_messages.append(msg)
             to_respond_indices.append(i)
 
+    for new_folder, folder_messages in messages_by_folder.items():
+        move_messages(mailbox, folder_messages, folders[new_folder])
+
     # If we have messages that need responses, check which ones already have drafts/answers
     if to_respond_messages:
         # Efficiently get all messages that already have drafts or answers
@@ -271,28 +256,28 @@ def main(email: str):
         )
 
         # Create drafts only for messages that don't already have drafts or answers
-        for msg in to_respond_messages:
-            if msg.internet_message_id not in messages_with_drafts_or_answers:
+        for i in to_respond_indices:
+            if smtp_msg_ids[i] not in messages_with_drafts_or_answers:
                 draft_body = create_ai_draft_response(
-                    msg.body, msg.sender._address, email, msg.subject
+                    bodies[i], senders[i], email, subjects[i]
                 )
-                create_draft(msg, draft_body)
+                create_draft(messages[i], draft_body)
             else:
                 logger.info(
-                    f"Skipping draft creation for already answered/drafted email: {msg.internet_message_id}"
+                    "Skipping draft creation for already answered/drafted email: %s",
+                    smtp_msg_ids[i],
                 )
 
-    emails_data = pd.DataFrame(
+    # Keep the first sender of each smtp id, like drop_duplicates would
+    sender_by_msg_id = {}
+    for sender, smtp_msg_id in zip(senders, smtp_msg_ids):
+        sender_by_msg_id.setdefault(smtp_msg_id, sender)
+    df_to_insert = pd.DataFrame(
         {
+            "sender": list(sender_by_msg_id.values()),
             "email_account": email,
-            "sender": senders,
-            "smtp_msg_id": smtp_msg_ids,
+            "smtp_msg_id": list(sender_by_msg_id),
+            "email_classified": True,
         }
     )
-    df_to_insert = emails_data[["sender", "email_account", "smtp_msg_id"]]
-    df_to_insert.loc[:, ["email_classified"]] = True
-
-    df_to_insert = df_to_insert.drop_duplicates(subset="smtp_msg_id").reset_index(
-        drop=True
-    )
     insert_from_df(df_to_insert, "received_emails")
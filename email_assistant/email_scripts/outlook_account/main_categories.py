@@ -1,19 +1,19 @@
 from O365.message import Message
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import logging
 from typing import List, Dict
 
-from email_assistant.email_scripts.outlook_account.utils_outlook import get_account
-from email_assistant.ai.utils import classify_email, create_ai_draft_response
+from email_assistant.email_scripts.outlook_account.utils_outlook import (
+    INBOX_MESSAGE_FIELDS,
+    get_account,
+    get_folder_conversation_ids,
+    get_todays_messages,
+)
+from email_assistant.ai.utils import classify_emails_batch, create_ai_draft_response
 from email_assistant.db.operations import insert_from_df
 from email_assistant.config import CATEGORY_COLORS
 
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
@@ -38,7 +38,7 @@ def create_categories_if_not_exist(
     for category_name, color in category_colors.items():
         if category_name not in existing_category_names:
             outlook_categories.create_category(category_name, color=color)
-            logger.info(f"Category '{category_name}' with color '{color}' created")
+            logger.info("Category '%s' with color '%s' created", category_name, color)
 
 
 def get_messages_with_drafts_or_answers(
@@ -71,39 +71,37 @@ def get_messages_with_drafts_or_answers(
         return {}
 
     try:
-        # Check drafts folder
-        drafts_folder = mailbox.drafts_folder()
-        drafts = list(drafts_folder.get_messages())
+        # Both folders are searched at the same time, each is a separate request
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            drafts_future = executor.submit(
+                lambda: get_folder_conversation_ids(
+                    mailbox.drafts_folder(), conversation_to_msg
+                )
+            )
+            sent_future = executor.submit(
+                lambda: get_folder_conversation_ids(
+                    mailbox.sent_folder(), conversation_to_msg
+                )
+            )
+            draft_conversations = drafts_future.result()
 
         # Check which conversations have drafts
-        for draft in drafts:
-            if (
-                hasattr(draft, "conversation_id")
-                and draft.conversation_id in conversation_to_msg
-            ):
-                msg_id = conversation_to_msg[draft.conversation_id]
-                messages_with_drafts_or_answers[msg_id] = True
-                logger.info(f"Found existing draft for message ID: {msg_id}")
-
-        # Check sent folder for replies
-        sent_folder = mailbox.sent_folder()
-        sent_messages = list(sent_folder.get_messages())
+        for conversation_id in draft_conversations:
+            msg_id = conversation_to_msg[conversation_id]
+            messages_with_drafts_or_answers[msg_id] = True
+            logger.info("Found existing draft for message ID: %s", msg_id)
 
         # Check which conversations have sent replies
-        for sent_msg in sent_messages:
-            if (
-                hasattr(sent_msg, "conversation_id")
-                and sent_msg.conversation_id in conversation_to_msg
-            ):
-                msg_id = conversation_to_msg[sent_msg.conversation_id]
-                if msg_id not in messages_with_drafts_or_answers:
-                    messages_with_drafts_or_answers[msg_id] = True
-                    logger.info(f"Found sent reply for message ID: {msg_id}")
+        for conversation_id in sent_future.result():
+            msg_id = conversation_to_msg[conversation_id]
+            if msg_id not in messages_with_drafts_or_answers:
+                messages_with_drafts_or_answers[msg_id] = True
+                logger.info("Found sent reply for message ID: %s", msg_id)
 
         return messages_with_drafts_or_answers
 
     except Exception as e:
-        logger.exception(f"Error checking for existing drafts: {e}")
+        logger.exception("Error checking for existing drafts: %s", e)
         return messages_with_drafts_or_answers
 
 
@@ -145,22 +143,8 @@ def main(email: str):
     # Get all emails from the inbox received today
     inbox = mailbox.inbox_folder()
 
-    # Get today's date at midnight (start of the day)
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    # Get tomorrow's date at midnight (end of the day)
-    tomorrow = today + timedelta(days=1)
-
-    # Create a query for emails received today
-    query = f"receivedDateTime ge {today.isoformat()}Z and receivedDateTime lt {tomorrow.isoformat()}Z"
-
-    # Use the query with get_messages
-    messages = list(inbox.get_messages(limit=100, query=query))
-
-    # get the email bodies and subjects
-    bodies = []
-    subjects = []
-    smtp_msg_ids = []
-    senders = []
+    # The existing categories are needed so that add_category keeps them
+    messages = get_todays_messages(inbox, fields=INBOX_MESSAGE_FIELDS + ("categories",))
 
     # Collect messages that need responses
     to_respond_messages = []
@@ -174,16 +158,20 @@ def main(email: str):
 
     all_smtp_msg_ids = [msg.internet_message_id for msg in messages]
 
-    ids_not_in_table = check_ids_not_in_table(all_smtp_msg_ids)
-    for i, msg in enumerate(messages):
-        if msg.internet_message_id not in ids_not_in_table:
-            continue
-        bodies.append(msg.body)
-        subjects.append(msg.subject)
-        smtp_msg_ids.append(msg.internet_message_id)
-        senders.append(msg.sender._address)
-        # Classify the email
-        category_name = classify_email(msg.subject + "\n" + msg.body)["label"]
+    ids_not_in_table = set(check_ids_not_in_table(all_smtp_msg_ids))
+    messages = [msg for msg in messages if msg.internet_message_id in ids_not_in_table]
+    # Read the fields used below once per message
+    subjects = [msg.subject for msg in messages]
+    bodies = [msg.body for msg in messages]
+    senders = [msg.sender._address for msg in messages]
+    smtp_msg_ids = [msg.internet_message_id for msg in messages]
+
+    # Classify all new emails in batched AI requests
+    classifications = classify_emails_batch(
+        [subject + "\n" + body for subject, body in zip(subjects, bodies)]
+    )
+    for i, (msg, classification) in enumerate(zip(messages, classifications)):
+        category_name = classification["label"]
 
         # Get the category object
         if category_name in categories_dict:
@@ -195,15 +183,17 @@ def main(email: str):
                 # Save the changes to persist the category
                 msg.save_message()
                 logger.info(
-                    f"Applied category '{category_name}' to message with subject: {msg.subject}"
+                    "Applied category '%s' to message with subject: %s",
+                    category_name,
+                    msg.subject,
                 )
             except Exception as e:
                 logger.warning(
-                    f"Failed to apply category '{category_name}' to message: {e}"
+                    "Failed to apply category '%s' to message: %s", category_name, e
                 )
         else:
             logger.warning(
-                f"Category '{category_name}' not found in categories dictionary"
+                "Category '%s' not found in categories dictionary", category_name
             )
 
         # Add to list of messages that need responses
@@ -219,28 +209,28 @@ def main(email: str):
         )
 
         # Create drafts only for messages that don't already have drafts or answers
-        for msg in to_respond_messages:
-            if msg.internet_message_id not in messages_with_drafts_or_answers:
+        for i in to_respond_indices:
+            if smtp_msg_ids[i] not in messages_with_drafts_or_answers:
                 draft_body = create_ai_draft_response(
-                    msg.body, msg.sender._address, email, msg.subject
+                    bodies[i], senders[i], email, subjects[i]
                 )
-                create_draft(msg, draft_body)
+                create_draft(messages[i], draft_body)
             else:
                 logger.info(
-                    f"Skipping draft creation for already answered/drafted email: {msg.internet_message_id}"
+                    "Skipping draft creation for already answered/drafted email: %s",
+                    smtp_msg_ids[i],
                 )
 
-    emails_data = pd.DataFrame(
+    # Keep the first sender of each smtp id, like drop_duplicates would
+    sender_by_msg_id = {}
+    for sender, smtp_msg_id in zip(senders, smtp_msg_ids):
+        sender_by_msg_id.setdefault(smtp_msg_id, sender)
+    df_to_insert = pd.DataFrame(
         {
+            "sender": list(sender_by_msg_id.values()),
             "email_account": email,
-            "sender": senders,
-            "smtp_msg_id": smtp_msg_ids,
+            "smtp_msg_id": list(sender_by_msg_id),
+            "email_classified": True,
         }
     )
-    df_to_insert = emails_data[["sender", "email_account", "smtp_msg_id"]]
-    df_to_insert.loc[:, ["email_classified"]] = True
-
-    df_to_insert = df_to_insert.drop_duplicates(subset="smtp_msg_id").reset_index(
-        drop=True
-    )
     insert_from_df(df_to_insert, "received_emails")
@@ -1,4 +1,7 @@
-from email_assistant.email_scripts.outlook_account.utils_outlook import get_account
+from email_assistant.email_scripts.outlook_account.utils_outlook import (
+    get_account,
+    invalidate_account,
+)
 
 
 # def get_folder(email: str, folder_name: str = "inbox"):
@@ -31,4 +34,6 @@ def check_access_to_outlook(email_addr: str):
         return True
     except Exception as e:
         print(f"Error checking access to outlook: {e}")
+        # Reload the token next time instead of reusing this account
+        invalidate_account(email_addr)
         return False
@@ -1,13 +1,13 @@
 from email_assistant.email_scripts.outlook_account.utils_outlook import (
     get_account,
+    invalidate_account,
     save_text_to_s3,
 )
 from email_assistant.config import BUCKET_NAME, FOLDER_NAME
 import json
 from email_assistant.db.operations import insert_from_df
 import pandas as pd
-from email_assistant.db.utils import get_engine
-from email_assistant.db.operations import insert_new_email
+from email_assistant.db.operations import get_df_from_query, insert_new_email
 
 from typing import Tuple
 
@@ -15,11 +15,9 @@ from email_assistant.config import REDIRECT_URI_LIVE, REDIRECT_URI_TEST
 
 
 def get_state(user_id: str):
-    engine = get_engine()
-    query = f"""SELECT * FROM outlook_states WHERE user_id = '{user_id}' ORDER BY created_at DESC 
-    LIMIT 1"""
-    with engine.connect() as conn:
-        return pd.read_sql(query, con=conn)
+    query = """SELECT state FROM outlook_states WHERE user_id = :user_id
+    ORDER BY created_at DESC LIMIT 1"""
+    return get_df_from_query(query, {"user_id": user_id})
 
 
 def auth_step_1(user_id: str, test: bool = False) -> Tuple[str, str]:
@@ -64,6 +62,8 @@ def auth_step_2(token_url: str, user_id: str, is_test: bool = False):
     token_to_save = account.con.token_backend.token
 
     save_text_to_s3(file_path, json.dumps(token_to_save))
+    # An Account cached before this new token must not be reused
+    invalidate_account(email_to_connect)
 
     insert_new_email(email_to_connect, user_id, "outlook")
     return result, email_to_connect
@@ -7,66 +7,105 @@ When a user wants to revert the categorization system, we want to:
 import logging
 from pydantic import EmailStr
 
-from email_assistant.email_scripts.outlook_account.utils_outlook import get_account
+from email_assistant.email_scripts.outlook_account.utils_outlook import (
+    get_account,
+    graph_batch,
+    is_batch_success,
+)
 from email_assistant.email_scripts.outlook_account.main_categories import (
     CATEGORY_COLORS,
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
+# Number of categorized messages fetched and updated at a time
+REVERT_PAGE_SIZE = 100
+
 
-def remove_categories_from_messages(mailbox, account, category_names):
+def _remove_categories(mailbox, messages, category_names) -> int:
     """
-    Remove specified categories from all messages in the inbox.
+    Remove categories from messages with Graph $batch PATCH requests.
 
     Args:
         mailbox: The mailbox object
-        account: The account object
-        category_names: List of category names to remove
-    """
-    # Get all messages from the inbox
-    inbox = mailbox.inbox_folder()
-    messages = list(inbox.get_messages(limit=1000))
-
-    logger.info(f"Found {len(messages)} messages in inbox")
+        messages: The messages to update
+        category_names: Set of category names to remove
 
-    # Get categories for reference
+    Returns:
+        int: The number of messages updated
+    """
+    # Only the messages carrying some of our categories need an update
+    to_update = [
+        (msg, [cat for cat in msg.categories if cat not in category_names])
+        for msg in messages
+        if category_names.intersection(msg.categories or ())
+    ]
     try:
-        outlook_categories = account.outlook_categories()
-        categories = outlook_categories.get_categories()
-        logger.info(f"Found {len(categories)} categories in account")
+        responses = graph_batch(
+            mailbox,
+            [
+                {
+                    "method": "PATCH",
+                    "url": f"/messages/{msg.object_id}",
+                    "body": {"categories": new_categories},
+                }
+                for msg, new_categories in to_update
+            ],
+        )
     except Exception as e:
-        logger.error(f"Error getting categories: {e}")
-        return
-
-    # Remove categories from messages
-    for msg in messages:
-        try:
-            # Check if message has any of our categories
-            msg_categories = msg.categories
-            if not msg_categories:
-                continue
-
-            changed = False
-            # Create a new list without our categories
-            new_categories = [
-                cat for cat in msg_categories if cat not in category_names
-            ]
+        logger.error("Error removing categories from messages: %s", e)
+        return 0
+
+    updated = 0
+    for (msg, new_categories), response in zip(to_update, responses):
+        if is_batch_success(response):
+            msg.categories = new_categories
+            updated += 1
+            logger.info("Removed categories from message: %s", msg.subject)
+        else:
+            logger.warning(
+                "Error removing categories from message %s: %s", msg.subject, response
+            )
+    return updated
+
+
+def remove_categories_from_messages(mailbox, category_names):
+    """
+    Remove specified categories from all messages in the inbox.
 
-            # If categories changed, update the message
-            if len(new_categories) != len(msg_categories):
-                msg.categories = new_categories
-                msg.save_message()
-                changed = True
+    Args:
+        mailbox: The mailbox object
+        category_names: List of category names to remove
+    """
+    if not category_names:
+        return
 
-            if changed:
-                logger.info(f"Removed categories from message: {msg.subject}")
-        except Exception as e:
-            logger.warning(f"Error removing categories from message {msg.subject}: {e}")
+    # Inbox messages carrying any of the categories, Graph filters them
+    inbox = mailbox.inbox_folder()
+    query = inbox.new_query().select("categories", "subject")
+    for index, category_name in enumerate(category_names):
+        if index:
+            query.chain("or")
+        query.any(collection="categories", operation="eq", word=category_name)
+
+    category_names = frozenset(category_names)
+    total_updated = 0
+    while True:
+        # Updated messages no longer match the filter, so the first page is
+        # requested again rather than following a $skip based next link
+        messages = list(inbox.get_messages(limit=REVERT_PAGE_SIZE, query=query))
+        if not messages:
+            break
+        updated = _remove_categories(mailbox, messages, category_names)
+        total_updated += updated
+        if updated == 0:
+            logger.warning(
+                "Stopping with %s messages whose categories could not be removed",
+                len(messages),
+            )
+            break
+
+    logger.info("Removed categories from %s messages", total_updated)
 
 
 def delete_categories(account, category_names):
@@ -81,15 +120,28 @@ def delete_categories(account, category_names):
         outlook_categories = account.outlook_categories()
         categories = outlook_categories.get_categories()
 
-        for category in categories:
-            if category.name in category_names:
-                try:
-                    category.delete()
-                    logger.info(f"Deleted category: {category.name}")
-                except Exception as e:
-                    logger.warning(f"Error deleting category {category.name}: {e}")
+        to_delete = [
+            category for category in categories if category.name in category_names
+        ]
+        responses = graph_batch(
+            outlook_categories,
+            [
+                {
+                    "method": "DELETE",
+                    "url": f"/outlook/masterCategories/{category.object_id}",
+                }
+                for category in to_delete
+            ],
+        )
+        for category, response in zip(to_delete, responses):
+            if is_batch_success(response):
+                logger.info("Deleted category: %s", category.name)
+            else:
+                logger.warning(
+                    "Error deleting category %s: %s", category.name, response
+                )
     except Exception as e:
-        logger.error(f"Error accessing categories: {e}")
+        logger.error("Error accessing categories: %s", e)
 
 
 def revert_categories(email_account: EmailStr):
@@ -100,7 +152,7 @@ def revert_categories(email_account: EmailStr):
         email_account: The email account to revert
     """
 
-    logger.info(f"Reverting categories for {email_account}")
+    logger.info("Reverting categories for %s", email_account)
 
     # Get the account and mailbox
     account = get_account(email_account)
@@ -110,9 +162,9 @@ def revert_categories(email_account: EmailStr):
     category_names = list(CATEGORY_COLORS.keys())
 
     # First remove categories from all messages
-    remove_categories_from_messages(mailbox, account, category_names)
+    remove_categories_from_messages(mailbox, category_names)
 
     # Then delete the categories themselves
     delete_categories(account, category_names)
 
-    logger.info(f"Successfully reverted categories for {email_account}")
+    logger.info("Successfully reverted categories for %s", email_account)
@@ -1,15 +1,71 @@
-from O365.utils import AWSS3Backend
+from O365.utils import AWSS3Backend, BaseTokenBackend
 from O365 import Account
-from dotenv import load_dotenv
+from email_assistant.utils.env import load_env
 import os
 import boto3
-from email_assistant.config import BUCKET_NAME, FOLDER_NAME
+from botocore.config import Config
+from datetime import datetime, timedelta
+import logging
+import time
+from functools import lru_cache
+from email_assistant.config import (
+    BUCKET_NAME,
+    FOLDER_NAME,
+    OUTLOOK_ACCOUNT_TTL_SECONDS,
+)
 
-# Load the environment variables from .env file
-load_dotenv()
+load_env()
 
 CREDS = (os.getenv("OUTLOOK_CREDS_1"), os.getenv("OUTLOOK_CREDS_2"))
 SCOPES_EMAILS = ["basic", "message_all", "offline_access", "settings_all"]
+# Number of conversation ids OR'd in a single Graph $filter
+CONVERSATION_FILTER_BATCH_SIZE = 15
+# Message fields read when processing the inbox, the rest is not downloaded
+INBOX_MESSAGE_FIELDS = (
+    "subject",
+    "body",
+    "sender",
+    "internet_message_id",
+    "conversation_id",
+    "parent_folder_id",
+)
+# Connections kept open by the shared S3 client (token reads and writes)
+S3_MAX_POOL_CONNECTIONS = 20
+# Maximum number of requests Graph accepts in a single $batch call
+GRAPH_BATCH_SIZE = 20
+# Times the requests of a $batch call throttled by Graph (429) are sent again
+GRAPH_BATCH_RETRIES = 3
+# Total time graph_batch waits for throttled requests, well below the lambdas'
+# timeout: requests still throttled after it are returned as failures
+GRAPH_BATCH_MAX_WAIT_SECONDS = 30
+
+logger = logging.getLogger(__name__)
+
+# (email address, creds) -> (monotonic expiry time, O365 Account of get_account)
+_account_cache = {}
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """S3 client shared by the calls, so its connection pool is reused"""
+    return boto3.client(
+        "s3",
+        config=Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            tcp_keepalive=True,
+            retries={"mode": "adaptive", "max_attempts": 3},
+        ),
+    )
+
+
+class SharedS3TokenBackend(AWSS3Backend):
+    """AWSS3Backend using the shared S3 client instead of creating its own"""
+
+    def __init__(self, bucket_name, filename):
+        BaseTokenBackend.__init__(self)
+        self.bucket_name = bucket_name
+        self.filename = filename
+        self._client = get_s3_client()
 
 
 def save_text_to_s3(file_path: str, text: str) -> None:
@@ -21,28 +77,250 @@ def save_text_to_s3(file_path: str, text: str) -> None:
         text (str): The text content to be saved in the file.
     """
 
-    s3_client = boto3.client("s3")
+    s3_client = get_s3_client()
     bucket_name, key = file_path.replace("s3://", "").split("/", 1)
-    s3_client.put_object(Bucket=bucket_name, Key=key, Body=text)
+    s3_client.put_object(
+        Bucket=bucket_name, Key=key, Body=text, ContentType="text/plain"
+    )
 
 
 def delete_outlook_token(email_addr: str):
-    s3_client = boto3.client("s3")
+    invalidate_account(email_addr)
+    s3_client = get_s3_client()
     s3_client.delete_object(Bucket=BUCKET_NAME, Key=f"{FOLDER_NAME}/{email_addr}.txt")
 
 
 def get_email_token_loc(email_addr):
-    return AWSS3Backend(
+    return SharedS3TokenBackend(
         bucket_name=BUCKET_NAME,
         filename=f"{FOLDER_NAME}/{email_addr}.txt",
     )
 
 
 def get_account(email_addr: str = None, creds: tuple = CREDS):
-    if email_addr is not None:
-        token_backend = get_email_token_loc(email_addr)
-        account = Account(creds, token_backend=token_backend)
-    else:
+    """
+    Get the O365 Account of an email address, or a new one to authenticate.
+
+    Accounts of an email address are reused for OUTLOOK_ACCOUNT_TTL_SECONDS,
+    which keeps their token and HTTP session instead of reading the token
+    from S3 again. Accounts without an email address are never shared, as
+    they hold the token of whoever authenticates with them.
+    """
+    if email_addr is None:
         account = Account(creds)
+        account.con.scopes = account.protocol.get_scopes_for(SCOPES_EMAILS)
+        return account
+
+    cached = _account_cache.get((email_addr, creds))
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    token_backend = get_email_token_loc(email_addr)
+    account = Account(creds, token_backend=token_backend)
     account.con.scopes = account.protocol.get_scopes_for(SCOPES_EMAILS)
+    _account_cache[(email_addr, creds)] = (
+        time.monotonic() + OUTLOOK_ACCOUNT_TTL_SECONDS,
+        account,
+    )
     return account
+
+
+def invalidate_account(email_addr: str = None):
+    """Drop the cached Account of an email address, or every one if None."""
+    if email_addr is None:
+        _account_cache.clear()
+    else:
+        for key in [key for key in _account_cache if key[0] == email_addr]:
+            del _account_cache[key]
+
+
+def get_todays_messages(folder, limit: int = 100, fields=INBOX_MESSAGE_FIELDS):
+    """
+    Get the messages of a folder received today, with only the given fields.
+
+    Args:
+        folder: The O365 folder to read
+        limit: Maximum number of messages to return
+        fields: Message attributes requested with $select
+
+    Returns:
+        list: The O365 messages received today
+    """
+    # Today's date at midnight (start of the day) and tomorrow's (end of the day)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    tomorrow = today + timedelta(days=1)
+
+    query = (
+        folder.new_query("received_date_time")
+        .greater_equal(today)
+        .chain("and")
+        .on_attribute("received_date_time")
+        .less(tomorrow)
+        .select(*fields)
+    )
+    return list(folder.get_messages(limit=limit, query=query))
+
+
+def get_folder_conversation_ids(folder, conversation_ids) -> set:
+    """
+    Find which conversations have at least one message in a folder.
+
+    The filtering is done by Graph, so only the matching messages are
+    downloaded instead of the whole folder.
+
+    Args:
+        folder: The O365 folder to search in
+        conversation_ids: Conversation ids to look for
+
+    Returns:
+        set: The conversation ids found in the folder
+    """
+    conversation_ids = list(conversation_ids)
+    found = set()
+    for start in range(0, len(conversation_ids), CONVERSATION_FILTER_BATCH_SIZE):
+        query = folder.new_query().select("conversation_id")
+        batch = conversation_ids[start : start + CONVERSATION_FILTER_BATCH_SIZE]
+        for index, conversation_id in enumerate(batch):
+            if index:
+                query.chain("or")
+            query.on_attribute("conversation_id").equals(conversation_id)
+        for msg in folder.get_messages(limit=None, query=query):
+            found.add(msg.conversation_id)
+    return found
+
+
+def graph_batch(component, requests) -> list:
+    """
+    Send Graph requests in $batch calls of up to GRAPH_BATCH_SIZE requests.
+
+    The calls are sent one after the other: Graph already runs the requests of
+    a call up to 4 at a time, its limit of concurrent requests per mailbox.
+
+    Args:
+        component: The O365 component (mailbox, categories...) whose connection
+            and resource (e.g. "me") are used
+        requests: Dicts with the "method", the "url" relative to the resource,
+            e.g. "/messages/{id}", and an optional JSON "body"
+
+    Returns:
+        list: The Graph response of each request, with its "status" and
+            "body", in the order of requests (None if Graph did not answer it)
+    """
+    url = f"{component.protocol.service_url}$batch"
+    chunks = [
+        requests[start : start + GRAPH_BATCH_SIZE]
+        for start in range(0, len(requests), GRAPH_BATCH_SIZE)
+    ]
+    results = []
+    wait_budget = GRAPH_BATCH_MAX_WAIT_SECONDS
+    for chunk in chunks:
+        chunk_results, wait_budget = _post_batch(component, url, chunk, wait_budget)
+        results.extend(chunk_results)
+    return results
+
+
+def _retry_after(result) -> int:
+    """Seconds to wait before sending a throttled request again, 1 if unknown"""
+    headers = result.get("headers") or {}
+    try:
+        return max(int(headers.get("Retry-After", 1)), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def _post_batch(component, url, requests, wait_budget):
+    """
+    Send one $batch call, then send again the requests throttled by Graph.
+
+    The $batch call itself is retried by the O365 connection, but each request
+    inside it gets its own status and a 429 comes with a Retry-After header.
+    The waits are taken from wait_budget: once it is used up, the throttled
+    requests are returned with their 429 response.
+
+    Returns:
+        tuple: The responses in the order of requests, and the wait budget left
+    """
+    results = [None] * len(requests)
+    pending = list(range(len(requests)))
+    for attempt in range(GRAPH_BATCH_RETRIES + 1):
+        batch = []
+        for index in pending:
+            request = requests[index]
+            batch_request = {
+                "id": str(index),
+                "method": request["method"],
+                "url": f"/{component.main_resource}{request['url']}",
+            }
+            if "body" in request:
+                batch_request["headers"] = {"Content-Type": "application/json"}
+                batch_request["body"] = request["body"]
+            batch.append(batch_request)
+        response = component.con.post(url, data={"requests": batch})
+
+        throttled = []
+        retry_after = 0
+        for result in response.json().get("responses", []):
+            index = int(result["id"])
+            results[index] = result
+            if result.get("status") == 429:
+                throttled.append(index)
+                retry_after = max(retry_after, _retry_after(result))
+        if not throttled or attempt == GRAPH_BATCH_RETRIES:
+            break
+        if wait_budget <= 0:
+            logger.warning(
+                "%s Graph requests still throttled, giving up", len(throttled)
+            )
+            break
+        retry_after = min(retry_after, wait_budget)
+        logger.info(
+            "%s Graph requests throttled, retrying in %ss", len(throttled), retry_after
+        )
+        time.sleep(retry_after)
+        wait_budget -= retry_after
+        pending = throttled
+    return results, wait_budget
+
+
+def is_batch_success(response) -> bool:
+    """Whether a response returned by graph_batch is a success"""
+    return response is not None and 200 <= response.get("status", 0) < 300
+
+
+def move_messages(mailbox, messages, folder) -> int:
+    """
+    Move messages to a folder with Graph $batch calls of up to 20 moves each.
+
+    Like Message.move, the folder and object ids of the moved messages are
+    updated, since Graph gives a message a new id when it changes folder.
+
+    Args:
+        mailbox: The O365 mailbox the messages belong to
+        messages: The O365 messages to move
+        folder: The destination O365 folder
+
+    Returns:
+        int: The number of messages moved
+    """
+    responses = graph_batch(
+        mailbox,
+        [
+            {
+                "method": "POST",
+                "url": f"/messages/{msg.object_id}/move",
+                "body": {"destinationId": folder.folder_id},
+            }
+            for msg in messages
+        ],
+    )
+    moved = 0
+    for msg, response in zip(messages, responses):
+        if is_batch_success(response):
+            msg.folder_id = folder.folder_id
+            msg.object_id = response["body"]["id"]
+            moved += 1
+        else:
+            logger.error(
+                "Failed to move message %s: %s", msg.internet_message_id, response
+            )
+    return moved
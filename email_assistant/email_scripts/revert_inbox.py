@@ -1,8 +1,12 @@
-from email_assistant.email_scripts.imap_account.main import get_email_infos
+from email_assistant.email_scripts.imap_account.main import (
+    get_email_infos,
+    invalidate_email_infos,
+)
 from email_assistant.email_scripts.imap_account.folders_utils import (
     revert_folders_gmail,
 )
-from email_assistant.db.utils import execute_query
+from email_assistant.db.utils import db_transaction
+from email_assistant.config import REVERT_DELETE_BATCH_SIZE
 from pydantic import EmailStr
 from email_assistant.email_scripts.outlook_account.revert_categories import (
     revert_categories,
@@ -12,6 +16,31 @@ from email_assistant.email_scripts.outlook_account.utils_outlook import (
 )
 
 
+def delete_received_emails(
+    email_account: EmailStr, batch_size: int = REVERT_DELETE_BATCH_SIZE
+) -> int:
+    """
+    Delete the received emails of an account, batch_size rows per transaction.
+
+    Returns:
+        int: The number of received emails deleted
+    """
+    deleted = 0
+    while True:
+        with db_transaction() as cursor:
+            cursor.execute(
+                """DELETE FROM received_emails WHERE ctid IN (
+                    SELECT ctid FROM received_emails
+                    WHERE email_account = %s LIMIT %s
+                )""",
+                (email_account, batch_size),
+            )
+            count = cursor.rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
 def revert_inbox(email_account: EmailStr, is_test: bool = False):
     """
     This function is used to revert the inbox of a user.
@@ -26,11 +55,12 @@ def revert_inbox(email_account: EmailStr, is_test: bool = False):
         # remove outlook access token from s3
         delete_outlook_token(email_account)
 
-    # Delete all received emails for this account
-    query = f"DELETE FROM received_emails WHERE email_account = '{email_account}'"
-    execute_query(query)
+    delete_received_emails(email_account)
     if not is_test:
-        # Remove the email account from database (this will cascade delete related records)
-        query = f"DELETE FROM email_accounts WHERE email = '{email_account}'"
-        execute_query(query)
+        with db_transaction() as cursor:
+            # The account delete also cascades to the other related records
+            cursor.execute(
+                "DELETE FROM email_accounts WHERE email = %s", (email_account,)
+            )
+    invalidate_email_infos(email_account)
     return
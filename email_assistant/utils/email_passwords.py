@@ -1,24 +1,50 @@
 # Utils for encoding and decoding of email accounts passwords
 import base64
 from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from dotenv import load_dotenv
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+from email_assistant.utils.env import load_env
+from functools import lru_cache
 import os
 
-# Load environment variables
-load_dotenv()
+load_env()
 
 # Get the cryptography key from environment variables
 KEY = os.getenv("CRYPTO_KEY")
 
+# Start of every Fernet token: the 0x80 version byte followed by the high,
+# still zero, bytes of the timestamp
+FERNET_TOKEN_PREFIX = "gAAAAA"
 
-def generate_key(password):
+# Key derivation: memory-hard scrypt cost and per-password salt size
+SCRYPT_N = 2**15
+KEY_SALT_BYTES = 16
+
+
+def generate_key(password, salt=None):
+    """
+    Derives a Fernet key from a password with scrypt.
+
+    Args:
+        password (str): The password to derive the key from
+        salt (bytes, optional): The salt of a previously derived key. A new random
+            salt is drawn when not given.
+
+    Returns:
+        tuple: The urlsafe base64 Fernet key (str) and the salt (bytes), which must
+            be stored alongside to derive the same key again
+    """
     # unused
-    salt = b"salt_"  # Generate a random salt
-    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=100000)
-    key = str(base64.urlsafe_b64encode(kdf.derive(password.encode())))
-    return key
+    if salt is None:
+        salt = os.urandom(KEY_SALT_BYTES)
+    kdf = Scrypt(salt=salt, length=32, n=SCRYPT_N, r=8, p=1)
+    key = base64.urlsafe_b64encode(kdf.derive(password.encode())).decode()
+    return key, salt
+
+
+@lru_cache(maxsize=4)
+def _get_fernet(key):
+    """Fernet cipher of a key, built once instead of on every call"""
+    return Fernet(key)
 
 
 def encode_string(string, key=KEY):
@@ -30,14 +56,13 @@ def encode_string(string, key=KEY):
         key (str, optional): The encryption key. Defaults to the CRYPTO_KEY from environment.
 
     Returns:
-        str: Base64-encoded encrypted string or None if input is None
+        str: The Fernet token (urlsafe base64 text) or None if input is None
     """
     if string is None:
         return string
-    fernet = Fernet(key)
-    encoded_bytes = fernet.encrypt(string.encode())
-    encoded_string = base64.urlsafe_b64encode(encoded_bytes).decode()
-    return encoded_string
+    fernet = _get_fernet(key)
+    # Fernet tokens are already urlsafe base64 text
+    return fernet.encrypt(string.encode()).decode()
 
 
 def decode_string(encoded_string, key=KEY):
@@ -53,8 +78,12 @@ def decode_string(encoded_string, key=KEY):
     """
     if encoded_string is None:
         return encoded_string
-    fernet = Fernet(key)
-    encoded_bytes = base64.urlsafe_b64decode(encoded_string)
+    fernet = _get_fernet(key)
+    if encoded_string.startswith(FERNET_TOKEN_PREFIX):
+        encoded_bytes = encoded_string.encode()
+    else:
+        # Values stored before the extra base64 layer was dropped
+        encoded_bytes = base64.urlsafe_b64decode(encoded_string)
     decoded_string = fernet.decrypt(encoded_bytes).decode()
     return decoded_string
 
@@ -0,0 +1,16 @@
+# Loading of the environment variables of the .env file
+from dotenv import load_dotenv
+from functools import lru_cache
+import os
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """
+    Load the .env file into the environment, once per process.
+
+    In Lambda the variables are injected by the runtime, there is no .env to
+    look for, so nothing is read from disk.
+    """
+    if "AWS_LAMBDA_FUNCTION_NAME" not in os.environ:
+        load_dotenv()
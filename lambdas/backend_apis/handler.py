@@ -13,12 +13,26 @@ from email_assistant.db.utils import cleanup_db_resources
 from email_assistant.db.operations import get_df_from_query
 from lambdas.common.aws_utils import call_lambda_function
 from email_assistant.email_scripts.revert_inbox import revert_inbox
-from dotenv import load_dotenv
+from email_assistant.utils.env import load_env
+import asyncio
 import os
 from lambdas.config import LAMBDA_FUNCTIONS
+from lambdas.common.logging_utils import configure_logging
 from typing import Optional, Dict, Any
 
-load_dotenv()
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+load_env()
+configure_logging()
+
+# Mangum runs each request on the loop of the current event loop policy, uvloop
+# schedules tasks faster than the default one (it is not built for Windows)
+if uvloop is not None:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 app = FastAPI()
 handler = Mangum(app)
 
@@ -55,21 +69,29 @@ async def add_imap_email(
     imap_port: int = 993,
 ):
     try:
-        query = f"select * from email_accounts where imap_login = '{creds.imap_login}'"
-        email_in_db = len(get_df_from_query(query)) > 0
-
-        imap_correct, imap_error = check_imap_access(
-            sender_email=creds.imap_login,
-            password=creds.imap_pwd,
-            imap_server=imap_server,
-            imap_port=imap_port,
+        # The database lookup and the IMAP login are independent: run both
+        # in worker threads at the same time instead of blocking the loop
+        query = "select 1 from email_accounts where imap_login = :imap_login"
+        emails_in_db, (imap_correct, imap_error) = await asyncio.gather(
+            asyncio.to_thread(
+                get_df_from_query, query, {"imap_login": creds.imap_login}
+            ),
+            asyncio.to_thread(
+                check_imap_access,
+                sender_email=creds.imap_login,
+                password=creds.imap_pwd,
+                imap_server=imap_server,
+                imap_port=imap_port,
+            ),
         )
+        email_in_db = len(emails_in_db) > 0
 
         if not imap_correct:
             raise HTTPException(status_code=400, detail=imap_error)
 
         if not email_in_db:
-            insert_new_email(
+            await asyncio.to_thread(
+                insert_new_email,
                 creds.imap_login,
                 user_id,
                 imap_login=creds.imap_login,
@@ -79,7 +101,8 @@ async def add_imap_email(
                 email_provider="Gmail",
             )
 
-        call_lambda_function(
+        await asyncio.to_thread(
+            call_lambda_function,
             {"email_account": creds.imap_login, "action": "update_inbox"},
             function_name=LAMBDA_FUNCTIONS["update_inbox"],
         )
@@ -106,7 +129,8 @@ async def add_imap_email(
 async def revert_inbox_(email_account: EmailStr):
     try:
         # revert_inbox(email_account)
-        call_lambda_function(
+        await asyncio.to_thread(
+            call_lambda_function,
             {"email_account": email_account, "action": "revert_inbox"},
             function_name=LAMBDA_FUNCTIONS["update_inbox"],
         )
@@ -131,7 +155,9 @@ class OutlookAuthStep1Params(BaseModel):
 )
 async def outlook_auth_step_1(params: OutlookAuthStep1Params):
     try:
-        consent_url, state = auth_step_1(params.user_id, params.is_test)
+        consent_url, state = await asyncio.to_thread(
+            auth_step_1, params.user_id, params.is_test
+        )
         return ResponseData(data={"consent_url": consent_url, "state": state})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -150,14 +176,15 @@ class OutlookAuthStep2Params(BaseModel):
 )
 async def outlook_auth_step_2(params: OutlookAuthStep2Params):
     try:
-        result, email_to_connect = auth_step_2(
-            params.token_url, params.user_id, params.is_test
+        result, email_to_connect = await asyncio.to_thread(
+            auth_step_2, params.token_url, params.user_id, params.is_test
         )
 
         if not result:
             raise HTTPException(status_code=400, detail="Authentication failed")
 
-        call_lambda_function(
+        await asyncio.to_thread(
+            call_lambda_function,
             {"email_account": email_to_connect},
             function_name=LAMBDA_FUNCTIONS["update_inbox"],
         )
@@ -1,13 +1,99 @@
 from boto3 import client as boto3_client
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 import json
-from lambdas.config import AWS_REGION
+from lambdas.config import AWS_REGION, LAMBDA_INVOKE_CONCURRENCY, SQS_BATCH_SIZE
+
+
+@lru_cache(maxsize=None)
+def get_lambda_client(region=AWS_REGION):
+    """Lambda client shared by the invocations, boto3 clients are thread safe"""
+    return boto3_client(
+        "lambda",
+        region_name=region,
+        config=Config(max_pool_connections=LAMBDA_INVOKE_CONCURRENCY),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_sqs_client(region=AWS_REGION):
+    """SQS client shared by the calls"""
+    return boto3_client("sqs", region_name=region)
 
 
 def call_lambda_function(parameters, function_name: str, region=AWS_REGION):
-    lambda_client = boto3_client("lambda", region_name=region)
+    lambda_client = get_lambda_client(region)
     invoke_response = lambda_client.invoke(
         FunctionName=function_name,
         InvocationType="Event",
         Payload=json.dumps(parameters),
     )
     return {"response": invoke_response}
+
+
+def call_lambda_functions(
+    parameters_list,
+    function_name: str,
+    region=AWS_REGION,
+    max_concurrency=LAMBDA_INVOKE_CONCURRENCY,
+):
+    """Invoke a lambda function asynchronously once per parameters, concurrently.
+
+    Every invocation is attempted; if some of them fail, the first error is
+    raised once all of them are done.
+
+    Args:
+        parameters_list (Iterable[dict]): The payload of each invocation
+        function_name (str): The lambda function to invoke
+        region (str, optional): The AWS region of the function
+        max_concurrency (int, optional): Maximum number of invocations in flight
+
+    Returns:
+        list: The call_lambda_function result of each invocation, in order
+    """
+    with ThreadPoolExecutor(
+        max_workers=max_concurrency, thread_name_prefix="lambda-invoke"
+    ) as executor:
+        futures = [
+            executor.submit(call_lambda_function, parameters, function_name, region)
+            for parameters in parameters_list
+        ]
+    return [future.result() for future in futures]
+
+
+def send_sqs_messages(messages, queue_url: str, region=AWS_REGION) -> int:
+    """Send JSON messages to an SQS queue, SQS_BATCH_SIZE messages per call.
+
+    Every batch is sent; if SQS rejected some messages, an error is raised once
+    all of them are done.
+
+    Args:
+        messages (Iterable[dict]): The body of each message
+        queue_url (str): The URL of the queue
+        region (str, optional): The AWS region of the queue
+
+    Returns:
+        int: The number of messages sent
+    """
+    sqs_client = get_sqs_client(region)
+    messages = iter(messages)
+    sent = 0
+    failed = []
+    while True:
+        batch = list(islice(messages, SQS_BATCH_SIZE))
+        if not batch:
+            break
+        response = sqs_client.send_message_batch(
+            QueueUrl=queue_url,
+            Entries=[
+                {"Id": str(index), "MessageBody": json.dumps(message)}
+                for index, message in enumerate(batch)
+            ],
+        )
+        sent += len(response.get("Successful", []))
+        failed.extend(response.get("Failed", []))
+    if failed:
+        raise RuntimeError(f"{len(failed)} SQS messages were not sent: {failed[0]}")
+    return sent
@@ -0,0 +1,15 @@
+import logging
+
+
+def configure_logging(level=logging.INFO):
+    """Configure logging once for a Lambda entry point
+
+    The Lambda runtime already attaches a handler to the root logger, in which
+    case only the level is set; locally a stream handler is added.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(
+            format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        )
+    root.setLevel(level)
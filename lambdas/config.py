@@ -1,3 +1,5 @@
+import os
+
 # AWS CONFIG
 
 AWS_REGION = "eu-central-1"
@@ -8,3 +10,15 @@ LAMBDA_FUNCTIONS = {
     "update_inbox": "check_new_msgs",
     "cron_job": "trigger_update_inbox",
 }
+
+# Maximum number of lambda invocations sent at the same time by the cron job
+LAMBDA_INVOKE_CONCURRENCY = 32
+
+# SQS QUEUES
+
+# Queue the update_inbox lambda reads from. When it is set, the cron job sends
+# it the accounts to update instead of invoking the lambda once per account
+UPDATE_INBOX_QUEUE_URL = os.getenv("UPDATE_INBOX_QUEUE_URL")
+
+# Maximum number of messages SQS accepts in a single SendMessageBatch call
+SQS_BATCH_SIZE = 10
@@ -1,18 +1,25 @@
-from lambdas.common.aws_utils import call_lambda_function
-from email_assistant.db.operations import get_df_from_query
-from email_assistant.db.utils import cleanup_db_resources
-from lambdas.config import LAMBDA_FUNCTIONS
+from lambdas.common.aws_utils import call_lambda_functions, send_sqs_messages
+from email_assistant.db.utils import cleanup_db_resources, stream_query
+from lambdas.config import LAMBDA_FUNCTIONS, UPDATE_INBOX_QUEUE_URL
+from lambdas.common.logging_utils import configure_logging
+
+configure_logging()
 
 
 def handler(event, context):
     try:
-        df = get_df_from_query(
-            "select * from email_accounts where disconnected = False"
+        parameters_list = (
+            {"email_account": email_account, "action": "update_inbox"}
+            for (email_account,) in stream_query(
+                "select email from email_accounts where disconnected = False"
+            )
         )
-        for _, row in df.iterrows():
-            call_lambda_function(
-                {"email_account": row.email, "action": "update_inbox"},
-                function_name=LAMBDA_FUNCTIONS["update_inbox"],
+        if UPDATE_INBOX_QUEUE_URL:
+            # The queue triggers update_inbox, 10 accounts are sent per call
+            send_sqs_messages(parameters_list, queue_url=UPDATE_INBOX_QUEUE_URL)
+        else:
+            call_lambda_functions(
+                parameters_list, function_name=LAMBDA_FUNCTIONS["update_inbox"]
             )
     finally:
         cleanup_db_resources()
@@ -1,15 +1,28 @@
 """functions like update or revert inbox take time to run, so we need to run them in a separate lambda function to call asynchronously"""
 
+import json
 from email_assistant.email_scripts.update_inbox import main
 from email_assistant.email_scripts.revert_inbox import revert_inbox
 from email_assistant.db.utils import cleanup_db_resources
+from lambdas.common.logging_utils import configure_logging
+
+configure_logging()
+
+
+def run_action(event):
+    if event["action"] == "update_inbox":
+        main(event["email_account"])
+    elif event["action"] == "revert_inbox":
+        revert_inbox(event["email_account"])
 
 
 def handler(event, context):
     try:
-        if event["action"] == "update_inbox":
-            main(event["email_account"])
-        elif event["action"] == "revert_inbox":
-            revert_inbox(event["email_account"])
+        if "Records" in event:
+            # Messages of the update_inbox SQS queue, sent by the cron job
+            for record in event["Records"]:
+                run_action(json.loads(record["body"]))
+        else:
+            run_action(event)
     finally:
         cleanup_db_resources()
@@ -0,0 +1,27 @@
+import os
+import pytest
+from email_assistant.utils.env import load_env
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _env():
+    """Load the .env file once for the whole test session"""
+    load_env()
+
+
+@pytest.fixture(scope="session")
+def gmail_account():
+    """Real gmail account connected in the database, see template.env"""
+    return os.getenv("GMAIL_ACCOUNT")
+
+
+@pytest.fixture(scope="session")
+def outlook_account():
+    """Real outlook account connected in the database, see template.env"""
+    return os.getenv("OUTLOOK_ACCOUNT")
+
+
+@pytest.fixture(scope="session")
+def test_outlook_account():
+    """Outlook account whose inbox the revert tests may reset"""
+    return os.getenv("TEST_OUTLOOK_ACCOUNT")
@@ -0,0 +1,7 @@
+import pytest
+from email_assistant.email_scripts.imap_account.main import get_email_infos, main
+
+
+@pytest.mark.integration
+def test_main(gmail_account):
+    main(get_email_infos(gmail_account))
@@ -0,0 +1,7 @@
+import pytest
+from email_assistant.email_scripts.update_inbox import main
+
+
+@pytest.mark.integration
+def test_main(outlook_account):
+    main(outlook_account)
@@ -1,4 +1,17 @@
-from email_assistant.ai.utils import create_ai_draft_response, classify_email
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from openai import APIConnectionError
+from email_assistant.ai.utils import (
+    create_ai_draft_response,
+    create_ai_draft_responses_batch,
+    generate_with_ai,
+    classify_email,
+    classify_emails_batch,
+    classify_emails_async,
+    stream_ai_draft_response,
+)
 from email_assistant.config import FOLDERS
 
 meeting_update_var = "Meeting Update"
@@ -18,3 +31,107 @@ def test_create_ai_draft_response():
     draft = create_ai_draft_response(email_body, sender, receiver_name, email_subject)
     assert draft is not None
     assert len(draft) > 10
+
+
+def test_classify_email_uses_cache(tmp_path):
+    email = "Your weekly   newsletter is here"
+    with patch(
+        "email_assistant.ai.utils.CLASSIFY_CACHE_PATH", str(tmp_path / "c.db")
+    ), patch("email_assistant.ai.utils._classify_cache", None), patch(
+        "email_assistant.ai.utils.generate_with_ai",
+        return_value='{"label": "Marketing"}',
+    ) as mock_generate:
+        assert classify_email(email)["label"] == "Marketing"
+        # same text up to case and whitespace is served from the cache
+        assert classify_email("your weekly newsletter IS here")["label"] == "Marketing"
+        mock_generate.assert_called_once()
+
+
+def test_classify_emails_batch(tmp_path):
+    emails = [
+        "Meeting moved to 3pm",
+        "50% off everything today",
+        "Meeting moved to 3pm",
+    ]
+    with patch(
+        "email_assistant.ai.utils.CLASSIFY_CACHE_PATH", str(tmp_path / "c.db")
+    ), patch("email_assistant.ai.utils._classify_cache", None), patch(
+        "email_assistant.ai.utils.generate_with_ai",
+        return_value='{"labels": [{"label": "Meeting Update"}, {"label": "Marketing"}]}',
+    ) as mock_generate:
+        labels = [res["label"] for res in classify_emails_batch(emails, batch_size=2)]
+        assert labels == ["Meeting Update", "Marketing", "Meeting Update"]
+        # the duplicated email is only sent once
+        assert mock_generate.call_count == 1
+
+
+def test_classify_emails_async(tmp_path):
+    emails = ["Meeting moved to 3pm", "50% off everything today"]
+    with patch(
+        "email_assistant.ai.utils.CLASSIFY_CACHE_PATH", str(tmp_path / "c.db")
+    ), patch("email_assistant.ai.utils._classify_cache", None), patch(
+        "email_assistant.ai.utils.generate_with_ai_async",
+        new=AsyncMock(
+            side_effect=['{"label": "Meeting Update"}', '{"label": "Marketing"}']
+        ),
+    ):
+        results = asyncio.run(classify_emails_async(emails, api_key="test"))
+        assert [res["label"] for res in results] == ["Meeting Update", "Marketing"]
+
+
+def test_stream_ai_draft_response():
+    events = [
+        SimpleNamespace(type="chunk", parsed=None),
+        SimpleNamespace(type="content.delta", parsed={"subject_text": "Re"}),
+        SimpleNamespace(type="content.delta", parsed={"email_body_text": "Hi"}),
+        SimpleNamespace(type="content.delta", parsed={"email_body_text": "Hi Bob,"}),
+    ]
+    stream = MagicMock()
+    stream.__iter__.return_value = iter(events)
+    stream.get_final_completion.return_value.choices[0].message.parsed = (
+        SimpleNamespace(subject_text="Re", email_body_text="Hi Bob, thanks!")
+    )
+    client = MagicMock()
+    client.beta.chat.completions.stream.return_value.__enter__.return_value = stream
+    with patch("email_assistant.ai.utils._get_client", return_value=client):
+        chunks = list(stream_ai_draft_response("Hello", "bob", "me", "Hi"))
+    assert chunks == ["Hi", " Bob,", " thanks!"]
+
+
+def test_stream_ai_draft_response_without_parsed_response():
+    events = [SimpleNamespace(type="content.delta", parsed={"email_body_text": "Hi"})]
+    stream = MagicMock()
+    stream.__iter__.side_effect = lambda: iter(events)
+    stream.get_final_completion.return_value.choices[0].message.parsed = None
+    client = MagicMock()
+    client.beta.chat.completions.stream.return_value.__enter__.return_value = stream
+    with patch("email_assistant.ai.utils._get_client", return_value=client):
+        assert list(stream_ai_draft_response("Hello", "bob", "me", "Hi")) == ["Hi"]
+        events.clear()
+        with pytest.raises(ValueError):
+            list(stream_ai_draft_response("Hello", "bob", "me", "Hi"))
+
+
+def test_generate_with_ai_retries_transient_errors():
+    client = MagicMock()
+    client.chat.completions.create.side_effect = [
+        APIConnectionError(request=MagicMock()),
+        MagicMock(choices=[MagicMock(message=MagicMock(content="hello"))]),
+    ]
+    with patch("email_assistant.ai.utils._get_client", return_value=client), patch(
+        "email_assistant.ai.utils._backoff", return_value=0
+    ):
+        assert generate_with_ai("Say hello", api_key="test") == "hello"
+    assert client.chat.completions.create.call_count == 2
+
+
+def test_create_ai_draft_responses_batch():
+    emails = [("Hello", "bob", "me", "Hi"), ("Bonjour", "alice", "me", "Salut")]
+    with patch(
+        "email_assistant.ai.utils.create_ai_draft_response",
+        side_effect=lambda body, sender, receiver, subject: f"{subject} {sender}",
+    ) as mock_draft:
+        drafts = create_ai_draft_responses_batch(emails)
+    assert drafts == ["Hi bob", "Salut alice"]
+    assert mock_draft.call_count == 2
+    assert create_ai_draft_responses_batch([]) == []
@@ -1,6 +1,39 @@
-from lambdas.common.aws_utils import call_lambda_function
-from lambdas.config import LAMBDA_FUNCTIONS
+import json
+from unittest.mock import patch
+from lambdas.common.aws_utils import (
+    call_lambda_function,
+    call_lambda_functions,
+    send_sqs_messages,
+)
+from lambdas.config import AWS_REGION, LAMBDA_FUNCTIONS
 
 
 def test_call_lambda_function():
     call_lambda_function({}, function_name=LAMBDA_FUNCTIONS["cron_job"])
+
+
+def test_call_lambda_functions_invokes_each_payload():
+    payloads = [{"email_account": f"user{i}@example.com"} for i in range(5)]
+    with patch("lambdas.common.aws_utils.get_lambda_client") as get_client:
+        get_client.return_value.invoke.side_effect = lambda **kwargs: kwargs
+
+        results = call_lambda_functions(iter(payloads), function_name="fn")
+
+    get_client.assert_called_with(AWS_REGION)
+    assert [json.loads(r["response"]["Payload"]) for r in results] == payloads
+    assert all(r["response"]["InvocationType"] == "Event" for r in results)
+
+
+def test_send_sqs_messages_batches_by_ten():
+    messages = [{"email_account": f"user{i}@example.com"} for i in range(23)]
+    with patch("lambdas.common.aws_utils.get_sqs_client") as get_client:
+        send_batch = get_client.return_value.send_message_batch
+        send_batch.side_effect = lambda **kwargs: {"Successful": kwargs["Entries"]}
+
+        sent = send_sqs_messages(iter(messages), queue_url="queue")
+
+    assert sent == 23
+    batches = [call.kwargs["Entries"] for call in send_batch.call_args_list]
+    assert [len(entries) for entries in batches] == [10, 10, 3]
+    bodies = [json.loads(entry["MessageBody"]) for e in batches for entry in e]
+    assert bodies == messages
@@ -0,0 +1,41 @@
+import base64
+import unittest
+
+from cryptography.fernet import Fernet
+
+from email_assistant.utils.email_passwords import (
+    decode_string,
+    encode_string,
+    generate_key,
+)
+
+KEY = Fernet.generate_key().decode()
+
+
+class TestEmailPasswords(unittest.TestCase):
+    def test_round_trip_stores_the_fernet_token(self):
+        """Test that the stored value is the Fernet token itself."""
+        encoded = encode_string("secret", KEY)
+
+        self.assertTrue(encoded.startswith("gAAAAA"))
+        self.assertEqual(decode_string(encoded, KEY), "secret")
+
+    def test_decode_legacy_double_encoded_value(self):
+        """Test that values stored with the extra base64 layer still decode."""
+        legacy = base64.urlsafe_b64encode(Fernet(KEY).encrypt(b"secret")).decode()
+
+        self.assertEqual(decode_string(legacy, KEY), "secret")
+
+    def test_generate_key_uses_a_random_salt(self):
+        """Test that derived keys are salted per call and reproducible."""
+        key, salt = generate_key("password")
+        other_key, other_salt = generate_key("password")
+
+        self.assertNotEqual(salt, other_salt)
+        self.assertNotEqual(key, other_key)
+        self.assertEqual(generate_key("password", salt), (key, salt))
+        self.assertEqual(decode_string(encode_string("secret", key), key), "secret")
+
+
+if __name__ == "__main__":
+    unittest.main()
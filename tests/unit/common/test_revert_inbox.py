@@ -0,0 +1,33 @@
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+from email_assistant.email_scripts.revert_inbox import delete_received_emails
+
+
+class TestDeleteReceivedEmails(unittest.TestCase):
+    def test_deletes_in_batches_until_a_partial_one(self):
+        """Test that each batch is its own transaction and the loop ends."""
+        cursor = MagicMock()
+        rowcounts = iter([2, 2, 1])
+        cursor.execute.side_effect = lambda *args: setattr(
+            cursor, "rowcount", next(rowcounts)
+        )
+        transactions = []
+
+        @contextmanager
+        def db_transaction():
+            transactions.append(cursor)
+            yield cursor
+
+        with patch(
+            "email_assistant.email_scripts.revert_inbox.db_transaction", db_transaction
+        ):
+            deleted = delete_received_emails("a@example.com", batch_size=2)
+
+        self.assertEqual(deleted, 5)
+        self.assertEqual(len(transactions), 3)
+        self.assertEqual(cursor.execute.call_args.args[1], ("a@example.com", 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import psycopg2
+from email_assistant.db import utils
+from email_assistant.db.utils import (
+    execute_batch,
+    execute_query,
+    get_conn,
+    stream_query,
+)
+
+
+class TestDBUtils(unittest.TestCase):
+    @patch("email_assistant.db.utils.release_conn")
+    @patch("email_assistant.db.utils.get_conn")
+    def test_execute_batch_copies_simple_inserts(self, mock_get_conn, mock_release):
+        """Test that a plain INSERT batch is sent as a single COPY."""
+        mock_cursor = mock_get_conn.return_value.cursor.return_value
+
+        count = execute_batch(
+            "INSERT INTO users (username, email) VALUES (%s, %s)",
+            [("bob", "bob@example.com"), ("tab\tname", None)],
+        )
+
+        self.assertEqual(count, 2)
+        statement, buffer = mock_cursor.copy_expert.call_args[0]
+        self.assertEqual(statement, "COPY users (username, email) FROM STDIN")
+        self.assertEqual(buffer.getvalue(), "bob\tbob@example.com\ntab\\tname\t\\N\n")
+        mock_get_conn.return_value.commit.assert_called_once()
+        mock_release.assert_called_once_with(mock_get_conn.return_value)
+
+    @patch("email_assistant.db.utils.execute_values_batch")
+    def test_execute_batch_non_scalar_inserts(self, mock_execute_values_batch):
+        """Test that plain INSERTs of values COPY can't read use execute_values."""
+        params_list = [("bob", {"theme": "dark"})]
+
+        execute_batch(
+            "INSERT INTO users (username, settings) VALUES (%s, %s)",
+            params_list,
+            page_size=50,
+        )
+
+        mock_execute_values_batch.assert_called_once_with(
+            "INSERT INTO users (username, settings) VALUES %s",
+            params_list,
+            page_size=50,
+        )
+
+    @patch("email_assistant.db.utils.execute_batch_pages")
+    @patch("email_assistant.db.utils.release_conn")
+    @patch("email_assistant.db.utils.get_conn")
+    def test_execute_batch_pages_other_queries(
+        self, mock_get_conn, mock_release, mock_execute_batch_pages
+    ):
+        """Test that queries COPY can't replace are sent in pages."""
+        query = "UPDATE users SET email = %s WHERE username = %s"
+        params_list = [("bob@example.com", "bob")]
+
+        execute_batch(query, params_list)
+
+        mock_execute_batch_pages.assert_called_once_with(
+            mock_get_conn.return_value.cursor.return_value,
+            query,
+            params_list,
+            page_size=1000,
+        )
+        mock_get_conn.return_value.cursor.return_value.copy_expert.assert_not_called()
+
+    @patch("email_assistant.db.utils.execute_values_batch")
+    def test_execute_batch_values_placeholder(self, mock_execute_values_batch):
+        """Test that "VALUES %s" queries are expanded with execute_values."""
+        query = "INSERT INTO users (username, email) VALUES %s ON CONFLICT DO NOTHING"
+        params_list = [("bob", "bob@example.com")]
+
+        execute_batch(query, params_list)
+
+        mock_execute_values_batch.assert_called_once_with(
+            query, params_list, page_size=1000
+        )
+
+    @patch("email_assistant.db.utils.get_pool")
+    def test_get_conn_replaces_dead_idle_connection(self, mock_get_pool):
+        """Test that a long idle pooled connection is pinged and replaced if dead."""
+        dead_conn = MagicMock(closed=0)
+        dead_cursor = dead_conn.cursor.return_value.__enter__.return_value
+        dead_cursor.execute.side_effect = psycopg2.OperationalError()
+        new_conn = MagicMock(closed=0)
+        pool = mock_get_pool.return_value
+        pool.getconn.side_effect = [dead_conn, new_conn]
+
+        with patch.dict(utils._ping_deadlines, {id(dead_conn): 0}):
+            self.assertIs(get_conn(), new_conn)
+
+        pool.putconn.assert_called_once_with(dead_conn, close=True)
+        new_conn.cursor.assert_not_called()
+
+    @patch("email_assistant.db.utils.release_conn")
+    @patch("email_assistant.db.utils.get_conn")
+    def test_execute_query_prepares_once(self, mock_get_conn, mock_release):
+        """Test that a parametrized query is prepared once per connection."""
+        mock_cursor = mock_get_conn.return_value.cursor.return_value
+        mock_cursor.connection = mock_get_conn.return_value
+        query = "UPDATE users SET email = %s WHERE username = %s AND note LIKE '5%%'"
+
+        execute_query(query, ("bob@example.com", "bob"), prepared=True)
+        execute_query(query, ("alice@example.com", "alice"), prepared=True)
+
+        statements = [c.args[0] for c in mock_cursor.execute.call_args_list]
+        name = statements[0].split()[1]
+        self.assertEqual(
+            statements,
+            [
+                f"PREPARE {name} AS UPDATE users SET email = $1 WHERE username = $2 AND note LIKE '5%'",
+                f"EXECUTE {name} (%s, %s)",
+                f"EXECUTE {name} (%s, %s)",
+            ],
+        )
+        self.assertEqual(
+            mock_cursor.execute.call_args_list[2].args[1],
+            ("alice@example.com", "alice"),
+        )
+
+    @patch("email_assistant.db.utils.release_conn")
+    @patch("email_assistant.db.utils.get_conn")
+    def test_execute_query_falls_back_when_prepare_fails(
+        self, mock_get_conn, mock_release
+    ):
+        """Test that a query PostgreSQL can't prepare is rolled back and run as is."""
+        conn = mock_get_conn.return_value
+        mock_cursor = conn.cursor.return_value
+        mock_cursor.connection = conn
+        mock_cursor.execute.side_effect = [psycopg2.ProgrammingError(), None]
+        query = "INSERT INTO users (username, email) VALUES (%s, %s)"
+
+        execute_query(query, ("bob", "bob@example.com"), prepared=True)
+
+        conn.rollback.assert_called_once()
+        mock_cursor.execute.assert_called_with(query, ("bob", "bob@example.com"))
+        conn.commit.assert_called_once()
+
+    @patch("email_assistant.db.utils.release_conn")
+    @patch("email_assistant.db.utils.get_conn")
+    def test_execute_query_is_not_prepared_by_default(
+        self, mock_get_conn, mock_release
+    ):
+        """Test that queries are only prepared when asked to."""
+        mock_cursor = mock_get_conn.return_value.cursor.return_value
+        query = "UPDATE users SET email = %s WHERE username = %s"
+
+        execute_query(query, ("bob@example.com", "bob"))
+
+        mock_cursor.execute.assert_called_once_with(query, ("bob@example.com", "bob"))
+
+    @patch("email_assistant.db.utils.release_conn")
+    @patch("email_assistant.db.utils.get_conn")
+    def test_stream_query(self, mock_get_conn, mock_release):
+        """Test that stream_query reads a named cursor chunk by chunk."""
+        mock_cursor = mock_get_conn.return_value.cursor.return_value
+        mock_cursor.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+
+        rows = list(stream_query("SELECT id FROM users", chunk_size=2))
+
+        self.assertEqual(rows, [(1,), (2,), (3,)])
+        self.assertTrue(
+            mock_get_conn.return_value.cursor.call_args.kwargs["name"].startswith(
+                "stream_"
+            )
+        )
+        mock_cursor.execute.assert_called_once_with("SELECT id FROM users", None)
+        mock_cursor.fetchmany.assert_called_with(2)
+        mock_cursor.close.assert_called_once()
+        mock_release.assert_called_once_with(mock_get_conn.return_value)
+
+
+if __name__ == "__main__":
+    unittest.main()
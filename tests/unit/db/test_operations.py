@@ -7,6 +7,7 @@ from email_assistant.db.operations import (
     insert_from_df,
     insert_new_user,
     insert_new_email,
+    insert_new_emails_bulk,
 )
 
 
@@ -61,37 +62,117 @@ class TestDBOperations(unittest.TestCase):
         # Verify DataFrame was returned
         pd.testing.assert_frame_equal(result_df, expected_df)
 
+    @patch("email_assistant.db.operations.get_connection")
+    @patch("email_assistant.db.operations.pd.DataFrame.to_sql")
+    def test_insert_from_df_copy(self, mock_to_sql, mock_get_connection):
+        """Test that a DataFrame with plain column types is loaded with COPY."""
+        # Setup mocks
+        mock_conn = MagicMock()
+        mock_context = MagicMock(__enter__=MagicMock(return_value=mock_conn))
+        mock_get_connection.return_value = mock_context
+        mock_cursor = mock_conn.connection.cursor.return_value.__enter__.return_value
+
+        # Create test DataFrame with more rows than the batch size
+        test_df = pd.DataFrame(
+            {"col1": range(150), "col2": ["a"] * 149 + [None], "col3": True}
+        )
+
+        # Execute function
+        insert_from_df(test_df, "test_table", batch_size=50)
+
+        # Verify a single COPY was issued and to_sql was not used
+        mock_to_sql.assert_not_called()
+        mock_cursor.copy_expert.assert_called_once()
+        statement, buffer = mock_cursor.copy_expert.call_args[0]
+        self.assertEqual(
+            statement,
+            'COPY test_table ("col1", "col2", "col3") FROM STDIN '
+            "WITH (FORMAT csv, NULL '\\N')",
+        )
+        lines = buffer.getvalue().splitlines()
+        self.assertEqual(len(lines), 150)
+        self.assertEqual(lines[0], "0,a,True")
+        self.assertEqual(lines[-1], "149,\\N,True")
+
+    @patch("email_assistant.db.operations.get_connection")
+    def test_insert_from_df_copy_keeps_empty_strings(self, mock_get_connection):
+        """Test that empty strings and missing values are told apart in the COPY data."""
+        mock_conn = MagicMock()
+        mock_context = MagicMock(__enter__=MagicMock(return_value=mock_conn))
+        mock_get_connection.return_value = mock_context
+        mock_cursor = mock_conn.connection.cursor.return_value.__enter__.return_value
+
+        test_df = pd.DataFrame({"col1": ["", None], "col2": [0.5, None]})
+
+        insert_from_df(test_df, "test_table")
+
+        _, buffer = mock_cursor.copy_expert.call_args[0]
+        self.assertEqual(buffer.getvalue().splitlines(), [",0.5", "\\N,\\N"])
+
+    @patch("email_assistant.db.operations.get_connection")
+    def test_insert_from_df_copy_fallbacks(self, mock_get_connection):
+        """Test that non-string objects and integers with missing values are not copied."""
+        mock_conn = MagicMock()
+        mock_context = MagicMock(__enter__=MagicMock(return_value=mock_conn))
+        mock_get_connection.return_value = mock_context
+        mock_cursor = mock_conn.connection.cursor.return_value.__enter__.return_value
+
+        for test_df in (
+            pd.DataFrame({"col1": [{"a": 1}, None]}),
+            pd.DataFrame({"col1": [1, None]}),
+        ):
+            mock_conn.execute.reset_mock()
+            insert_from_df(test_df, "test_table")
+            mock_conn.execute.assert_called_once()
+
+        mock_cursor.copy_expert.assert_not_called()
+        self.assertEqual(mock_conn.execute.call_args[0][1], [{"p0": 1.0}, {"p0": None}])
+
     @patch("email_assistant.db.operations.get_connection")
     @patch("email_assistant.db.operations.pd.DataFrame.to_sql")
     def test_insert_from_df_small_batch(self, mock_to_sql, mock_get_connection):
-        """Test inserting a small DataFrame (less than batch size)."""
+        """Test inserting a small DataFrame (less than batch size) that can't be copied."""
         # Setup mocks
         mock_conn = MagicMock()
         mock_context = MagicMock(__enter__=MagicMock(return_value=mock_conn))
         mock_get_connection.return_value = mock_context
 
-        # Create test DataFrame
-        test_df = pd.DataFrame({"col1": [1, 2], "col2": ["a", "b"]})
+        # Create test DataFrame with a column type that COPY can't load from CSV
+        test_df = pd.DataFrame(
+            {"col1": [1, 2], "col2": pd.to_timedelta([1, None], unit="s")}
+        )
 
         # Execute function
         insert_from_df(test_df, "test_table")
 
-        # Verify to_sql was called once with the right parameters
-        mock_to_sql.assert_called_once_with(
-            name="test_table", con=mock_conn, if_exists="append", index=False
+        # Verify a single executemany of the INSERT statement replaced to_sql
+        mock_to_sql.assert_not_called()
+        mock_conn.execute.assert_called_once()
+        statement, rows = mock_conn.execute.call_args[0]
+        self.assertEqual(
+            str(statement), "INSERT INTO test_table (col1, col2) VALUES (:p0, :p1)"
+        )
+        self.assertEqual(
+            rows,
+            [
+                {"p0": 1, "p1": pd.Timedelta(seconds=1)},
+                {"p0": 2, "p1": None},
+            ],
         )
 
     @patch("email_assistant.db.operations.get_connection")
     @patch("email_assistant.db.operations.pd.DataFrame.to_sql")
     def test_insert_from_df_large_batch(self, mock_to_sql, mock_get_connection):
-        """Test inserting a large DataFrame (more than batch size)."""
+        """Test inserting a large DataFrame (more than batch size) that can't be copied."""
         # Setup mocks
         mock_conn = MagicMock()
         mock_context = MagicMock(__enter__=MagicMock(return_value=mock_conn))
         mock_get_connection.return_value = mock_context
 
         # Create test DataFrame with 150 rows (more than default batch size of 100)
-        test_df = pd.DataFrame({"col1": range(150), "col2": ["a"] * 150})
+        test_df = pd.DataFrame(
+            {"col1": range(150), "col2": pd.to_timedelta(range(150), unit="s")}
+        )
 
         # Execute function with small batch size
         insert_from_df(test_df, "test_table", batch_size=50)
@@ -120,7 +201,9 @@ class TestDBOperations(unittest.TestCase):
         VALUES (%s, %s)
         """
         expected_params = ("test_user", "test@example.com")
-        mock_execute_query.assert_called_once_with(expected_query, expected_params)
+        mock_execute_query.assert_called_once_with(
+            expected_query, expected_params, prepared=True
+        )
 
     @patch("email_assistant.db.operations.encode_string")
     @patch("email_assistant.db.operations.execute_query")
@@ -165,7 +248,9 @@ class TestDBOperations(unittest.TestCase):
             None,
             "imap.gmail.com",
         )
-        mock_execute_query.assert_called_once_with(expected_query, expected_params)
+        mock_execute_query.assert_called_once_with(
+            expected_query, expected_params, prepared=True
+        )
 
     @patch("email_assistant.db.operations.encode_string")
     @patch("email_assistant.db.operations.execute_query")
@@ -196,7 +281,62 @@ class TestDBOperations(unittest.TestCase):
             None,
             None,
         )
-        mock_execute_query.assert_called_once_with(expected_query, expected_params)
+        mock_execute_query.assert_called_once_with(
+            expected_query, expected_params, prepared=True
+        )
+
+    @patch("email_assistant.db.operations.encode_string")
+    @patch("email_assistant.db.operations.execute_values_batch")
+    def test_insert_new_emails_bulk(self, mock_execute_values, mock_encode_string):
+        """Test that insert_new_emails_bulk sends every row in one execute_values call."""
+        mock_encode_string.side_effect = lambda x: f"encoded_{x}"
+
+        insert_new_emails_bulk(
+            [
+                {"email": "a@example.com", "user_id": 1, "email_provider": "gmail"},
+                {
+                    "email": "b@example.com",
+                    "user_id": 2,
+                    "email_provider": "imap",
+                    "imap_pwd": "secret",
+                },
+            ]
+        )
+
+        mock_execute_values.assert_called_once()
+        query, rows = mock_execute_values.call_args[0]
+        self.assertTrue(query.startswith("INSERT INTO email_accounts (email, user_id,"))
+        self.assertTrue(query.endswith("VALUES %s"))
+        self.assertEqual(
+            rows,
+            [
+                (
+                    "a@example.com",
+                    1,
+                    "gmail",
+                    None,
+                    None,
+                    None,
+                    None,
+                    False,
+                    None,
+                    None,
+                ),
+                (
+                    "b@example.com",
+                    2,
+                    "imap",
+                    None,
+                    None,
+                    "encoded_secret",
+                    None,
+                    False,
+                    None,
+                    None,
+                ),
+            ],
+        )
+        self.assertEqual(mock_execute_values.call_args[1], {"page_size": 500})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,17 @@
+from email.parser import BytesHeaderParser
+
+
+def assert_headers(raw_msg, **expected):
+    """Parse a raw message once and check its headers, None meaning absent
+
+    Dashes in header names are written as underscores, e.g. In_Reply_To.
+
+    Returns:
+        email.message.Message: The parsed headers, with the body as payload
+    """
+    # Only the headers are parsed, the body is kept as is in the payload
+    msg = BytesHeaderParser().parsebytes(raw_msg)
+    for name, value in expected.items():
+        name = name.replace("_", "-")
+        assert msg[name] == value, f"{name}: {msg[name]!r} != {value!r}"
+    return msg
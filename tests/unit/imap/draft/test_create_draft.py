@@ -1,8 +1,22 @@
 import pytest
 from unittest.mock import MagicMock, patch
 import imaplib
+from types import MappingProxyType
 import logging
 from email_assistant.email_scripts.imap_account.create_draft import create_draft_imap
+from _helpers import assert_headers
+
+# Common test data for all tests
+TEST_DATA = MappingProxyType(
+    {
+        "email_address": "test@example.com",
+        "subject": "Test Subject",
+        "body": "This is a test email body.",
+        "recipient": "recipient@example.com",
+        "thread_id": "<test-thread-id@example.com>",
+        "draft_folder": "[Gmail]/Drafts",
+    }
+)
 
 
 @pytest.fixture
@@ -14,32 +28,19 @@ def mock_mailbox():
     return mock
 
 
-@pytest.fixture
-def test_data():
-    """Common test data for all tests"""
-    return {
-        "email_address": "test@example.com",
-        "subject": "Test Subject",
-        "body": "This is a test email body.",
-        "recipient": "recipient@example.com",
-        "thread_id": "<test-thread-id@example.com>",
-        "draft_folder": "[Gmail]/Drafts",
-    }
-
-
-def test_create_draft_basic(mock_mailbox, test_data):
+def test_create_draft_basic(mock_mailbox):
     """Test creating a basic draft without thread ID"""
     # Call the function
     create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
     )
 
     # Verify mailbox.select was called with the correct folder
-    mock_mailbox.select.assert_called_once_with(test_data["draft_folder"])
+    mock_mailbox.select.assert_called_once_with(TEST_DATA["draft_folder"])
 
     # Verify mailbox.append was called
     mock_mailbox.append.assert_called_once()
@@ -48,30 +49,31 @@ def test_create_draft_basic(mock_mailbox, test_data):
     args = mock_mailbox.append.call_args[0]
 
     # Check folder name
-    assert args[0] == test_data["draft_folder"]
+    assert args[0] == TEST_DATA["draft_folder"]
 
     # Check the email content
-    raw_msg = args[3]
-    assert f"From: {test_data['email_address']}".encode() in raw_msg
-    assert f"To: {test_data['recipient']}".encode() in raw_msg
-    assert f"Subject: {test_data['subject']}".encode() in raw_msg
-    assert test_data["body"].encode() in raw_msg
-
-    # Thread ID should not be present
-    assert b"In-Reply-To:" not in raw_msg
-    assert b"References:" not in raw_msg
+    msg = assert_headers(
+        args[3],
+        From=TEST_DATA["email_address"],
+        To=TEST_DATA["recipient"],
+        Subject=TEST_DATA["subject"],
+        # Thread ID should not be present
+        In_Reply_To=None,
+        References=None,
+    )
+    assert msg.get_payload() == TEST_DATA["body"]
 
 
-def test_create_draft_with_thread_id(mock_mailbox, test_data):
+def test_create_draft_with_thread_id(mock_mailbox):
     """Test creating a draft with a thread ID"""
     # Call the function with thread_id
     create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
-        test_data["thread_id"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
+        TEST_DATA["thread_id"],
     )
 
     # Verify mailbox.append was called
@@ -81,24 +83,25 @@ def test_create_draft_with_thread_id(mock_mailbox, test_data):
     args = mock_mailbox.append.call_args[0]
 
     # Check the email content
-    raw_msg = args[3]
-
     # Thread ID should be present
-    assert f"In-Reply-To: {test_data['thread_id']}".encode() in raw_msg
-    assert f"References: {test_data['thread_id']}".encode() in raw_msg
+    assert_headers(
+        args[3],
+        In_Reply_To=TEST_DATA["thread_id"],
+        References=TEST_DATA["thread_id"],
+    )
 
 
-def test_create_draft_custom_folder(mock_mailbox, test_data):
+def test_create_draft_custom_folder(mock_mailbox):
     """Test creating a draft in a custom folder"""
     custom_folder = "Custom/Drafts"
 
     # Call the function with custom draft folder
     create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
         draft_folder=custom_folder,
     )
 
@@ -111,7 +114,7 @@ def test_create_draft_custom_folder(mock_mailbox, test_data):
 
 
 @patch("imaplib.Time2Internaldate")
-def test_timestamp_generation(mock_time2internaldate, mock_mailbox, test_data):
+def test_timestamp_generation(mock_time2internaldate, mock_mailbox):
     """Test that the timestamp is generated correctly"""
     mock_timestamp = b"01-Jan-2023 12:00:00 +0000"
     mock_time2internaldate.return_value = mock_timestamp
@@ -119,10 +122,10 @@ def test_timestamp_generation(mock_time2internaldate, mock_mailbox, test_data):
     # Call the function
     create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
     )
 
     # Verify Time2Internaldate was called
@@ -133,7 +136,7 @@ def test_timestamp_generation(mock_time2internaldate, mock_mailbox, test_data):
     assert args[2] == mock_timestamp
 
 
-def test_error_handling(mock_mailbox, test_data):
+def test_error_handling(mock_mailbox):
     """Test error handling when mailbox operations fail"""
     # Make mailbox.append raise an exception
     mock_mailbox.append.side_effect = imaplib.IMAP4.error("Failed to append")
@@ -141,10 +144,10 @@ def test_error_handling(mock_mailbox, test_data):
     # Call the function and check if it returns False
     result = create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
     )
 
     # Verify the function returned False
@@ -154,7 +157,7 @@ def test_error_handling(mock_mailbox, test_data):
     mock_mailbox.append.assert_called_once()
 
 
-def test_select_folder_failure(mock_mailbox, test_data):
+def test_select_folder_failure(mock_mailbox):
     """Test handling of select folder failure (status not OK)"""
     # Configure the mock to return failure for select operation
     mock_mailbox.select.return_value = ("NO", ["Folder doesn't exist"])
@@ -162,23 +165,23 @@ def test_select_folder_failure(mock_mailbox, test_data):
     # Call the function
     result = create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
     )
 
     # Verify the function returned False
     assert result is False
 
     # Verify mailbox.select was called
-    mock_mailbox.select.assert_called_once_with(test_data["draft_folder"])
+    mock_mailbox.select.assert_called_once_with(TEST_DATA["draft_folder"])
 
     # Verify mailbox.append was not called
     mock_mailbox.append.assert_not_called()
 
 
-def test_append_failure(mock_mailbox, test_data):
+def test_append_failure(mock_mailbox):
     """Test handling of append failure (status not OK)"""
     # Configure the mock to return failure for append operation
     mock_mailbox.append.return_value = ("NO", ["Quota exceeded"])
@@ -186,23 +189,23 @@ def test_append_failure(mock_mailbox, test_data):
     # Call the function
     result = create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
     )
 
     # Verify the function returned False
     assert result is False
 
     # Verify mailbox.select was called
-    mock_mailbox.select.assert_called_once_with(test_data["draft_folder"])
+    mock_mailbox.select.assert_called_once_with(TEST_DATA["draft_folder"])
 
     # Verify mailbox.append was called
     mock_mailbox.append.assert_called_once()
 
 
-def test_successful_draft_creation_logs_message(mock_mailbox, test_data, caplog):
+def test_successful_draft_creation_logs_message(mock_mailbox, caplog):
     """Test that a success message is logged when the draft is created successfully"""
     # Set the log level to capture INFO messages
     caplog.set_level(logging.INFO)
@@ -213,10 +216,10 @@ def test_successful_draft_creation_logs_message(mock_mailbox, test_data, caplog)
     # Call the function
     result = create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
     )
 
     # Verify the function returned True
@@ -224,5 +227,5 @@ def test_successful_draft_creation_logs_message(mock_mailbox, test_data, caplog)
 
     # Verify the success message was logged
     assert (
-        f"Successfully created draft email to {test_data['recipient']}" in caplog.text
+        f"Successfully created draft email to {TEST_DATA['recipient']}" in caplog.text
     )
@@ -1,7 +1,22 @@
 import pytest
 from unittest.mock import MagicMock, patch
 import imaplib
+from types import MappingProxyType
+import email
+from email.header import decode_header, make_header
 from email_assistant.email_scripts.imap_account.create_draft import create_draft_imap
+from _helpers import assert_headers
+
+# Common test data for all tests
+TEST_DATA = MappingProxyType(
+    {
+        "email_address": "test@example.com",
+        "subject": "Test Subject",
+        "body": "This is a test email body.",
+        "recipient": "recipient@example.com",
+        "draft_folder": "[Gmail]/Drafts",
+    }
+)
 
 
 @pytest.fixture
@@ -13,27 +28,15 @@ def mock_mailbox():
     return mock
 
 
-@pytest.fixture
-def test_data():
-    """Common test data for all tests"""
-    return {
-        "email_address": "test@example.com",
-        "subject": "Test Subject",
-        "body": "This is a test email body.",
-        "recipient": "recipient@example.com",
-        "draft_folder": "[Gmail]/Drafts",
-    }
-
-
-def test_empty_body(mock_mailbox, test_data):
+def test_empty_body(mock_mailbox):
     """Test creating a draft with an empty body"""
     # Call the function with empty body
     create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
         "",  # Empty body
-        test_data["recipient"],
+        TEST_DATA["recipient"],
     )
 
     # Verify mailbox.append was called
@@ -44,23 +47,27 @@ def test_empty_body(mock_mailbox, test_data):
 
     # Check the email content
     raw_msg = args[3]
-    assert f"From: {test_data['email_address']}".encode() in raw_msg
-    assert f"To: {test_data['recipient']}".encode() in raw_msg
-    assert f"Subject: {test_data['subject']}".encode() in raw_msg
+    msg = assert_headers(
+        raw_msg,
+        From=TEST_DATA["email_address"],
+        To=TEST_DATA["recipient"],
+        Subject=TEST_DATA["subject"],
+    )
 
     # Body should be empty but the email should still be valid
     assert b"\n\n" in raw_msg  # Headers and body separator should exist
+    assert msg.get_payload() == ""
 
 
-def test_empty_subject(mock_mailbox, test_data):
+def test_empty_subject(mock_mailbox):
     """Test creating a draft with an empty subject"""
     # Call the function with empty subject
     create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
+        TEST_DATA["email_address"],
         "",  # Empty subject
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
     )
 
     # Verify mailbox.append was called
@@ -70,14 +77,16 @@ def test_empty_subject(mock_mailbox, test_data):
     args = mock_mailbox.append.call_args[0]
 
     # Check the email content
-    raw_msg = args[3]
-    assert f"From: {test_data['email_address']}".encode() in raw_msg
-    assert f"To: {test_data['recipient']}".encode() in raw_msg
-    assert b"Subject: " in raw_msg  # Subject header exists but is empty
-    assert test_data["body"].encode() in raw_msg
+    msg = assert_headers(
+        args[3],
+        From=TEST_DATA["email_address"],
+        To=TEST_DATA["recipient"],
+        Subject="",  # Subject header exists but is empty
+    )
+    assert msg.get_payload() == TEST_DATA["body"]
 
 
-def test_special_characters_in_body(mock_mailbox, test_data):
+def test_special_characters_in_body(mock_mailbox):
     """Test creating a draft with special characters in the body"""
     special_body = (
         "This body has special characters: !@#$%^&*()_+{}|:<>?~`-=[]\\;',./\n\t"
@@ -86,10 +95,10 @@ def test_special_characters_in_body(mock_mailbox, test_data):
     # Call the function with special characters in body
     create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
         special_body,
-        test_data["recipient"],
+        TEST_DATA["recipient"],
     )
 
     # Verify mailbox.append was called
@@ -103,7 +112,7 @@ def test_special_characters_in_body(mock_mailbox, test_data):
     assert special_body.encode() in raw_msg
 
 
-def test_unicode_characters(mock_mailbox, test_data):
+def test_unicode_characters(mock_mailbox):
     """Test creating a draft with Unicode characters"""
     unicode_subject = "Unicode Subject: 你好, こんにちは, 안녕하세요"
     unicode_body = "Unicode Body: 你好, こんにちは, 안녕하세요, Привет, مرحبا, שלום"
@@ -111,10 +120,10 @@ def test_unicode_characters(mock_mailbox, test_data):
     # Call the function with Unicode characters
     create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
+        TEST_DATA["email_address"],
         unicode_subject,
         unicode_body,
-        test_data["recipient"],
+        TEST_DATA["recipient"],
     )
 
     # Verify mailbox.append was called
@@ -134,7 +143,7 @@ def test_unicode_characters(mock_mailbox, test_data):
     assert b"Content-Type: text/plain" in raw_msg
 
 
-def test_multiple_recipients(mock_mailbox, test_data):
+def test_multiple_recipients(mock_mailbox):
     """Test creating a draft with multiple recipients"""
     multiple_recipients = (
         "recipient1@example.com, recipient2@example.com, recipient3@example.com"
@@ -143,9 +152,9 @@ def test_multiple_recipients(mock_mailbox, test_data):
     # Call the function with multiple recipients
     create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
         multiple_recipients,
     )
 
@@ -156,12 +165,11 @@ def test_multiple_recipients(mock_mailbox, test_data):
     args = mock_mailbox.append.call_args[0]
 
     # Check the email content
-    raw_msg = args[3]
-    assert f"To: {multiple_recipients}".encode() in raw_msg
+    assert_headers(args[3], To=multiple_recipients)
 
 
 @patch("imaplib.Time2Internaldate")
-def test_time2internaldate_error(mock_time2internaldate, mock_mailbox, test_data):
+def test_time2internaldate_error(mock_time2internaldate, mock_mailbox):
     """Test handling of Time2Internaldate errors"""
     # Make Time2Internaldate raise an exception
     mock_time2internaldate.side_effect = Exception("Time2Internaldate error")
@@ -169,10 +177,10 @@ def test_time2internaldate_error(mock_time2internaldate, mock_mailbox, test_data
     # Call the function and check if it returns False
     result = create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
     )
 
     # Verify the function returned False
@@ -182,7 +190,7 @@ def test_time2internaldate_error(mock_time2internaldate, mock_mailbox, test_data
     mock_time2internaldate.assert_called_once()
 
 
-def test_select_folder_error(mock_mailbox, test_data):
+def test_select_folder_error(mock_mailbox):
     """Test handling of select folder errors"""
     # Reset the mock to override the fixture's configuration
     mock_mailbox.select.reset_mock()
@@ -192,10 +200,10 @@ def test_select_folder_error(mock_mailbox, test_data):
     # Call the function and check if it returns False
     result = create_draft_imap(
         mock_mailbox,
-        test_data["email_address"],
-        test_data["subject"],
-        test_data["body"],
-        test_data["recipient"],
+        TEST_DATA["email_address"],
+        TEST_DATA["subject"],
+        TEST_DATA["body"],
+        TEST_DATA["recipient"],
     )
 
     # Verify the function returned False
@@ -203,3 +211,24 @@ def test_select_folder_error(mock_mailbox, test_data):
 
     # Verify select was called
     mock_mailbox.select.assert_called_once()
+
+
+def test_unicode_round_trip(mock_mailbox):
+    """Test that a Unicode draft decodes back to the original subject and body"""
+    unicode_subject = "Réponse: 你好"
+    unicode_body = "Bonjour à tous,\nПривет"
+
+    create_draft_imap(
+        mock_mailbox,
+        TEST_DATA["email_address"],
+        unicode_subject,
+        unicode_body,
+        TEST_DATA["recipient"],
+    )
+
+    raw_msg = mock_mailbox.append.call_args[0][3]
+    msg = email.message_from_bytes(raw_msg)
+    assert str(make_header(decode_header(msg["Subject"]))) == unicode_subject
+    assert msg.get_payload(decode=True).decode(msg.get_content_charset()) == (
+        unicode_body
+    )
@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import MagicMock, patch
 import imaplib
 from email_assistant.email_scripts.imap_account.create_draft import create_draft_imap
+from _helpers import assert_headers
 
 
 @pytest.fixture
@@ -87,10 +88,12 @@ def test_create_draft_example_usage(
     args = mock_mailbox.append.call_args[0]
 
     # Check the email content
-    raw_msg = args[3]
-    assert f"From: {mock_email_infos['imap_login']}".encode() in raw_msg
-    assert f"To: {recipient}".encode() in raw_msg
-    assert f"Subject: {subject}".encode() in raw_msg
-    assert body.encode() in raw_msg
-    assert f"In-Reply-To: {thread_id}".encode() in raw_msg
-    assert f"References: {thread_id}".encode() in raw_msg
+    msg = assert_headers(
+        args[3],
+        From=mock_email_infos["imap_login"],
+        To=recipient,
+        Subject=subject,
+        In_Reply_To=thread_id,
+        References=thread_id,
+    )
+    assert msg.get_payload() == body
@@ -0,0 +1,90 @@
+import imaplib
+import re
+import pytest
+from unittest.mock import MagicMock
+from email_assistant.email_scripts.imap_account.create_draft import create_drafts_imap
+
+
+class FakeIMAP(imaplib.IMAP4):
+    """imaplib client talking to a scripted in-memory server"""
+
+    def __init__(self, capabilities):
+        self.server_capabilities = capabilities
+        self.events = []
+        super().__init__()
+        self.state = "AUTH"
+
+    def open(self, host="", port=imaplib.IMAP4_PORT, timeout=None):
+        self.host, self.port = host, port
+        self.sock = None
+        self.responses = [b"* OK ready\r\n"]
+
+    def send(self, data):
+        tag, command = data.split(b"\r\n", 1)[0].split(b" ")[:2]
+        if command == b"APPEND":
+            # Only non-synchronizing literals are sent in a single write
+            assert re.search(rb"\{\d+\+\}\r\n", data)
+            self.events.append(("append", tag))
+        self._answer(tag, command)
+
+    def _answer(self, tag, command):
+        if command == b"CAPABILITY":
+            self.responses.append(b"* CAPABILITY " + self.server_capabilities + b"\r\n")
+        elif command == b"SELECT":
+            self.responses.append(b"* 0 EXISTS\r\n")
+        self.responses.append(tag + b" OK done\r\n")
+
+    def readline(self):
+        self.events.append(("read",))
+        return self.responses.pop(0)
+
+    def read(self, size):
+        raise AssertionError("no literal is read")
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def drafts():
+    return [
+        ("Subject 1", "Body 1", "a@example.com", None),
+        ("Subject 2", "Body 2", "b@example.com", "<thread@example.com>"),
+        ("Subject 3", "Body 3", "c@example.com", None),
+    ]
+
+
+def test_appends_are_pipelined_with_literal_plus(drafts):
+    """Test that every APPEND is written before any of their responses is read"""
+    mailbox = FakeIMAP(b"IMAP4rev1 LITERAL+")
+    mailbox.events.clear()
+
+    results = create_drafts_imap(mailbox, "me@example.com", drafts)
+
+    assert results == [True, True, True]
+    appends = [i for i, event in enumerate(mailbox.events) if event[0] == "append"]
+    assert len(appends) == 3
+    assert appends == list(range(appends[0], appends[0] + 3))
+
+
+def test_appends_without_literal_plus_are_sent_one_by_one(drafts):
+    """Test that servers without non-synchronizing literals get plain APPENDs"""
+    mailbox = MagicMock(spec=imaplib.IMAP4_SSL)
+    mailbox.select.return_value = ("OK", [b"1"])
+    mailbox.capability.return_value = ("OK", [b"IMAP4rev1 IDLE"])
+    mailbox.append.side_effect = [("OK", []), ("NO", [b"full"]), ("OK", [])]
+
+    results = create_drafts_imap(mailbox, "me@example.com", drafts, "Drafts")
+
+    assert results == [True, False, True]
+    mailbox.select.assert_called_once_with("Drafts")
+    assert mailbox.append.call_count == 3
+    assert b"Subject: Subject 2" in mailbox.append.call_args_list[1].args[3]
+
+
+def test_no_drafts():
+    """Test that an empty batch does not touch the mailbox"""
+    mailbox = MagicMock(spec=imaplib.IMAP4_SSL)
+
+    assert create_drafts_imap(mailbox, "me@example.com", []) == []
+    mailbox.select.assert_not_called()
@@ -0,0 +1,90 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from email_assistant.email_scripts.imap_account import folders_utils
+from email_assistant.email_scripts.imap_account.folders_utils import (
+    check_and_create_new_folders,
+    get_mailbox,
+    release_mailbox,
+    resolve_folder,
+)
+
+FOLDER_LIST = [
+    b'(\\HasNoChildren) "/" "INBOX"',
+    b'(\\HasNoChildren \\Drafts) "/" "[Gmail]/Drafts"',
+    b'(\\HasNoChildren \\Sent) "/" "[Gmail]/Sent Mail"',
+]
+
+
+class TestResolveFolder(unittest.TestCase):
+    def test_list_is_sent_once_per_mailbox(self):
+        """Test that folder lookups after the first one reuse the LIST response."""
+        mailbox = MagicMock()
+        mailbox.list.return_value = ("OK", FOLDER_LIST)
+
+        self.assertEqual(resolve_folder(mailbox, "inbox"), '"INBOX"')
+        self.assertEqual(resolve_folder(mailbox, "draft"), '"[Gmail]/Drafts"')
+        self.assertEqual(resolve_folder(mailbox, "sent"), '"[Gmail]/Sent Mail"')
+        mailbox.list.assert_called_once()
+
+    def test_creating_folders_invalidates_the_cache(self):
+        """Test that the cache is dropped when new folders are created."""
+        mailbox = MagicMock()
+        mailbox.list.return_value = ("OK", FOLDER_LIST)
+        mailbox._command_complete.return_value = ("OK", [b""])
+
+        check_and_create_new_folders(mailbox, ["To respond"])
+        resolve_folder(mailbox, "inbox")
+
+        self.assertEqual(mailbox.list.call_count, 2)
+
+        check_and_create_new_folders(mailbox, ["INBOX"])
+        resolve_folder(mailbox, "sent")
+
+        self.assertEqual(mailbox.list.call_count, 3)
+
+
+@patch("email_assistant.email_scripts.imap_account.folders_utils.imaplib.IMAP4_SSL")
+class TestMailboxPool(unittest.TestCase):
+    def setUp(self):
+        folders_utils._mailbox_pool.clear()
+
+    def tearDown(self):
+        folders_utils._mailbox_pool.clear()
+
+    def test_released_mailbox_is_reused(self, imap_ssl):
+        """Test that a released connection is checked with NOOP and reused."""
+        imap_ssl.side_effect = lambda *args, **kwargs: MagicMock()
+
+        mailbox = get_mailbox("imap.example.com", 993, "me", "pwd")
+        mailbox.noop.return_value = ("OK", [b""])
+        release_mailbox(mailbox)
+
+        self.assertIs(get_mailbox("imap.example.com", "993", "me", "pwd"), mailbox)
+        mailbox.logout.assert_not_called()
+        self.assertIsNot(get_mailbox("imap.example.com", 993, "me", "pwd"), mailbox)
+        self.assertEqual(imap_ssl.call_count, 2)
+
+    def test_dead_or_idle_mailbox_is_replaced(self, imap_ssl):
+        """Test that a connection failing NOOP or idle too long is logged out."""
+        imap_ssl.side_effect = lambda *args, **kwargs: MagicMock()
+
+        dead = get_mailbox("imap.example.com", 993, "me", "pwd")
+        dead.noop.side_effect = OSError("connection reset")
+        release_mailbox(dead)
+        self.assertIsNot(get_mailbox("imap.example.com", 993, "me", "pwd"), dead)
+        dead.logout.assert_called_once()
+
+        idle = get_mailbox("imap.example.com", 993, "you", "pwd")
+        release_mailbox(idle)
+        with patch(
+            "email_assistant.email_scripts.imap_account.folders_utils."
+            "IMAP_POOL_IDLE_SECONDS",
+            -1,
+        ):
+            self.assertIsNot(get_mailbox("imap.example.com", 993, "you", "pwd"), idle)
+        idle.logout.assert_called_once()
+        idle.noop.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
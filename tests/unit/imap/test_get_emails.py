@@ -0,0 +1,140 @@
+import unittest
+from unittest.mock import MagicMock
+from email_assistant.email_scripts.imap_account.get_emails import (
+    extract_recipient_email,
+    extract_sender_email,
+    extract_subjects,
+    read_last_n_last_emails,
+    get_emails_body,
+    html_to_text,
+    is_html,
+)
+
+ENVELOPE = (
+    '12 (ENVELOPE ("Mon, 7 Oct 2024 10:12:00 +0200" '
+    '"=?utf-8?q?Caf=C3=A9?= \\"menu\\"" '
+    '(("=?utf-8?q?Jos=C3=A9?=" NIL "jose" "example.com")) '
+    '(("Jose" NIL "jose" "example.com")) '
+    '(("Jose" NIL "jose" "example.com")) '
+    '((NIL NIL "me" "mine.org")("Bob" NIL "bob" "x.com")) '
+    'NIL NIL "<parent@example.com>" "<abc@example.com>"))'
+)
+
+
+class TestEnvelopeParsing(unittest.TestCase):
+    def test_extract_sender_email(self):
+        """Test that the sender fields are read from their envelope positions."""
+        email, name, subject, date_str, msg_id = extract_sender_email(ENVELOPE)
+
+        self.assertEqual(email, "jose@example.com")
+        self.assertEqual(name, "José")
+        self.assertEqual(date_str, "Mon, 7 Oct 2024 10:12:00 +0200")
+        # The message-id field is used, not the In-Reply-To that precedes it
+        self.assertEqual(msg_id, "<abc@example.com>")
+
+    def test_extract_subjects_unescapes_quotes(self):
+        """Test that escaped quotes inside the subject are unescaped."""
+        self.assertEqual(extract_subjects([ENVELOPE]), ['Café  "menu"'])
+
+    def test_extract_recipient_email(self):
+        """Test that the recipient is the first address of the To field."""
+        self.assertEqual(extract_recipient_email(ENVELOPE), "me@mine.org")
+
+    def test_nil_subject_and_missing_envelope(self):
+        """Test that NIL fields and non-envelope lines are handled."""
+        message = ENVELOPE.replace('"=?utf-8?q?Caf=C3=A9?= \\"menu\\""', "NIL")
+
+        self.assertEqual(extract_subjects([message]), ["No subject found"])
+        self.assertEqual(extract_sender_email(message)[2], "")
+        self.assertEqual(extract_sender_email(")"), (None,) * 5)
+
+    def test_literal_subject(self):
+        """Test that a subject sent as an IMAP literal is read by byte count."""
+        message = ENVELOPE.replace(
+            '"=?utf-8?q?Caf=C3=A9?= \\"menu\\""', "{7}\r\nCafé )"
+        )
+
+        self.assertEqual(extract_subjects([message]), ["Café )"])
+        self.assertEqual(extract_sender_email(message)[0], "jose@example.com")
+
+    def test_html_to_text(self):
+        """Test that HTML bodies are reduced to their visible text lines."""
+        body = (
+            "<!DOCTYPE html><HTML><head><style>p {}</style></head><body>"
+            "<p> Hello  <b>there</b></p>\n\n<div> </div><p>Bye</p></body></HTML>"
+        )
+
+        self.assertTrue(is_html(body))
+        self.assertFalse(is_html("Plain text mentioning html> late"))
+        self.assertEqual(html_to_text(body), "Hello\nthere\nBye")
+
+    def test_get_emails_body_fetches_once(self):
+        """Test that bodies are fetched in one command and kept in id order."""
+        mail = MagicMock()
+        mail.fetch.return_value = (
+            "OK",
+            [
+                (b"3 (BODY[] {40}", b"Date: Tue, 8 Oct 2024\r\n\r\nthird body"),
+                b")",
+                (b"1 (BODY[] {40}", b"Date: Mon, 7 Oct 2024\r\n\r\nfirst body"),
+                b")",
+            ],
+        )
+
+        bodies, dates = get_emails_body(mail, ["1", "3"])
+
+        mail.fetch.assert_called_once_with("1,3", "(BODY.PEEK[])")
+        self.assertEqual(bodies, ["first body", "third body"])
+        self.assertEqual(dates, ["Mon, 7 Oct 2024", "Tue, 8 Oct 2024"])
+
+    def test_read_last_n_last_emails_reuses_the_connection(self):
+        """Test that envelopes are read on the caller's open connection."""
+        mail = MagicMock()
+        mail.select.return_value = ("OK", [b"12"])
+        mail.search.return_value = ("OK", [b"11 12"])
+        mail.fetch.return_value = ("OK", [ENVELOPE.encode()])
+
+        emails, ids, names, subjects, _, smtp_ids, _ = read_last_n_last_emails(
+            mail, n_last=1, mailbox_folder='"INBOX"'
+        )
+
+        mail.select.assert_called_once_with('"INBOX"')
+        mail.fetch.assert_called_once_with("12", "(ENVELOPE)")
+        mail.search.assert_not_called()
+        mail.logout.assert_not_called()
+        self.assertEqual(ids, ["12"])
+        self.assertEqual(emails, ["jose@example.com"])
+        self.assertEqual(smtp_ids, ["<abc@example.com>"])
+
+    def test_read_last_n_last_emails_keeps_lists_aligned(self):
+        """Test that an envelope without sender drops its id and subject too."""
+        no_sender = (
+            '11 (ENVELOPE ("Mon, 7 Oct 2024" "Lost" NIL NIL NIL NIL NIL NIL NIL NIL))'
+        )
+        mail = MagicMock()
+        mail.select.return_value = ("OK", [b"12"])
+        mail.search.return_value = ("OK", [b"11 12"])
+        mail.fetch.return_value = ("OK", [no_sender.encode(), ENVELOPE.encode()])
+
+        emails, ids, _, subjects, _, _, _ = read_last_n_last_emails(mail, n_last=2)
+
+        self.assertEqual(emails, ["jose@example.com"])
+        self.assertEqual(ids, ["12"])
+        self.assertEqual(subjects, ['Café  "menu"'])
+
+    def test_get_emails_body_partial_fetch(self):
+        """Test that max_bytes asks the server for the start of each message."""
+        mail = MagicMock()
+        mail.fetch.return_value = (
+            "OK",
+            [(b"5 (BODY[]<0> {30}", b"Date: Mon, 7 Oct 2024\r\n\r\nstart"), b")"],
+        )
+
+        bodies, _ = get_emails_body(mail, ["5"], max_bytes=1024)
+
+        mail.fetch.assert_called_once_with("5", "(BODY.PEEK[]<0.1024>)")
+        self.assertEqual(bodies, ["start"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import base64
+import email
+import unittest
+from email_assistant.email_scripts.imap_account.utils import get_body, remove_img
+
+MULTIPART_EMAIL = b"""\
+MIME-Version: 1.0
+Content-Type: multipart/alternative; boundary="b1"
+
+--b1
+Content-Type: text/plain; charset="utf-8"
+
+Plain version
+--b1
+Content-Type: text/html; charset="utf-8"
+Content-Transfer-Encoding: quoted-printable
+
+<p style=3D"width=3D100">Caf=C3=A9 =3D 10</p><img src=3D"x.png">
+--b1--
+"""
+
+
+class TestGetBody(unittest.TestCase):
+    def test_html_part_is_decoded_once(self):
+        """Test that quoted-printable html is not decoded a second time."""
+        email_message = email.message_from_bytes(MULTIPART_EMAIL)
+
+        self.assertEqual(get_body(email_message), '<p style="width=100">Café = 10</p>')
+
+    def test_declared_charset_is_used(self):
+        """Test that a latin-1 body is decoded with its charset, not as utf-8."""
+        email_message = email.message_from_bytes(
+            b'Content-Type: text/html; charset="iso-8859-1"\n'
+            b"Content-Transfer-Encoding: base64\n\n"
+            + base64.b64encode("<p>Caf\u00e9</p>".encode("latin-1"))
+        )
+
+        self.assertEqual(get_body(email_message), "<p>Café</p>")
+
+    def test_remove_img(self):
+        """Test that img tags are removed, including multi-line ones."""
+        html = '<p>a<IMG src="x.png">b<img\n  alt="y"\n  src="z.png"/>c<imgx></p>'
+
+        self.assertEqual(remove_img(html), "<p>abc<imgx></p>")
+
+
+if __name__ == "__main__":
+    unittest.main()
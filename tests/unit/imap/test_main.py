@@ -1,11 +1,161 @@
-from email_assistant.email_scripts.imap_account.main import main
-from dotenv import load_dotenv
-import os
+from unittest.mock import MagicMock, patch
+import pandas as pd
+from email_assistant.email_scripts.imap_account.main import (
+    check_ids_not_in_table,
+    get_email_infos,
+    invalidate_email_infos,
+    main,
+    search_replies,
+)
 
-load_dotenv()
+MAIN = "email_assistant.email_scripts.imap_account.main"
 
-gmail_account = os.getenv("GMAIL_ACCOUNT")
 
+def test_main_labels_drafts_and_records_new_emails():
+    mailbox = MagicMock()
+    email_infos = {
+        "imap_server": "imap.example.com",
+        "imap_port": 993,
+        "imap_login": "me@x.com",
+        "imap_pwd": "secret",
+    }
+    envelopes = (
+        ["me@x.com", "a@x.com", "b@x.com"],
+        ["1", "2", "3"],
+        ["Me", "A", "B"],
+        ["Mine", "Question", "News"],
+        ["d1", "d2", "d3"],
+        ["<1@x>", "<2@x>", "<3@x>"],
+        ["me@x.com"] * 3,
+    )
+    with patch(f"{MAIN}.get_mailbox", return_value=mailbox) as get_mailbox, patch(
+        f"{MAIN}.check_and_create_new_folders"
+    ), patch(f"{MAIN}.resolve_folder", side_effect=lambda _, name: f'"{name}"'), patch(
+        f"{MAIN}.read_last_n_last_emails", return_value=envelopes
+    ), patch(
+        f"{MAIN}.check_ids_not_in_table", side_effect=lambda ids: ids
+    ), patch(
+        f"{MAIN}.get_emails_body", return_value=(["body 3", "body 2"], ["d3", "d2"])
+    ), patch(
+        f"{MAIN}.classify_emails_batch",
+        return_value=[{"label": "Fyi"}, {"label": "To respond"}],
+    ), patch(
+        f"{MAIN}.label_email"
+    ) as label_email, patch(
+        f"{MAIN}.get_emails_with_drafts_or_answers", return_value=set()
+    ), patch(
+        f"{MAIN}.create_ai_draft_responses_batch", return_value=["draft 2"]
+    ), patch(
+        f"{MAIN}.create_drafts_imap"
+    ) as create_drafts_imap, patch(
+        f"{MAIN}.release_mailbox"
+    ) as release_mailbox, patch(
+        f"{MAIN}.insert_from_df"
+    ) as insert_from_df:
+        main(email_infos)
 
-def test_main():
-    main(gmail_account)
+    get_mailbox.assert_called_once_with("imap.example.com", 993, "me@x.com", "secret")
+    # The email sent by the account itself is skipped, newest emails first
+    label_email.assert_any_call(mailbox, "inbox", "Fyi", ["3"])
+    label_email.assert_any_call(mailbox, "inbox", '"To respond"', ["2"])
+    create_drafts_imap.assert_called_once_with(
+        mailbox,
+        "me@x.com",
+        [("Question", "draft 2", "A", "<2@x>")],
+        draft_folder='"draft"',
+    )
+    release_mailbox.assert_called_once_with(mailbox)
+    inserted, table = insert_from_df.call_args.args
+    assert table == "received_emails"
+    assert inserted["smtp_msg_id"].to_list() == ["<3@x>", "<2@x>"]
+    assert inserted["email_classified"].all()
+
+
+def test_main_without_mailbox():
+    with patch(f"{MAIN}.get_mailbox", return_value=None), patch(
+        f"{MAIN}.read_last_n_last_emails"
+    ) as read_last_n_last_emails:
+        main({"imap_login": "me@x.com", "imap_pwd": "secret"})
+
+    read_last_n_last_emails.assert_not_called()
+
+
+def test_main_releases_mailbox_without_new_emails():
+    mailbox = MagicMock()
+    envelopes = (["me@x.com"], ["1"], ["Me"], ["Mine"], ["d1"], ["<1@x>"], ["me@x.com"])
+    with patch(f"{MAIN}.get_mailbox", return_value=mailbox), patch(
+        f"{MAIN}.check_and_create_new_folders"
+    ), patch(f"{MAIN}.resolve_folder"), patch(
+        f"{MAIN}.read_last_n_last_emails", return_value=envelopes
+    ), patch(
+        f"{MAIN}.release_mailbox"
+    ) as release_mailbox, patch(
+        f"{MAIN}.insert_from_df"
+    ) as insert_from_df:
+        main({"imap_login": "me@x.com", "imap_pwd": "secret"})
+
+    release_mailbox.assert_called_once_with(mailbox)
+    insert_from_df.assert_not_called()
+
+
+def test_search_replies_batches_ids():
+    mailbox = MagicMock()
+    mailbox.search.return_value = ("OK", [b"4 7"])
+    mailbox.fetch.return_value = (
+        "OK",
+        [
+            (
+                b"4 (BODY[HEADER.FIELDS (REFERENCES IN-REPLY-TO)] {30}",
+                b"In-Reply-To: <a@x>\r\n\r\n",
+            ),
+            b")",
+        ],
+    )
+
+    found = search_replies(mailbox, ["<a@x>", "<b@x>", None])
+
+    assert found == {"<a@x>"}
+    mailbox.search.assert_called_once_with(
+        None,
+        'OR OR OR HEADER References "<a@x>" HEADER In-Reply-To "<a@x>" '
+        'HEADER References "<b@x>" HEADER In-Reply-To "<b@x>"',
+    )
+    mailbox.fetch.assert_called_once_with(
+        "4,7", "(BODY.PEEK[HEADER.FIELDS (REFERENCES IN-REPLY-TO)])"
+    )
+
+
+def test_check_ids_not_in_table_binds_ids():
+    known = pd.DataFrame({"smtp_msg_id": ["<b@x>"]})
+    with patch(
+        "email_assistant.email_scripts.imap_account.main.get_df_from_query",
+        return_value=known,
+    ) as mock_query:
+        new_ids = check_ids_not_in_table(["<a@x>", "<b@x>", None, "<c@x>"])
+
+    assert new_ids == ["<a@x>", "<c@x>"]
+    query, params = mock_query.call_args[0]
+    assert "ANY(:smtp_msg_ids)" in query
+    assert params == {"smtp_msg_ids": ["<a@x>", "<b@x>", "<c@x>"]}
+
+
+def test_get_email_infos_is_cached():
+    row = pd.DataFrame({"email": ["me@x.com"], "imap_pwd": ["encrypted"]})
+    invalidate_email_infos()
+    with patch(
+        "email_assistant.email_scripts.imap_account.main.get_df_from_query",
+        return_value=row,
+    ) as mock_query, patch(
+        "email_assistant.email_scripts.imap_account.main.decode_string",
+        return_value="secret",
+    ) as mock_decode:
+        first = get_email_infos("me@x.com")
+        second = get_email_infos("me@x.com")
+        invalidate_email_infos("me@x.com")
+        get_email_infos("me@x.com")
+
+    assert first is second
+    assert first["imap_pwd"] == "secret"
+    assert mock_query.call_count == 2
+    assert mock_decode.call_count == 2
+    invalidate_email_infos()
@@ -1,11 +1,38 @@
+import pytest
+from unittest.mock import patch
 from email_assistant.email_scripts.update_inbox import main
-from dotenv import load_dotenv
-import os
 
-load_dotenv()
 
-outlook_account = os.getenv("OUTLOOK_ACCOUNT")
+@pytest.mark.parametrize(
+    "provider, called", [("Outlook", "main_categories"), ("Gmail", "imap_main")]
+)
+def test_main_dispatches_on_the_provider(provider, called):
+    email_infos = {"email": "me@example.com", "email_provider": provider}
+    with patch(
+        "email_assistant.email_scripts.update_inbox.get_email_infos",
+        return_value=email_infos,
+    ), patch(
+        "email_assistant.email_scripts.update_inbox.main_categories"
+    ) as main_categories, patch(
+        "email_assistant.email_scripts.update_inbox.imap_main"
+    ) as imap_main:
+        main("me@example.com")
 
+    mocks = {"main_categories": main_categories, "imap_main": imap_main}
+    for name, mock in mocks.items():
+        assert mock.called == (name == called)
+    if called == "main_categories":
+        main_categories.assert_called_once_with("me@example.com")
+    else:
+        imap_main.assert_called_once_with(email_infos)
 
-def test_main():
-    main(outlook_account)
+
+def test_main_rejects_unknown_accounts_and_providers():
+    with patch(
+        "email_assistant.email_scripts.update_inbox.get_email_infos",
+        side_effect=[None, {"email_provider": "Yahoo"}],
+    ):
+        with pytest.raises(ValueError, match="not found"):
+            main("me@example.com")
+        with pytest.raises(ValueError, match="not supported"):
+            main("me@example.com")
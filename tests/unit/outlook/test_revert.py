@@ -1,12 +1,5 @@
-import os
-from dotenv import load_dotenv
-
 # from email_assistant.email_scripts.revert_inbox import revert_inbox
 
-load_dotenv()
-
-TEST_OUTLOOK_ACCOUNT = os.getenv("TEST_OUTLOOK_ACCOUNT")
-
 
-# def test_revert_outlook_inbox(account=TEST_OUTLOOK_ACCOUNT):
-#    revert_inbox(account, is_test=True)
+# def test_revert_outlook_inbox(test_outlook_account):
+#    revert_inbox(test_outlook_account, is_test=True)
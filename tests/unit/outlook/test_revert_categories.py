@@ -0,0 +1,56 @@
+import unittest
+from unittest.mock import MagicMock
+from O365.connection import MSGraphProtocol
+from O365.utils.utils import Query
+from email_assistant.email_scripts.outlook_account.revert_categories import (
+    remove_categories_from_messages,
+)
+
+
+class TestRemoveCategoriesFromMessages(unittest.TestCase):
+    def test_filters_on_categories_and_patches_in_batch(self):
+        """Test that only categorized messages are fetched and patched."""
+        protocol = MSGraphProtocol()
+        mailbox = MagicMock()
+        mailbox.protocol.service_url = "https://graph.microsoft.com/v1.0/"
+        mailbox.main_resource = "me"
+        inbox = mailbox.inbox_folder.return_value
+        inbox.new_query.side_effect = lambda: Query(protocol=protocol)
+        msg = MagicMock(object_id="m1", categories=["Fyi", "Personal"])
+        inbox.get_messages.side_effect = [iter([msg]), iter([])]
+        mailbox.con.post.return_value.json.return_value = {
+            "responses": [{"id": "0", "status": 200}]
+        }
+
+        remove_categories_from_messages(mailbox, ["Fyi", "Marketing"])
+
+        self.assertEqual(inbox.get_messages.call_count, 2)
+        query = inbox.get_messages.call_args.kwargs["query"]
+        self.assertEqual(
+            query.as_params()["$filter"],
+            "categories/any(a:a eq 'Fyi') or categories/any(a:a eq 'Marketing')",
+        )
+        requests = mailbox.con.post.call_args.kwargs["data"]["requests"]
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0]["url"], "/me/messages/m1")
+        self.assertEqual(requests[0]["body"], {"categories": ["Personal"]})
+        self.assertEqual(msg.categories, ["Personal"])
+
+    def test_stops_when_no_message_can_be_updated(self):
+        """Test that failing updates do not make the revert loop forever."""
+        mailbox = MagicMock()
+        inbox = mailbox.inbox_folder.return_value
+        inbox.get_messages.side_effect = lambda **kwargs: iter(
+            [MagicMock(object_id="m1", categories=["Fyi"])]
+        )
+        mailbox.con.post.return_value.json.return_value = {
+            "responses": [{"id": "0", "status": 500}]
+        }
+
+        remove_categories_from_messages(mailbox, ["Fyi"])
+
+        self.assertEqual(inbox.get_messages.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
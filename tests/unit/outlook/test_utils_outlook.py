@@ -0,0 +1,265 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from O365.connection import MSGraphProtocol
+from O365.utils.utils import Query
+from email_assistant.email_scripts.outlook_account.utils_outlook import (
+    get_account,
+    get_email_token_loc,
+    get_folder_conversation_ids,
+    get_todays_messages,
+    graph_batch,
+    invalidate_account,
+    move_messages,
+)
+
+
+class TestGetFolderConversationIds(unittest.TestCase):
+    def test_filters_on_the_server_in_batches(self):
+        """Test that conversation ids are OR'd in a $filter, one request per batch."""
+        protocol = MSGraphProtocol()
+        folder = MagicMock()
+        folder.new_query.side_effect = lambda: Query(protocol=protocol)
+        folder.get_messages.side_effect = [
+            [MagicMock(conversation_id="c1")],
+            [MagicMock(conversation_id="c3")],
+        ]
+
+        with patch(
+            "email_assistant.email_scripts.outlook_account.utils_outlook."
+            "CONVERSATION_FILTER_BATCH_SIZE",
+            2,
+        ):
+            found = get_folder_conversation_ids(folder, ["c1", "c2", "c3"])
+
+        self.assertEqual(found, {"c1", "c3"})
+        first_query = folder.get_messages.call_args_list[0].kwargs["query"]
+        self.assertEqual(
+            first_query.as_params(),
+            {
+                "$filter": "conversationId eq 'c1' or conversationId eq 'c2'",
+                "$select": "conversationId",
+            },
+        )
+
+    def test_no_request_without_ids(self):
+        """Test that an empty list of ids does not query the folder."""
+        folder = MagicMock()
+
+        self.assertEqual(get_folder_conversation_ids(folder, []), set())
+        folder.get_messages.assert_not_called()
+
+
+class TestGetTodaysMessages(unittest.TestCase):
+    def test_selects_only_the_given_fields(self):
+        """Test that today's messages are filtered and reduced by Graph."""
+        protocol = MSGraphProtocol()
+        folder = MagicMock()
+        folder.new_query.side_effect = lambda attribute: Query(
+            attribute=attribute, protocol=protocol
+        )
+        folder.get_messages.return_value = iter(["msg"])
+
+        messages = get_todays_messages(folder, fields=("subject", "conversation_id"))
+
+        self.assertEqual(messages, ["msg"])
+        params = folder.get_messages.call_args.kwargs["query"].as_params()
+        self.assertEqual(
+            set(params["$select"].split(",")), {"subject", "conversationId"}
+        )
+        self.assertIn("receivedDateTime ge ", params["$filter"])
+        self.assertIn(" and receivedDateTime lt ", params["$filter"])
+        self.assertEqual(folder.get_messages.call_args.kwargs["limit"], 100)
+
+
+class TestGraphBatch(unittest.TestCase):
+    def test_responses_follow_the_requests_order(self):
+        """Test that responses are matched by id and missing ones are None."""
+        mailbox = MagicMock()
+        mailbox.protocol.service_url = "https://graph.microsoft.com/v1.0/"
+        mailbox.main_resource = "me"
+        mailbox.con.post.return_value.json.return_value = {
+            "responses": [{"id": "1", "status": 204}]
+        }
+
+        responses = graph_batch(
+            mailbox,
+            [
+                {"method": "PATCH", "url": "/messages/a", "body": {"categories": []}},
+                {"method": "DELETE", "url": "/outlook/masterCategories/b"},
+            ],
+        )
+
+        self.assertEqual(responses, [None, {"id": "1", "status": 204}])
+        requests = mailbox.con.post.call_args.kwargs["data"]["requests"]
+        self.assertEqual(requests[0]["headers"], {"Content-Type": "application/json"})
+        self.assertEqual(
+            requests[1],
+            {"id": "1", "method": "DELETE", "url": "/me/outlook/masterCategories/b"},
+        )
+
+    @patch("email_assistant.email_scripts.outlook_account.utils_outlook.time.sleep")
+    def test_throttled_requests_are_sent_again(self, sleep):
+        """Test that requests answered with a 429 are retried after Retry-After."""
+        mailbox = MagicMock()
+        mailbox.protocol.service_url = "https://graph.microsoft.com/v1.0/"
+        mailbox.main_resource = "me"
+        mailbox.con.post.return_value.json.side_effect = [
+            {
+                "responses": [
+                    {"id": "0", "status": 204},
+                    {"id": "1", "status": 429, "headers": {"Retry-After": "3"}},
+                ]
+            },
+            {"responses": [{"id": "1", "status": 204}]},
+        ]
+
+        responses = graph_batch(
+            mailbox,
+            [
+                {"method": "DELETE", "url": "/messages/a"},
+                {"method": "DELETE", "url": "/messages/b"},
+            ],
+        )
+
+        sleep.assert_called_once_with(3)
+        self.assertEqual([response["status"] for response in responses], [204, 204])
+        retried = mailbox.con.post.call_args.kwargs["data"]["requests"]
+        self.assertEqual(
+            retried, [{"id": "1", "method": "DELETE", "url": "/me/messages/b"}]
+        )
+
+    @patch("email_assistant.email_scripts.outlook_account.utils_outlook.time.sleep")
+    def test_throttled_requests_wait_within_the_budget(self, sleep):
+        """Test that Retry-After is clamped and parsed, then retries stop."""
+        mailbox = MagicMock()
+        mailbox.protocol.service_url = "https://graph.microsoft.com/v1.0/"
+        mailbox.main_resource = "me"
+        throttled = {"id": "0", "status": 429, "headers": {"Retry-After": "3600"}}
+        mailbox.con.post.return_value.json.side_effect = [
+            {"responses": [dict(throttled, headers={"Retry-After": "soon"})]},
+            {"responses": [throttled]},
+            {"responses": [throttled]},
+        ]
+
+        with patch(
+            "email_assistant.email_scripts.outlook_account.utils_outlook."
+            "GRAPH_BATCH_MAX_WAIT_SECONDS",
+            10,
+        ):
+            responses = graph_batch(
+                mailbox, [{"method": "DELETE", "url": "/messages/a"}]
+            )
+
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [1, 9])
+        self.assertEqual(mailbox.con.post.call_count, 3)
+        self.assertEqual(responses[0]["status"], 429)
+
+    def test_batches_are_sent_in_order(self):
+        """Test that more than 20 requests are split and answered in order."""
+        mailbox = MagicMock()
+        mailbox.protocol.service_url = "https://graph.microsoft.com/v1.0/"
+        mailbox.main_resource = "me"
+
+        def post(url, data):
+            response = MagicMock()
+            response.json.return_value = {
+                "responses": [
+                    {"id": request["id"], "status": 204, "url": request["url"]}
+                    for request in data["requests"]
+                ]
+            }
+            return response
+
+        mailbox.con.post.side_effect = post
+
+        responses = graph_batch(
+            mailbox,
+            [{"method": "DELETE", "url": f"/messages/{i}"} for i in range(45)],
+        )
+
+        self.assertEqual(mailbox.con.post.call_count, 3)
+        self.assertEqual(
+            [response["url"] for response in responses],
+            [f"/me/messages/{i}" for i in range(45)],
+        )
+
+
+class TestMoveMessages(unittest.TestCase):
+    def test_moves_in_batches_and_updates_ids(self):
+        """Test that moves are sent in $batch calls and failures are skipped."""
+        mailbox = MagicMock()
+        mailbox.protocol.service_url = "https://graph.microsoft.com/v1.0/"
+        mailbox.main_resource = "me"
+        messages = [MagicMock(object_id=f"id{i}", folder_id="inbox") for i in range(3)]
+        folder = MagicMock(folder_id="fyi")
+        mailbox.con.post.return_value.json.side_effect = [
+            {
+                "responses": [
+                    {"id": "1", "status": 201, "body": {"id": "new1"}},
+                    {"id": "0", "status": 404, "body": {"error": {}}},
+                ]
+            },
+            {"responses": [{"id": "0", "status": 201, "body": {"id": "new2"}}]},
+        ]
+
+        with patch(
+            "email_assistant.email_scripts.outlook_account.utils_outlook."
+            "GRAPH_BATCH_SIZE",
+            2,
+        ):
+            moved = move_messages(mailbox, messages, folder)
+
+        self.assertEqual(moved, 2)
+        self.assertEqual(mailbox.con.post.call_count, 2)
+        (url,) = mailbox.con.post.call_args_list[0].args
+        requests = mailbox.con.post.call_args_list[0].kwargs["data"]["requests"]
+        self.assertEqual(url, "https://graph.microsoft.com/v1.0/$batch")
+        self.assertEqual(requests[1]["url"], "/me/messages/id1/move")
+        self.assertEqual(requests[1]["body"], {"destinationId": "fyi"})
+        self.assertEqual(
+            [(m.object_id, m.folder_id) for m in messages],
+            [("id0", "inbox"), ("new1", "fyi"), ("new2", "fyi")],
+        )
+
+
+@patch(
+    "email_assistant.email_scripts.outlook_account.utils_outlook.get_email_token_loc"
+)
+@patch("email_assistant.email_scripts.outlook_account.utils_outlook.Account")
+class TestGetAccount(unittest.TestCase):
+    def tearDown(self):
+        invalidate_account()
+
+    def test_account_is_reused_until_invalidated(self, account_cls, token_loc):
+        """Test that an email address gets the same Account until invalidated."""
+        account_cls.side_effect = lambda *args, **kwargs: MagicMock()
+
+        first = get_account("a@example.com")
+
+        self.assertIs(get_account("a@example.com"), first)
+        self.assertIsNot(get_account("b@example.com"), first)
+        token_loc.assert_any_call("a@example.com")
+        invalidate_account("a@example.com")
+        self.assertIsNot(get_account("a@example.com"), first)
+        self.assertEqual(account_cls.call_count, 3)
+
+    def test_authentication_accounts_are_not_shared(self, account_cls, token_loc):
+        """Test that get_account without an email always builds a new Account."""
+        account_cls.side_effect = lambda *args, **kwargs: MagicMock()
+
+        self.assertIsNot(get_account(), get_account())
+        token_loc.assert_not_called()
+
+
+class TestGetEmailTokenLoc(unittest.TestCase):
+    @patch("email_assistant.email_scripts.outlook_account.utils_outlook.get_s3_client")
+    def test_token_backends_share_the_s3_client(self, get_s3_client):
+        """Test that token backends reuse the shared client, not a new one."""
+        backend = get_email_token_loc("a@example.com")
+
+        self.assertIs(backend._client, get_s3_client.return_value)
+        self.assertTrue(backend.filename.endswith("/a@example.com.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()